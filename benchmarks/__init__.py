@@ -0,0 +1,2 @@
+# Spinova のベンチマークスクリプト群
+# リポジトリのルートから `python -m benchmarks.<name>` で実行します。
@@ -0,0 +1,84 @@
+"""
+全体の帯域上限（BandwidthManager）の効き方を測定する。
+
+ローカルのメディアサーバーから複数のファイルを BatchDownloader で並列にダウンロードし、
+合計速度が上限内に収まるか、優先度（重み）どおりに配分されるか、
+サーバー側で遅いジョブの未使用分が他のジョブに回るかを確認する。
+遅いジョブは1接続あたりの送信速度を SLOW_RATE に絞った別のサーバーからダウンロードする。
+
+    python -m benchmarks.bench_bandwidth --rate 2M --size 4M
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks.media_server import MediaServer
+from engine.bandwidth import BandwidthManager, parse_rate
+from engine.batch import BatchDownloader
+from engine.job_queue import BatchJob
+
+# サーバー側で速度を絞る場合の上限（バイト/秒）
+SLOW_RATE = 384 * 1024
+
+
+def _run(urls, rate, workdir):
+    bandwidth = BandwidthManager(rate)
+    finished = {}
+    started = time.monotonic()
+
+    def on_result(result):
+        finished[result.index] = time.monotonic() - started
+
+    batch = BatchDownloader(
+        output_dir=workdir,
+        format_code="best",
+        yt_dlp_extra_opts={"quiet": True, "noprogress": True},
+        max_workers=len(urls),
+        per_host_limit=len(urls),
+        result_callback=on_result,
+        bandwidth=bandwidth,
+    )
+    batch.run([BatchJob(url, index=n, priority=priority) for n, (url, priority) in enumerate(urls, 1)])
+    return time.monotonic() - started, finished
+
+
+def run(rate, size):
+    workdir = tempfile.mkdtemp(prefix="spinova-bench-")
+    mib = 1024 * 1024
+    with MediaServer() as fast, MediaServer(rate=SLOW_RATE) as slow:
+        try:
+            scenarios = [
+                ("同じ重み x3", [(fast, 0), (fast, 0), (fast, 0)]),
+                ("優先度 1:0:0", [(fast, 1), (fast, 0), (fast, 0)]),
+                ("遅いサーバー1件 + 2件", [(slow, 0), (fast, 0), (fast, 0)]),
+            ]
+            print(f"上限 {rate / mib:.2f} MiB/s, ファイルサイズ {size / mib:.1f} MiB")
+            for name, jobs in scenarios:
+                urls = [(server.file_url(size), priority) for server, priority in jobs]
+                elapsed, finished = _run(urls, rate, workdir)
+                fast_jobs = [n for n, (server, _) in enumerate(jobs, 1) if server is fast]
+                fast_elapsed = max(finished[n] for n in fast_jobs)
+                print(f"[{name}] 全体 {elapsed:.2f}s, 高速ジョブの合計速度 "
+                      f"{size * len(fast_jobs) / fast_elapsed / mib:.2f} MiB/s")
+                for n, (server, priority) in enumerate(jobs, 1):
+                    kind = "高速" if server is fast else "低速"
+                    print(f"  #{n} {kind}  優先度 {priority:+d}  完了 {finished[n]:.2f}s  "
+                          f"平均 {size / finished[n] / mib:.2f} MiB/s")
+                for f in os.listdir(workdir):
+                    os.remove(os.path.join(workdir, f))
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rate", default="2M", help="全体の速度上限（例: 2M）")
+    parser.add_argument("--size", default="4M", help="1ファイルのサイズ（例: 4M）")
+    args = parser.parse_args()
+    run(parse_rate(args.rate), int(parse_rate(args.size)))
+
+
+if __name__ == "__main__":
+    main()
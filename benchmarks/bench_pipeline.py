@@ -0,0 +1,66 @@
+"""
+後処理のパイプライン化（PostProcessPool）の効果を測定する。
+
+ローカルのメディアサーバーから BatchDownloader で複数のファイルをダウンロードし、
+各ファイルに一定時間かかる後処理（ffmpeg の代わりに sleep を実行する Exec）を付けて、
+ワーカー内で続けて実行した場合と、後処理を別のワーカーに回した場合の所要時間を比べる。
+
+    python -m benchmarks.bench_pipeline --count 8 --workers 2 --postprocess-seconds 1
+"""
+import argparse
+import os
+import shutil
+import tempfile
+
+from benchmarks.media_server import MediaServer
+from engine.batch import BatchDownloader
+
+# 1ファイルのサイズと、転送にかかる時間（秒）。サーバー側の送信速度で再現する
+FILE_SIZE = 256 * 1024
+TRANSFER_SECONDS = 0.5
+
+
+def _run(server, count, workers, postprocess_seconds, pipeline, postprocess_workers):
+    workdir = tempfile.mkdtemp(prefix="spinova-bench-")
+    try:
+        batch = BatchDownloader(
+            output_dir=workdir,
+            format_code="best",
+            yt_dlp_extra_opts={
+                "quiet": True,
+                "noprogress": True,
+                "postprocessors": [{"key": "Exec", "when": "post_process",
+                                    "exec_cmd": f"sleep {postprocess_seconds}; test -f {{}}"}],
+            },
+            max_workers=workers,
+            per_host_limit=workers,
+            pipeline_postprocess=pipeline,
+            postprocess_workers=postprocess_workers,
+        )
+        summary = batch.run([server.file_url(FILE_SIZE) for _ in range(count)])
+        return summary
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def run(count, workers, postprocess_seconds, postprocess_workers=None):
+    with MediaServer(rate=FILE_SIZE / TRANSFER_SECONDS) as server:
+        print(f"{count}件, ワーカー {workers}, 転送 {TRANSFER_SECONDS:.1f}秒/件, "
+              f"後処理 {postprocess_seconds:.1f}秒/件, 後処理ワーカー {postprocess_workers or os.cpu_count()}")
+        for name, pipeline in (("ワーカー内で後処理", False), ("後処理を別ワーカーへ", True)):
+            summary = _run(server, count, workers, postprocess_seconds, pipeline, postprocess_workers)
+            print(f"[{name}] {summary.elapsed:.2f}s (成功 {summary.success_count}, 失敗 {summary.error_count})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=8, help="ダウンロードする件数")
+    parser.add_argument("--workers", type=int, default=2, help="ダウンロードのワーカー数")
+    parser.add_argument("--postprocess-seconds", type=float, default=1.0, help="1件あたりの後処理の時間")
+    parser.add_argument("--postprocess-workers", type=int, help="後処理のワーカー数（省略時は CPU 数）")
+    args = parser.parse_args()
+    run(args.count, args.workers, args.postprocess_seconds, args.postprocess_workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+メタデータの先読み（MetadataPrefetcher）の効果を測定する。
+
+ローカルのメディアサーバーの動画を埋め込んだページ（page_url）を使い、1リクエストごとの応答の遅れで
+抽出の待ち時間を再現する（動画の取得にも同じだけの遅れがかかる）。
+BatchDownloader でページのURLを続けてダウンロードし、先読みなしと先読みありの所要時間を比べる。
+
+    python -m benchmarks.bench_prefetch --count 8 --workers 1 --extract-seconds 0.5
+"""
+import argparse
+import shutil
+import tempfile
+
+from benchmarks.media_server import MediaServer
+from engine.batch import BatchDownloader
+
+# 1ファイルのサイズと、転送にかかる時間（秒）。サーバー側の送信速度で再現する
+FILE_SIZE = 256 * 1024
+TRANSFER_SECONDS = 0.5
+
+
+def _run(server, count, workers, prefetch):
+    workdir = tempfile.mkdtemp(prefix="spinova-bench-")
+    try:
+        batch = BatchDownloader(
+            output_dir=workdir,
+            format_code="best",
+            yt_dlp_extra_opts={"quiet": True, "noprogress": True, "no_warnings": True},
+            max_workers=workers,
+            # 先読みの抽出もホストの同時実行数に数えるため、その分の枠を空けておく
+            per_host_limit=workers + prefetch,
+            prefetch=prefetch,
+        )
+        return batch.run([server.page_url(FILE_SIZE) for _ in range(count)])
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def run(count, workers, extract_seconds, prefetch):
+    with MediaServer(latency=extract_seconds, rate=FILE_SIZE / TRANSFER_SECONDS) as server:
+        print(f"{count}件, ワーカー {workers}, 抽出 {extract_seconds:.1f}秒/件, "
+              f"転送 {TRANSFER_SECONDS:.1f}秒/件")
+        for name, depth in (("先読みなし", 0), (f"先読み {prefetch}件", prefetch)):
+            summary = _run(server, count, workers, depth)
+            print(f"[{name}] {summary.elapsed:.2f}s (成功 {summary.success_count}, 失敗 {summary.error_count})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=8, help="ダウンロードする件数")
+    parser.add_argument("--workers", type=int, default=1, help="ダウンロードのワーカー数")
+    parser.add_argument("--extract-seconds", type=float, default=0.5, help="1件あたりの抽出（ページの応答）の時間")
+    parser.add_argument("--prefetch", type=int, default=2, help="先読みする件数")
+    args = parser.parse_args()
+    run(args.count, args.workers, args.extract_seconds, args.prefetch)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+進捗通知の間引き（ProgressCoalescer）と ProgressRecord によるUIスレッド負荷の変化を測定する。
+
+ワーカースレッドから yt-dlp の進捗フック相当の dict を高頻度で送り、
+メインスレッドのスロットが呼ばれた回数と、送信側・受信側で費やした時間を比較する。
+raw は従来どおりフックの dict を pyqtSignal(dict) で送る場合、
+record は ProgressRecord に変換して pyqtSignal(object) で送る場合。
+
+    python -m benchmarks.bench_progress --chunks 20000 --intervals 0 0.1
+"""
+import argparse
+import sys
+import threading
+import time
+
+from PyQt5.QtCore import QCoreApplication, QObject, pyqtSignal
+
+from engine.progress import ProgressCoalescer, ProgressRecord
+
+
+class _DictEmitter(QObject):
+    progress = pyqtSignal(dict)
+
+
+class _RecordEmitter(QObject):
+    progress = pyqtSignal(object)
+
+
+class _Receiver(QObject):
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    def on_progress(self, data):
+        self.calls += 1
+        if isinstance(data, ProgressRecord):
+            data.percent
+        elif data.get("total_bytes"):
+            int(data.get("downloaded_bytes", 0) / data["total_bytes"] * 100)
+
+
+def make_info_dict(formats=60):
+    # 実際のフックには info_dict 全体が含まれる
+    return {
+        "id": "bench",
+        "title": "benchmark video",
+        "formats": [{"format_id": str(i), "url": "https://example.com/" + "x" * 200,
+                     "http_headers": {"User-Agent": "bench"}, "ext": "mp4"} for i in range(formats)],
+        "thumbnails": [{"url": "https://example.com/t%d.jpg" % i} for i in range(20)],
+    }
+
+
+def run(app, chunks, duration, interval, compact):
+    emitter = _RecordEmitter() if compact else _DictEmitter()
+    receiver = _Receiver()
+    emitter.progress.connect(receiver.on_progress)
+    info = make_info_dict()
+    total = chunks * 1024
+    done = threading.Event()
+    send_time = [0.0]
+
+    if compact:
+        coalescer = ProgressCoalescer(emitter.progress.emit, interval)
+        send = lambda d: coalescer.push("job", ProgressRecord.from_hook(d, job_id="job"))
+        close = coalescer.close
+    else:
+        send = emitter.progress.emit
+        close = lambda: None
+
+    def worker():
+        delay = duration / chunks
+        for i in range(1, chunks + 1):
+            started = time.perf_counter()
+            send({"status": "downloading", "downloaded_bytes": i * 1024,
+                  "total_bytes": total, "info_dict": info})
+            send_time[0] += time.perf_counter() - started
+            time.sleep(delay)
+        send({"status": "finished", "downloaded_bytes": total, "total_bytes": total, "info_dict": info})
+        close()
+        done.set()
+
+    # UIスレッドのイベント処理（シグナル引数の変換を含む）に費やした時間を計測する
+    gui_time = 0.0
+    started = time.perf_counter()
+    threading.Thread(target=worker, daemon=True).start()
+    while not done.is_set():
+        t = time.perf_counter()
+        app.processEvents()
+        gui_time += time.perf_counter() - t
+        time.sleep(0.001)
+    t = time.perf_counter()
+    app.processEvents()
+    gui_time += time.perf_counter() - t
+    elapsed = time.perf_counter() - started
+    return receiver.calls, gui_time, send_time[0], elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="進捗通知の間引きベンチマーク")
+    parser.add_argument("--chunks", type=int, default=20000, help="フック呼び出し回数")
+    parser.add_argument("--duration", type=float, default=2.0, help="送信にかける秒数")
+    parser.add_argument("--intervals", type=float, nargs="+", default=[0, 0.1], help="比較する通知間隔（秒）")
+    args = parser.parse_args()
+
+    app = QCoreApplication.instance() or QCoreApplication(sys.argv)
+    print(f"フック呼び出し: {args.chunks} 回 / {args.duration:.1f} 秒")
+    cases = [("raw", 0, False)] + [("record", interval, True) for interval in args.intervals]
+    for name, interval, compact in cases:
+        calls, gui_time, send, elapsed = run(app, args.chunks, args.duration, interval, compact)
+        print(f"{name:>6} 間隔 {interval:>5.2f}s: UIスロット {calls:6d} 回, "
+              f"UIイベント処理 {gui_time * 1000:8.1f} ms, 送信側 {send * 1000:8.1f} ms, 全体 {elapsed:5.2f} s")
+
+
+if __name__ == "__main__":
+    main()
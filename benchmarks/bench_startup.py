@@ -0,0 +1,108 @@
+"""
+起動時間のレポート。
+
+子プロセスで `python -X importtime` を実行してモジュールごとの import 時間（累積）を集計し、
+あわせてウィンドウ表示までの時間（QApplication 生成 → MainWindow 表示）を測定する。
+ウィンドウ表示までに yt_dlp が読み込まれていないことも確認する。
+
+    python -m benchmarks.bench_startup --repeat 5 --top 20
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# ウィンドウ表示までの時間を測る子プロセス側のスクリプト
+_WINDOW_SCRIPT = r"""
+import time
+t0 = time.perf_counter()
+import sys
+from PyQt5.QtWidgets import QApplication
+from user_interface.main_window import MainWindow
+t_import = time.perf_counter()
+app = QApplication(sys.argv)
+window = MainWindow()
+window.show()
+app.processEvents()
+t_shown = time.perf_counter()
+print(t_import - t0, t_shown - t0, int("yt_dlp" in sys.modules))
+"""
+
+# GUI とヘッドレスそれぞれの import 対象
+TARGETS = {
+    "gui": "import user_interface.main_window",
+    "headless": "import cli",
+}
+
+
+def _env():
+    env = dict(os.environ)
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    return env
+
+
+def import_times(statement):
+    """-X importtime の出力を {モジュール名: (self_us, cumulative_us)} にする"""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", statement],
+                          cwd=ROOT, env=_env(), capture_output=True, text=True)
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        try:
+            self_us, cumulative_us = int(fields[0]), int(fields[1])
+        except ValueError:
+            continue  # ヘッダ行
+        times[fields[2].strip()] = (self_us, cumulative_us)
+    return times
+
+
+def time_to_window():
+    proc = subprocess.run([sys.executable, "-c", _WINDOW_SCRIPT],
+                          cwd=ROOT, env=_env(), capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed")
+    import_s, shown_s, has_yt_dlp = proc.stdout.split()[-3:]
+    return float(import_s), float(shown_s), has_yt_dlp == "1"
+
+
+def run(repeat=5, top=20):
+    for name, statement in TARGETS.items():
+        samples = [import_times(statement) for _ in range(repeat)]
+        modules = set().union(*samples)
+        rows = []
+        for module in modules:
+            values = [s[module][1] for s in samples if module in s]
+            rows.append((statistics.median(values), module))
+        rows.sort(reverse=True)
+        total = rows[0][0] if rows else 0
+        print(f"[{name}] {statement}: {total / 1000:.1f} ms (中央値, {repeat} 回)")
+        print(f"  yt_dlp 読み込み: {'あり' if 'yt_dlp' in modules else 'なし'}")
+        for cumulative_us, module in rows[:top]:
+            print(f"  {cumulative_us / 1000:8.1f} ms  {module}")
+        print()
+
+    try:
+        results = [time_to_window() for _ in range(repeat)]
+    except Exception as e:
+        print(f"ウィンドウ表示時間の測定に失敗しました: {e}")
+        return
+    print(f"ウィンドウ表示まで: import {statistics.median(r[0] for r in results) * 1000:.1f} ms, "
+          f"表示 {statistics.median(r[1] for r in results) * 1000:.1f} ms (中央値, {repeat} 回)")
+    print(f"  表示時点で yt_dlp 読み込み: {'あり' if any(r[2] for r in results) else 'なし'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="各測定の繰り返し回数")
+    parser.add_argument("--top", type=int, default=20, help="表示する上位モジュール数")
+    args = parser.parse_args()
+    run(repeat=args.repeat, top=args.top)
+
+
+if __name__ == "__main__":
+    main()
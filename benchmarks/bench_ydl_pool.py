@@ -0,0 +1,67 @@
+"""
+YoutubeDL インスタンス再利用の効果を測定する。
+
+ローカルのメディアサーバーの小さなファイルを、同じ設定で
+N 件ダウンロードしたときの1URLあたりの所要時間を
+「URLごとに YoutubeDL を生成する場合」と「YoutubeDLPool を使う場合」で比較する。
+
+    python -m benchmarks.bench_ydl_pool --count 50 --cookies 500
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks.media_server import MediaServer
+from engine.downloader import VideoDownloader
+from engine.ydl_pool import YoutubeDLPool
+
+
+def write_cookie_file(path, count):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("# Netscape HTTP Cookie File\n")
+        for i in range(count):
+            f.write(f".example{i % 50}.com\tTRUE\t/\tFALSE\t2147483647\tcookie{i}\t{'v' * 32}\n")
+
+
+def run(count, workdir, server, cookie_path, pool):
+    downloader = VideoDownloader(
+        yt_dlp_extra_opts={"quiet": True, "noprogress": True},
+        cookie_path=cookie_path,
+        ydl_pool=pool,
+    )
+    started = time.perf_counter()
+    for _ in range(count):
+        downloader.download_video(server.file_url(64 * 1024), output_dir=workdir, format_code="best")
+    return (time.perf_counter() - started) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="YoutubeDL 再利用のベンチマーク")
+    parser.add_argument("--count", type=int, default=30, help="ダウンロード件数")
+    parser.add_argument("--cookies", type=int, default=500, help="cookie ファイルの行数")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="spinova-bench-")
+    cookie_path = os.path.join(workdir, "cookie.txt")
+    write_cookie_file(cookie_path, args.cookies)
+
+    try:
+        with MediaServer() as server:
+            fresh = run(args.count, os.path.join(workdir, "fresh"), server, cookie_path, None)
+            pool = YoutubeDLPool()
+            pooled = run(args.count, os.path.join(workdir, "pooled"), server, cookie_path, pool)
+            pool.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"件数: {args.count}, cookie: {args.cookies} 行")
+    print(f"URLごとに生成 : {fresh * 1000:8.2f} ms/URL")
+    print(f"プール再利用  : {pooled * 1000:8.2f} ms/URL "
+          f"(生成 {pool.created} 回, 再利用 {pool.reused} 回)")
+    print(f"削減量        : {(fresh - pooled) * 1000:8.2f} ms/URL")
+
+
+if __name__ == "__main__":
+    main()
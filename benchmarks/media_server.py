@@ -0,0 +1,254 @@
+"""
+ベンチマーク用のローカルメディアサーバー。
+
+外部のサイトに接続せずに yt-dlp のダウンロード経路を動かすため、合成したデータを次の形式で配信する。
+内容は決まったバイト列の繰り返しで、同じURLは常に同じデータになる。
+
+    /file/<size>/<name>.mp4                  単体のファイル（Range 要求に対応）
+    /hls/<count>/<size>/<name>.m3u8          HLS のメディアプレイリストと <n>.ts の断片
+    /dash/<count>/<size>/<name>.mpd          DASH のマニフェスト（SegmentTemplate）と <n>.m4s の断片
+    /page/<size>/<name>.html                 /file/<size>/<name>.mp4 を <video> で埋め込んだページ
+
+latency は1リクエストごとの応答の遅れ（秒）、rate は1接続あたりの送信速度の上限（バイト/秒）。
+実際のサーバーに近い待ち時間を再現し、ローカル環境の速度差で結果がぶれにくくする。
+
+    with MediaServer(latency=0.02) as server:
+        url = server.file_url(1 << 20)
+"""
+import http.server
+import itertools
+import re
+import threading
+import time
+
+# 送信するデータの元になるバイト列（64KiB）
+_BLOCK = bytes(range(256)) * 256
+
+_RANGE_RE = re.compile(r'bytes=(\d*)-(\d*)')
+_FILE_RE = re.compile(r'^/file/(\d+)/[\w.-]+\.mp4$')
+_HLS_RE = re.compile(r'^/hls/(\d+)/(\d+)/(?:v\d+\.m3u8|(\d+)\.ts)$')
+_DASH_RE = re.compile(r'^/dash/(\d+)/(\d+)/(?:v\d+\.mpd|(\d+)\.m4s)$')
+_PAGE_RE = re.compile(r'^/page/(\d+)/([\w.-]+)\.html$')
+
+# 断片1つあたりの再生時間（秒）
+SEGMENT_SECONDS = 2
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self._handle(send_body=False)
+
+    def do_GET(self):
+        self._handle(send_body=True)
+
+    def _handle(self, send_body):
+        server = self.server
+        path = self.path.split("?", 1)[0]
+        if server.latency:
+            time.sleep(server.latency)
+        server.count_request()
+
+        match = _FILE_RE.match(path)
+        if match:
+            return self._send_data(int(match.group(1)), "video/mp4", send_body)
+        match = _HLS_RE.match(path)
+        if match:
+            count, size, segment = match.groups()
+            if segment is None:
+                return self._send_text(_hls_playlist(int(count)), "application/vnd.apple.mpegurl", send_body)
+            return self._send_data(int(size), "video/mp2t", send_body)
+        match = _DASH_RE.match(path)
+        if match:
+            count, size, segment = match.groups()
+            if segment is None:
+                return self._send_text(_dash_manifest(int(count), int(size)), "application/dash+xml", send_body)
+            return self._send_data(int(size), "video/mp4", send_body)
+        match = _PAGE_RE.match(path)
+        if match:
+            size, name = match.groups()
+            return self._send_text(_page(int(size), name), "text/html; charset=utf-8", send_body)
+        self.send_error(404)
+
+    def _send_text(self, text, content_type, send_body):
+        body = text.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def _send_data(self, size, content_type, send_body):
+        start, end = 0, size - 1
+        header = self.headers.get("Range")
+        match = _RANGE_RE.match(header or "")
+        if match and (match.group(1) or match.group(2)):
+            if match.group(1):
+                start = int(match.group(1))
+                end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+            else:
+                start = max(0, size - int(match.group(2)))
+            if start >= size or start > end:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.server.count_range(start)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        if send_body:
+            self._write_range(start, end + 1)
+
+    def _write_range(self, start, stop):
+        rate = self.server.rate
+        began = time.monotonic()
+        offset = start
+        try:
+            while offset < stop:
+                n = min(len(_BLOCK) - offset % len(_BLOCK), stop - offset, 16384)
+                pos = offset % len(_BLOCK)
+                self.wfile.write(_BLOCK[pos:pos + n])
+                offset += n
+                self.server.count_bytes(n)
+                if rate:
+                    delay = (offset - start) / rate - (time.monotonic() - began)
+                    if delay > 0:
+                        time.sleep(delay)
+        except OSError:
+            pass
+
+
+def _hls_playlist(count):
+    lines = ["#EXTM3U", "#EXT-X-VERSION:3", f"#EXT-X-TARGETDURATION:{SEGMENT_SECONDS}",
+             "#EXT-X-MEDIA-SEQUENCE:0", "#EXT-X-PLAYLIST-TYPE:VOD"]
+    for n in range(count):
+        lines += [f"#EXTINF:{SEGMENT_SECONDS:.1f},", f"{n}.ts"]
+    lines.append("#EXT-X-ENDLIST")
+    return "\n".join(lines) + "\n"
+
+
+def _page(size, name):
+    return (f'<html><head><title>{name}</title></head>'
+            f'<body><video src="/file/{size}/{name}.mp4"></video></body></html>')
+
+
+def _dash_manifest(count, size):
+    bandwidth = size * 8 // SEGMENT_SECONDS
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+<MPD xmlns="urn:mpeg:dash:schema:mpd:2011" type="static" minBufferTime="PT{SEGMENT_SECONDS}S"
+     mediaPresentationDuration="PT{count * SEGMENT_SECONDS}S" profiles="urn:mpeg:dash:profile:isoff-live:2011">
+  <Period id="0" start="PT0S">
+    <AdaptationSet mimeType="video/mp4" segmentAlignment="true">
+      <Representation id="av" bandwidth="{bandwidth}" codecs="avc1.4d401f,mp4a.40.2" width="640" height="360">
+        <SegmentTemplate media="$Number$.m4s" startNumber="0" duration="{SEGMENT_SECONDS}" timescale="1"/>
+      </Representation>
+    </AdaptationSet>
+  </Period>
+</MPD>
+"""
+
+
+class MediaServer(http.server.ThreadingHTTPServer):
+    """別スレッドで動くローカルのメディアサーバー。with で起動・停止する"""
+
+    daemon_threads = True
+
+    def __init__(self, latency=0.0, rate=None, host="127.0.0.1"):
+        super().__init__((host, 0), _Handler)
+        self.latency = latency
+        self.rate = rate
+        self._names = itertools.count()
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.bytes_sent = 0
+        # Range 要求で指定された開始位置（続きからのダウンロードの確認用）
+        self.range_starts = []
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name="spinova-media-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def count_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def count_bytes(self, n):
+        with self._lock:
+            self.bytes_sent += n
+
+    def count_range(self, start):
+        with self._lock:
+            self.range_starts.append(start)
+
+    def reset_counters(self):
+        with self._lock:
+            self.requests = 0
+            self.bytes_sent = 0
+            self.range_starts = []
+
+    # URLは呼び出しごとに別の名前にする（ダウンロード済みのファイルと重ならないように）
+
+    def file_url(self, size):
+        return f"{self.base_url}/file/{size}/v{next(self._names)}.mp4"
+
+    def hls_url(self, count, segment_size):
+        return f"{self.base_url}/hls/{count}/{segment_size}/v{next(self._names)}.m3u8"
+
+    def dash_url(self, count, segment_size):
+        return f"{self.base_url}/dash/{count}/{segment_size}/v{next(self._names)}.mpd"
+
+    def page_url(self, size):
+        """動画を埋め込んだページ（汎用エクストラクタがページを取得してから動画をダウンロードする）"""
+        return f"{self.base_url}/page/{size}/v{next(self._names)}.html"
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.0, help="1リクエストごとの遅れ（秒）")
+    parser.add_argument("--rate", type=float, help="1接続あたりの送信速度の上限（バイト/秒）")
+    args = parser.parse_args()
+    server = MediaServer(latency=args.latency, rate=args.rate)
+    print(f"{server.base_url} で配信中（Ctrl+C で終了）")
+    print(f"  例: {server.file_url(1 << 20)}")
+    print(f"      {server.hls_url(10, 256 * 1024)}")
+    print(f"      {server.dash_url(10, 256 * 1024)}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+"""
+オフラインのベンチマークスイート。
+
+ローカルのメディアサーバー（benchmarks.media_server）に対して、単体のダウンロード（VideoDownloader）、
+単体ダウンロードのスケジューラ（DownloadScheduler、GUI の通常のダウンロード）、バッチ（BatchDownloader）を動かし、
+次の項目を測定する。
+
+    cold_start   新しいプロセスで engine を読み込み、最初の1件をダウンロードし終えるまでの時間
+    overhead     小さなファイルを続けてダウンロードしたときの1URLあたりの所要時間（経路ごと）
+    resume       .part ファイルの続きから Range 要求で再開したときの所要時間
+    fragments    HLS / DASH の断片ダウンロードの速度（concurrent_fragment_downloads ごと）
+    batch        バッチのワーカー数ごとの処理件数（件/秒）
+
+各項目は --repeat 回測定した中央値を使う。サーバー側で1リクエストごとの遅れと1接続あたりの速度を固定し、
+マシンの速度差より処理の違いが結果に出るようにしている。
+--output で結果を JSON に保存し、--compare で保存した結果と比べる（--threshold % 以上の悪化があれば終了コード 1）。
+
+    python -m benchmarks.suite
+    python -m benchmarks.suite --only overhead,fragments --repeat 5 --output before.json
+    python -m benchmarks.suite --compare before.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.media_server import MediaServer, _BLOCK
+from engine.batch import BatchDownloader
+from engine.downloader import VideoDownloader
+from engine.scheduler import DownloadScheduler
+from engine.ydl_pool import YoutubeDLPool
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+YDL_OPTS = {"quiet": True, "noprogress": True, "no_warnings": True}
+
+# 新しいプロセスで最初の1件をダウンロードする（cold_start 用）
+_COLD_START_SCRIPT = r"""
+import json, sys, time
+t0 = time.perf_counter()
+from engine.downloader import VideoDownloader
+t_import = time.perf_counter()
+downloader = VideoDownloader(yt_dlp_extra_opts={"quiet": True, "noprogress": True, "no_warnings": True})
+ok = downloader.download_video(sys.argv[1], output_dir=sys.argv[2], format_code="best")
+t_done = time.perf_counter()
+print(json.dumps({"ok": ok, "import": t_import - t0, "first_download": t_done - t_import}))
+"""
+
+MIB = 1024 * 1024
+
+
+class Metric:
+    """測定値1つ。better は 'lower'（小さいほど良い）または 'higher'"""
+
+    def __init__(self, value, unit, better="lower"):
+        self.value = value
+        self.unit = unit
+        self.better = better
+
+
+def _download(url, workdir, opts=None, pool=None):
+    downloader = VideoDownloader(yt_dlp_extra_opts={**YDL_OPTS, **(opts or {})}, ydl_pool=pool)
+    if not downloader.download_video(url, output_dir=workdir, format_code="best"):
+        raise RuntimeError(downloader.last_error)
+
+
+def cold_start(server, workdir, quick):
+    server.latency, server.rate = 0.0, None
+    proc = subprocess.run([sys.executable, "-c", _COLD_START_SCRIPT, server.file_url(64 * 1024), workdir],
+                          cwd=ROOT, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed")
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    if not result["ok"]:
+        raise RuntimeError("cold start download failed")
+    return {
+        "import_ms": Metric(result["import"] * 1000, "ms"),
+        "first_download_ms": Metric(result["first_download"] * 1000, "ms"),
+    }
+
+
+def overhead(server, workdir, quick):
+    server.latency, server.rate = 0.0, None
+    count = 10 if quick else 30
+    results = {}
+
+    def per_url(name, fn):
+        urls = [server.file_url(1024) for _ in range(count)]
+        started = time.perf_counter()
+        fn(urls, os.path.join(workdir, name))
+        results[f"{name}_ms_per_url"] = Metric((time.perf_counter() - started) / count * 1000, "ms")
+
+    def fresh(urls, out):
+        for url in urls:
+            _download(url, out)
+
+    def pooled(urls, out):
+        pool = YoutubeDLPool()
+        try:
+            for url in urls:
+                _download(url, out, pool=pool)
+        finally:
+            pool.close()
+
+    def scheduler(urls, out):
+        async def run():
+            pool = YoutubeDLPool()
+            scheduler = DownloadScheduler(output_dir=out, format_code="best", yt_dlp_extra_opts=YDL_OPTS,
+                                          max_workers=1, ydl_pool=pool)
+            try:
+                # GUI と同じく1件ずつ登録して完了を待つ
+                for url in urls:
+                    result = await scheduler.submit(url)
+                    if not result.success:
+                        raise RuntimeError(str(result.error))
+            finally:
+                await scheduler.close()
+                pool.close()
+        asyncio.run(run())
+
+    def batch(urls, out):
+        summary = BatchDownloader(output_dir=out, format_code="best", yt_dlp_extra_opts=YDL_OPTS,
+                                  max_workers=1, per_host_limit=1).run(urls)
+        if summary.error_count:
+            raise RuntimeError(f"{summary.error_count} batch jobs failed")
+
+    # 最初の yt_dlp の読み込みを測定に含めないよう、1件だけ先にダウンロードしておく
+    _download(server.file_url(1024), os.path.join(workdir, "warmup"))
+    per_url("downloader_fresh", fresh)
+    per_url("downloader_pooled", pooled)
+    per_url("scheduler", scheduler)
+    per_url("batch", batch)
+    return results
+
+
+def resume(server, workdir, quick):
+    # 2MiB を 4MiB/s で配信し、半分まで .part があれば残りの半分だけ取得されることを確認する
+    server.latency, server.rate = 0.01, 4 * MIB
+    size = 2 * MIB
+    full_url = server.file_url(size)
+    started = time.perf_counter()
+    _download(full_url, os.path.join(workdir, "full"))
+    full = time.perf_counter() - started
+
+    url = server.file_url(size)
+    out = os.path.join(workdir, "resume")
+    os.makedirs(out, exist_ok=True)
+    name = url.rsplit("/", 1)[1]
+    with open(os.path.join(out, f"{name}.part"), "wb") as f:
+        for offset in range(0, size // 2, len(_BLOCK)):
+            f.write(_BLOCK[:min(len(_BLOCK), size // 2 - offset)])
+    server.reset_counters()
+    started = time.perf_counter()
+    _download(url, out)
+    resumed = time.perf_counter() - started
+    if os.path.getsize(os.path.join(out, name)) != size:
+        raise RuntimeError("resumed file has the wrong size")
+    return {
+        "full_ms": Metric(full * 1000, "ms"),
+        "resume_ms": Metric(resumed * 1000, "ms"),
+        "resumed_from_offset": Metric(1.0 if size // 2 in server.range_starts else 0.0, "bool", "higher"),
+    }
+
+
+def fragments(server, workdir, quick):
+    # 断片ごとに 50ms の遅れと 2MiB/s の上限があるサーバーで、並列取得の効き方を見る
+    server.latency, server.rate = 0.05, 2 * MIB
+    count = 8 if quick else 16
+    segment_size = 128 * 1024
+    results = {}
+    for kind, make_url in (("hls", server.hls_url), ("dash", server.dash_url)):
+        for concurrency in (1, 2, 4, 8):
+            started = time.perf_counter()
+            _download(make_url(count, segment_size), os.path.join(workdir, f"{kind}{concurrency}"),
+                      opts={"concurrent_fragment_downloads": concurrency})
+            elapsed = time.perf_counter() - started
+            results[f"{kind}_cf{concurrency}_mibps"] = Metric(count * segment_size / elapsed / MIB,
+                                                             "MiB/s", "higher")
+    return results
+
+
+def batch(server, workdir, quick):
+    # 1件 256KiB を 1MiB/s、リクエストごとに 50ms の遅れで配信する
+    server.latency, server.rate = 0.05, MIB
+    count = 8 if quick else 16
+    results = {}
+    for workers in (1, 2, 4, 8):
+        urls = [server.file_url(256 * 1024) for _ in range(count)]
+        summary = BatchDownloader(output_dir=os.path.join(workdir, f"w{workers}"), format_code="best",
+                                  yt_dlp_extra_opts=YDL_OPTS, max_workers=workers,
+                                  per_host_limit=workers).run(urls)
+        if summary.error_count:
+            raise RuntimeError(f"{summary.error_count} batch jobs failed")
+        results[f"workers{workers}_jobs_per_s"] = Metric(count / summary.elapsed, "jobs/s", "higher")
+    return results
+
+
+SCENARIOS = {
+    "cold_start": cold_start,
+    "overhead": overhead,
+    "resume": resume,
+    "fragments": fragments,
+    "batch": batch,
+}
+
+
+def environment():
+    try:
+        import yt_dlp.version
+        yt_dlp_version = yt_dlp.version.__version__
+    except Exception:
+        yt_dlp_version = None
+    try:
+        revision = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                  capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        revision = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "yt_dlp": yt_dlp_version,
+        "revision": revision,
+    }
+
+
+def run(names, repeat=3, quick=False):
+    """各項目を repeat 回測定し、{項目: {指標: {value, unit, better, samples}}} を返す"""
+    results = {}
+    with MediaServer() as server:
+        for name in names:
+            samples = {}
+            for _ in range(repeat):
+                workdir = tempfile.mkdtemp(prefix="spinova-bench-")
+                try:
+                    for key, metric in SCENARIOS[name](server, workdir, quick).items():
+                        samples.setdefault(key, (metric, []))[1].append(metric.value)
+                finally:
+                    shutil.rmtree(workdir, ignore_errors=True)
+            results[name] = {
+                key: {"value": statistics.median(values), "unit": metric.unit,
+                      "better": metric.better, "samples": values}
+                for key, (metric, values) in samples.items()
+            }
+            for key, entry in results[name].items():
+                print(f"  {name}.{key:<28} {entry['value']:10.2f} {entry['unit']}")
+    return results
+
+
+def compare(results, baseline, threshold):
+    """基準の結果と比べて表示し、threshold % 以上悪化した指標の数を返す"""
+    regressions = 0
+    print(f"\n比較（基準: {baseline.get('environment', {}).get('revision') or '?'}）")
+    for name, metrics in results.items():
+        for key, entry in metrics.items():
+            base = baseline.get("results", {}).get(name, {}).get(key)
+            if not base or not base["value"]:
+                continue
+            change = (entry["value"] - base["value"]) / base["value"] * 100
+            worse = change > threshold if entry["better"] == "lower" else change < -threshold
+            regressions += worse
+            mark = "  悪化" if worse else ""
+            print(f"  {name}.{key:<28} {base['value']:10.2f} -> {entry['value']:10.2f} {entry['unit']:<7}"
+                  f" ({change:+6.1f}%){mark}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", help=f"実行する項目（カンマ区切り）: {','.join(SCENARIOS)}")
+    parser.add_argument("--repeat", type=int, default=3, help="各項目の測定回数（中央値を使う）")
+    parser.add_argument("--quick", action="store_true", help="件数を減らして短時間で実行する")
+    parser.add_argument("--output", metavar="PATH", help="結果を JSON で保存するファイル")
+    parser.add_argument("--compare", metavar="PATH", help="比較する基準の結果（--output で保存した JSON）")
+    parser.add_argument("--threshold", type=float, default=10.0, help="悪化とみなす変化率（%%）")
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.only.split(",")] if args.only else list(SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario: {', '.join(unknown)}")
+
+    env = environment()
+    print(f"Python {env['python']}, yt-dlp {env['yt_dlp']}, CPU {env['cpu_count']}, revision {env['revision']}")
+    results = run(names, repeat=max(1, args.repeat), quick=args.quick)
+    report = {"environment": env, "repeat": args.repeat, "quick": args.quick, "results": results}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n結果を保存しました: {args.output}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("quick") != args.quick:
+            print("注意: --quick の有無が基準と異なるため、結果を直接比べられない項目があります")
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
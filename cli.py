@@ -0,0 +1,225 @@
+"""
+Spinova のヘッドレス（GUIなし）実行モード。
+
+PyQt5 を一切 import せずに engine パッケージだけでダウンロードを行い、
+進捗や結果を JSON Lines 形式で標準出力へ書き出す。
+
+    python cli.py URL [URL ...]
+    python cli.py --csv urls.csv -o downloads
+    cat urls.txt | python cli.py
+    python main.py --headless URL
+"""
+import argparse
+import itertools
+import json
+import sys
+import threading
+import time
+from contextlib import ExitStack, nullcontext
+
+from config.config_manager import ConfigManager
+from engine.bandwidth import get_default_manager, parse_rate
+from engine.batch import BatchDownloader
+from engine.batch_source import iter_csv_jobs, resume_jobs
+from engine.plugins import PluginManager
+from engine.profiling import MODES
+from engine.resources import (open_metadata_cache, open_download_archive, open_job_queue, make_host_limiter,
+                              open_metrics, make_profiler, make_plugin_hooks)
+from engine.variants import join_variants
+
+
+class JsonLinesWriter:
+    """複数のワーカースレッドから1行ずつ安全に書き出す"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._lock = threading.Lock()
+
+    def write(self, event, **fields):
+        line = json.dumps({"event": event, "time": round(time.time(), 3), **fields},
+                          ensure_ascii=False, default=str)
+        with self._lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+
+def iter_line_urls(f):
+    for line in f:
+        url = line.strip()
+        if url.startswith("http"):
+            yield url
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="spinova", description="Spinova ヘッドレスダウンローダー")
+    parser.add_argument("urls", nargs="*", help="ダウンロードするURL（省略時は標準入力から1行1URLで読む）")
+    parser.add_argument("--csv", metavar="PATH",
+                        help="URL一覧のCSVファイル（- で標準入力）。2〜4列目で行ごとのフォーマット・保存先・優先度を指定できる")
+    parser.add_argument("-o", "--output-dir", help="保存先ディレクトリ")
+    parser.add_argument("-f", "--format", dest="format_code", help="yt-dlp のフォーマット指定")
+    parser.add_argument("--format-name", help="プラグイン等で定義されたフォーマット名")
+    parser.add_argument("--variant", action="append", default=[], metavar="FORMAT",
+                        help="同じ抽出から追加でダウンロードするフォーマット指定（複数指定可。共通のストリームは1回だけ通信する）")
+    parser.add_argument("--workers", type=int, help="並列ダウンロード数")
+    parser.add_argument("--per-host", type=int, help="同一ホストへの同時ダウンロード数")
+    parser.add_argument("--prefetch", type=int, help="ダウンロード中に先にメタデータを抽出しておく件数（0 で無効）")
+    parser.add_argument("--limit-by", choices=("host", "extractor"),
+                        help="同時ダウンロード数とバックオフを数える単位（ドメインまたはエクストラクタ）")
+    parser.add_argument("-r", "--limit-rate", help="全ダウンロード合計の速度上限（例: 500K, 4.2M）")
+    parser.add_argument("--config", default="config/settings.json", help="設定ファイルのパス")
+    parser.add_argument("--progress-interval", type=float, help="進捗を出力する間隔（秒）")
+    parser.add_argument("--no-archive", action="store_true", help="ダウンロードアーカイブを使わない")
+    parser.add_argument("--no-cache", action="store_true", help="メタデータキャッシュを使わない")
+    parser.add_argument("--resume", action="store_true", help="中断された最新のバッチを再開する")
+    parser.add_argument("--metrics-prom", metavar="PATH", help="ジョブの計測値を Prometheus のテキスト形式で書き出すファイル")
+    parser.add_argument("--metrics-json", metavar="PATH", help="バッチ終了時に計測値のサマリーを JSON で書き出すファイル")
+    parser.add_argument("--no-expand", action="store_true",
+                        help="プレイリスト・チャンネルをエントリごとのジョブに展開せず、1件のジョブとして順にダウンロードする")
+    parser.add_argument("--profile", choices=MODES,
+                        help="バッチ全体をプロファイルする（cprofile は .pstats、sampling は flamegraph 形式の .collapsed）")
+    parser.add_argument("--profile-memory", action="store_true", help="バッチ中のメモリ割り当てを tracemalloc で記録する")
+    parser.add_argument("--profile-memory-frames", type=int, metavar="N",
+                        help="tracemalloc で記録するスタックの深さ（既定は設定の profile_tracemalloc_frames）")
+    parser.add_argument("--profile-dir", metavar="DIR", help="プロファイルの保存先（既定は logs/profiles）")
+    parser.add_argument("--no-plugin-hooks", action="store_true", help="プラグインのフック（URLの前処理など）を呼ばない")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    # 標準出力は JSON Lines 専用にし、それ以外の print や yt-dlp の出力は標準エラーへ回す
+    out = JsonLinesWriter(sys.stdout)
+    sys.stdout = sys.stderr
+    # --csv のファイルはバッチが最後の行を読み終えるまで開いておき、どの経路で戻っても閉じる
+    with ExitStack() as resources:
+        return _run(args, out, resources)
+
+
+def _run(args, out, resources):
+    config = ConfigManager(config_path=args.config)
+    try:
+        yt_dlp_opts = json.loads(config.get("yt_dlp_opts", "") or "{}")
+    except ValueError:
+        yt_dlp_opts = {}
+    yt_dlp_opts.update({"quiet": True, "noprogress": True})
+
+    output_dir = args.output_dir or config.get("output_dir", "downloads")
+    format_code = args.format_code or "bestvideo+bestaudio/best"
+    plugin_manager = PluginManager() if args.format_name or not args.no_plugin_hooks else None
+    if args.format_name:
+        formats = plugin_manager.get_all_formats()
+        if args.format_name not in formats:
+            out.write("error", error=f"unknown format name: {args.format_name}")
+            return 2
+        format_code = formats[args.format_name]
+    if args.variant:
+        format_code = join_variants([format_code, *args.variant])
+
+    metadata_cache = None if args.no_cache else open_metadata_cache(config)
+    archive = None if args.no_archive else open_download_archive(config)
+    job_queue = open_job_queue(config)
+    metrics = open_metrics(config, prometheus_path=args.metrics_prom, json_path=args.metrics_json)
+    profiler = make_profiler(config, mode=args.profile, trace_memory=args.profile_memory or None,
+                             output_dir=args.profile_dir, on_saved=lambda paths: out.write("profile", paths=paths),
+                             memory_frames=args.profile_memory_frames)
+    hooks = None if args.no_plugin_hooks else make_plugin_hooks(
+        config, plugin_manager, metrics=metrics, log_callback=lambda message: out.write("log", message=message))
+
+    batch_id = None
+    total = None
+    if args.resume:
+        batches = job_queue.unfinished_batches() if job_queue else []
+        if not batches:
+            out.write("error", error="no interrupted batch")
+            return 1
+        batch = job_queue.get_batch(batches[0]["id"])
+        batch_id = batch["id"]
+        # CSVの読み込みが途中だったバッチは件数が確定していない
+        total = batch["total"] if batch["loaded"] else None
+        job_queue.reset_running(batch_id)
+        jobs = resume_jobs(job_queue, batch_id)
+    else:
+        if args.csv:
+            # CSVは読み込みながらジョブを登録し、ファイルが大きくても最初のダウンロードをすぐに始める
+            f = resources.enter_context(nullcontext(sys.stdin) if args.csv == "-"
+                                        else open(args.csv, newline="", encoding="utf-8-sig"))
+            jobs = iter_csv_jobs(f)
+            first = next(jobs, None)
+            if first is not None:
+                jobs = itertools.chain([first], jobs)
+        else:
+            jobs = args.urls or list(iter_line_urls(sys.stdin))
+            first = jobs[0] if jobs else None
+            total = len(jobs)
+        if first is None:
+            out.write("error", error="no urls")
+            return 1
+        if job_queue is not None:
+            batch_id = job_queue.open_batch(output_dir, format_code, source=args.csv)
+            jobs = job_queue.feed(batch_id, jobs)
+
+    bandwidth = get_default_manager()
+    bandwidth.set_rate(parse_rate(args.limit_rate or yt_dlp_opts.get("limit_rate")))
+    host_limiter = make_host_limiter(config, per_host_limit=args.per_host)
+    if args.limit_by:
+        host_limiter.limit_by = args.limit_by
+
+    def on_result(result):
+        out.write("job", index=result.index, url=result.url, success=result.success,
+                  skipped=result.skipped, error=str(result.error) if result.error else None,
+                  elapsed=round(result.elapsed, 3),
+                  metrics=result.metrics.to_dict() if result.metrics is not None else None)
+
+    batch = BatchDownloader(
+        output_dir=output_dir,
+        format_code=format_code,
+        ffmpeg_path=config.get("ffmpeg_path", "") or None,
+        yt_dlp_extra_opts=yt_dlp_opts,
+        max_workers=args.workers or config.get("batch_workers", 4),
+        per_host_limit=host_limiter.per_host_limit,
+        log_callback=lambda message: out.write("log", message=message),
+        result_callback=on_result,
+        reuse_ydl=config.get("reuse_ydl", True),
+        metadata_cache=metadata_cache,
+        archive=archive,
+        job_queue=job_queue,
+        progress_callback=lambda record: out.write("progress", **record.to_dict()),
+        progress_interval=(args.progress_interval if args.progress_interval is not None
+                           else config.get("progress_interval", 0.1)),
+        bandwidth=bandwidth,
+        host_limiter=host_limiter,
+        pipeline_postprocess=config.get("pipeline_postprocess", True),
+        postprocess_workers=config.get("postprocess_workers", 0) or None,
+        expand_playlists=not args.no_expand and config.get("expand_playlists", True),
+        prefetch=args.prefetch if args.prefetch is not None else config.get("batch_prefetch", 2),
+        metrics=metrics,
+        profiler=profiler,
+        hooks=hooks,
+    )
+
+    out.write("start", total=total, batch_id=batch_id, output_dir=output_dir, format=format_code)
+    try:
+        summary = batch.run(jobs, total=total)
+    except KeyboardInterrupt:
+        # 実行中のジョブは一時停止し、--resume で .part ファイルの続きから再開できるようにする
+        batch.pause()
+        out.write("interrupted", batch_id=batch_id)
+        return 130
+    finally:
+        if metrics is not None:
+            metrics.flush()
+        if hooks is not None:
+            # 各フックの呼び出し回数・所要時間・時間切れの回数
+            out.write("hooks", stats=hooks.stats())
+            hooks.close()
+
+    if job_queue is not None and batch_id is not None:
+        job_queue.finish_batch(batch_id)
+    out.write("summary", success=summary.success_count, skipped=summary.skipped_count,
+              failed=summary.error_count, elapsed=round(summary.elapsed, 3))
+    return 0 if summary.error_count == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,7 +8,45 @@ class ConfigManager:
             "output_dir": "downloads",
             "ffmpeg_path": "",
             "enabled_plugins": [],
-            "yt_dlp_opts": ""
+            "yt_dlp_opts": "",
+            "batch_workers": 4,
+            "batch_per_host_limit": 2,
+            "reuse_ydl": True,
+            "metadata_cache": True,
+            "metadata_cache_path": "cache/metadata.sqlite3",
+            "metadata_cache_max_mb": 64,
+            "metadata_cache_ttl": 3600,
+            "metadata_cache_extractor_ttls": {},
+            "download_archive": True,
+            "download_archive_path": "data/download_archive.sqlite3",
+            "job_queue": True,
+            "job_queue_path": "data/job_queue.sqlite3",
+            "progress_interval": 0.1,
+            "watchdog_stall_timeout": 60,
+            "batch_limit_by": "host",
+            "throttle_max_retries": 3,
+            "throttle_backoff_base": 5,
+            "throttle_backoff_max": 300,
+            "pipeline_postprocess": True,
+            "postprocess_workers": 0,
+            "expand_playlists": True,
+            "batch_prefetch": 2,
+            "metrics_prometheus_path": "",
+            "metrics_json_path": "",
+            "metrics_write_interval": 5,
+            "profile_mode": "",
+            "profile_tracemalloc": False,
+            "profile_tracemalloc_frames": 25,
+            "profile_dir": "logs/profiles",
+            "profile_interval": 0.005,
+            "log_max_lines": 5000,
+            "log_file": "logs/spinova.log",
+            "log_file_max_mb": 5,
+            "log_file_backups": 3,
+            "plugin_hooks": True,
+            "plugin_hook_timeout": 5,
+            "plugin_hook_max_timeouts": 3,
+            "plugin_hook_workers": 4
         }
         self.load()
 
@@ -1,4 +1,20 @@
-from .downloader import VideoDownloader
-from .plugins import PluginManager
+import importlib
 
-__all__ = ["VideoDownloader", "PluginManager"]
+# yt_dlp を読み込むモジュールは、実際に使われるまで import しない
+_LAZY_EXPORTS = {
+    "VideoDownloader": ".downloader",
+    "PluginManager": ".plugins",
+    "BatchDownloader": ".batch",
+    "DownloadScheduler": ".scheduler",
+}
+
+__all__ = ["VideoDownloader", "PluginManager", "BatchDownloader", "DownloadScheduler"]
+
+
+def __getattr__(name):
+    module_name = _LAZY_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,195 @@
+import os
+import sqlite3
+import threading
+import time
+
+from .media_id import resolve_media_id
+
+
+class FormatArchive:
+    """
+    DownloadArchive のうち1つのフォーマット指定の分だけを見る。
+    yt-dlp の download_archive にそのまま渡せるよう、集合と同じ `in` / add() を実装している
+    """
+
+    def __init__(self, archive, format_code):
+        self.archive = archive
+        self.format_code = format_code or ""
+
+    def __repr__(self):
+        # YoutubeDLPool のキーになる。同じアーカイブ・同じフォーマット指定ならインスタンスを共有できる
+        return f"<FormatArchive {id(self.archive):#x} {self.format_code!r}>"
+
+    def __bool__(self):
+        # 空でも照会させる（件数を数えると巨大なアーカイブで遅くなる）
+        return True
+
+    def __contains__(self, archive_id):
+        return self.archive.lookup(archive_id, self.format_code) is not None
+
+    def add(self, archive_id):
+        self.archive.add(archive_id, self.format_code)
+
+
+class DownloadArchive:
+    """
+    ダウンロード済み動画の索引。yt-dlp の archive ID（"extractor video_id"）とフォーマット指定の組を
+    主キーとする SQLite テーブルで管理し、件数が数百万になっても
+    1件あたりの照会は索引の参照だけで済む。
+
+    同じ動画でもフォーマット指定が違えば（MP4 の後に MP3 など）別のダウンロードとして扱う。
+    記録した保存先のファイルが削除されていれば、ダウンロード済みとはみなさない。
+    yt-dlp には for_format() で対象のフォーマットに絞ったものを渡す。
+    """
+
+    def __init__(self, path="data/download_archive.sqlite3"):
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA mmap_size=268435456")
+        self._migrate()
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS downloads (
+                archive_id TEXT NOT NULL,
+                format_code TEXT NOT NULL DEFAULT '',
+                filepath TEXT,
+                filesize INTEGER,
+                format_id TEXT,
+                downloaded_at REAL NOT NULL,
+                PRIMARY KEY (archive_id, format_code)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS download_urls (
+                url TEXT PRIMARY KEY,
+                archive_id TEXT NOT NULL
+            ) WITHOUT ROWID;
+        """)
+        self._conn.commit()
+
+    def _migrate(self):
+        # フォーマット指定の列がない古いテーブルは作り直す。
+        # どのフォーマットで保存したか分からないため、既存の記録は format_code を空にして残す（照合には使わない）
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(downloads)")}
+        if not columns or "format_code" in columns:
+            return
+        self._conn.executescript("""
+            BEGIN;
+            ALTER TABLE downloads RENAME TO downloads_old;
+            CREATE TABLE downloads (
+                archive_id TEXT NOT NULL,
+                format_code TEXT NOT NULL DEFAULT '',
+                filepath TEXT,
+                filesize INTEGER,
+                format_id TEXT,
+                downloaded_at REAL NOT NULL,
+                PRIMARY KEY (archive_id, format_code)
+            ) WITHOUT ROWID;
+            INSERT INTO downloads (archive_id, filepath, filesize, format_id, downloaded_at)
+                SELECT archive_id, filepath, filesize, format_id, downloaded_at FROM downloads_old;
+            DROP TABLE downloads_old;
+            COMMIT;
+        """)
+
+    def for_format(self, format_code):
+        """yt-dlp の download_archive に渡す、format_code の分だけを見る集合"""
+        return FormatArchive(self, format_code)
+
+    def lookup(self, archive_id, format_code=""):
+        """
+        archive_id を format_code でダウンロード済みなら記録内容を dict で返す。
+        記録した保存先のファイルがなくなっていれば None（保存先を記録する前の行はダウンロード済みとみなす）
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT archive_id, filepath, filesize, format_id, downloaded_at "
+                "FROM downloads WHERE archive_id = ? AND format_code = ?", (archive_id, format_code or "")).fetchone()
+        if row is None:
+            return None
+        record = dict(zip(("archive_id", "filepath", "filesize", "format_id", "downloaded_at"), row))
+        if record["filepath"] and not os.path.exists(record["filepath"]):
+            return None
+        return record
+
+    def add(self, archive_id, format_code=""):
+        with self._lock:
+            # 削除されたファイルの記録は、新しいダウンロードとして記録し直す
+            self._conn.execute(
+                "INSERT OR REPLACE INTO downloads (archive_id, format_code, downloaded_at) VALUES (?, ?, ?)",
+                (archive_id, format_code or "", time.time()))
+            self._conn.commit()
+
+    def archive_id_for_url(self, url):
+        from yt_dlp.utils import make_archive_id
+
+        key = resolve_media_id(url)
+        if key:
+            return make_archive_id(*key)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT archive_id FROM download_urls WHERE url = ?", (url,)).fetchone()
+        return row[0] if row else None
+
+    def lookup_url(self, url, format_code=""):
+        """URLが format_code でダウンロード済みなら記録内容を dict で返す。ネットワークアクセスは行わない"""
+        archive_id = self.archive_id_for_url(url)
+        if not archive_id:
+            return None
+        return self.lookup(archive_id, format_code)
+
+    def record(self, url, info, format_code=""):
+        """
+        ダウンロード後の info dict から保存先・サイズ・フォーマットを記録する。
+        yt-dlp が完了と判断して add() 済みのものだけを更新する。
+        """
+        if not info:
+            return
+        if info.get('_type', 'video') == 'playlist':
+            for entry in info.get('entries') or []:
+                self.record(None, entry, format_code)
+            return
+
+        extractor = info.get('extractor_key') or info.get('ie_key')
+        if not extractor or info.get('id') is None:
+            return
+        from yt_dlp.utils import make_archive_id
+        archive_id = make_archive_id(extractor, info['id'])
+
+        downloads = info.get('requested_downloads') or [{}]
+        filepath = downloads[0].get('filepath') or info.get('filepath')
+        format_id = info.get('format_id') or downloads[0].get('format_id')
+        filesize = None
+        if filepath and os.path.exists(filepath):
+            filesize = os.path.getsize(filepath)
+        else:
+            filesize = info.get('filesize') or info.get('filesize_approx')
+
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE downloads SET filepath = ?, filesize = ?, format_id = ?, downloaded_at = ? "
+                "WHERE archive_id = ? AND format_code = ?",
+                (filepath, filesize, format_id, time.time(), archive_id, format_code or ""))
+            if cur.rowcount and url:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO download_urls (url, archive_id) VALUES (?, ?)",
+                    (url, archive_id))
+            self._conn.commit()
+
+    def remove(self, archive_id, format_code=None):
+        """format_code を省略するとすべてのフォーマットの記録を削除する"""
+        with self._lock:
+            if format_code is None:
+                self._conn.execute("DELETE FROM downloads WHERE archive_id = ?", (archive_id,))
+                self._conn.execute("DELETE FROM download_urls WHERE archive_id = ?", (archive_id,))
+            else:
+                self._conn.execute("DELETE FROM downloads WHERE archive_id = ? AND format_code = ?",
+                                   (archive_id, format_code))
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,147 @@
+import heapq
+import itertools
+import re
+import threading
+import time
+
+# yt-dlp の --limit-rate と同じ書式（単位は 1024 倍ずつ）。起動時に yt_dlp を読み込まないよう自前で解釈する
+_RATE_RE = re.compile(r'(?i)^\s*(\d+(?:\.\d+)?)\s*([kmgtpezy]?)(?:i?b)?(?:/s)?\s*$')
+
+
+def parse_rate(value):
+    """'500K' や '4.2M' のような指定をバイト/秒に変換する。未指定・不正な値は None"""
+    if value in (None, ''):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value) if value > 0 else None
+    match = _RATE_RE.match(str(value))
+    if not match:
+        return None
+    rate = float(match.group(1)) * 1024 ** 'bkmgtpezy'.index(match.group(2).lower() or 'b')
+    return rate if rate > 0 else None
+
+
+def weight_for_priority(priority):
+    """優先度（0 が標準）を帯域の重みに変換する。1 上がるごとに2倍"""
+    try:
+        priority = int(priority or 0)
+    except (TypeError, ValueError):
+        priority = 0
+    return 2.0 ** max(-4, min(4, priority))
+
+
+class _Job:
+    __slots__ = ('weight', 'finish')
+
+    def __init__(self, weight):
+        self.weight = weight
+        self.finish = 0.0
+
+
+class BandwidthManager:
+    """
+    プロセス全体で共有するトークンバケット。
+    同時に実行中のすべてのダウンロードの合計速度を rate（バイト/秒）以下に抑える。
+
+    帯域はジョブの重みに応じて配分する（重み付き公平キューイング）。
+    待機中の要求のうち、重みで正規化した消費量が最も少ないジョブから順にトークンを渡すため、
+    速度が出ていない（トークンを待っていない）ジョブの未使用分は他のジョブに回る。
+    """
+
+    def __init__(self, rate=None, burst=None, clock=time.monotonic):
+        self.clock = clock
+        self._cond = threading.Condition()
+        self._jobs = {}
+        self._waiting = []
+        self._tickets = itertools.count()
+        self._vclock = 0.0
+        self.rate = None
+        self.burst = None
+        self._tokens = 0.0
+        self._updated = clock()
+        self.set_rate(rate, burst)
+
+    def set_rate(self, rate, burst=None):
+        """合計の上限を変更する。None または 0 以下で無制限"""
+        with self._cond:
+            self._refill()
+            self.rate = float(rate) if rate and rate > 0 else None
+            # バーストは既定で 0.25 秒分（最低 16KiB）。大きすぎると上限を一時的に超える
+            self.burst = float(burst) if burst else (max(self.rate * 0.25, 16384) if self.rate else None)
+            if self.rate is not None:
+                self._tokens = min(self._tokens, self.burst)
+            self._cond.notify_all()
+
+    def register(self, key, weight=1.0):
+        with self._cond:
+            job = self._jobs.get(key)
+            if job is None:
+                job = self._jobs[key] = _Job(weight)
+                # 休止していたジョブが溜まった分を一度に使わないよう、現在の仮想時刻から始める
+                job.finish = self._vclock
+            job.weight = max(float(weight or 1.0), 0.01)
+
+    def unregister(self, key):
+        with self._cond:
+            self._jobs.pop(key, None)
+
+    def consume(self, key, nbytes, abort=None):
+        """
+        nbytes 分のトークンを得るまでブロックする。
+        abort（threading.Event）がセットされたら待機をやめて False を返す
+        """
+        if nbytes <= 0:
+            return True
+        with self._cond:
+            if self.rate is None:
+                return True
+            job = self._jobs.get(key)
+            if job is None:
+                job = self._jobs[key] = _Job(1.0)
+                job.finish = self._vclock
+            start = max(job.finish, self._vclock)
+            job.finish = start + nbytes / job.weight
+            ticket = (job.finish, next(self._tickets), start)
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    if abort is not None and abort.is_set():
+                        return False
+                    if self.rate is None:
+                        return True
+                    self._refill()
+                    needed = min(nbytes, self.burst)
+                    if self._waiting[0] is ticket and self._tokens >= needed:
+                        # burst を超える要求は借り越し、次の要求が待つことで平均速度を保つ
+                        self._tokens -= nbytes
+                        self._vclock = start
+                        return True
+                    if self._waiting[0] is ticket:
+                        timeout = (needed - self._tokens) / self.rate
+                    else:
+                        timeout = None
+                    # abort を確認できるよう、待機は最長 0.25 秒ごとに区切る
+                    self._cond.wait(0.25 if timeout is None else min(timeout, 0.25))
+            finally:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+
+    def _refill(self):
+        now = self.clock()
+        if self.rate is not None:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+
+_default_manager = None
+_default_manager_lock = threading.Lock()
+
+
+def get_default_manager():
+    """プロセス全体で共有する BandwidthManager を返す（初期状態は無制限）"""
+    global _default_manager
+    with _default_manager_lock:
+        if _default_manager is None:
+            _default_manager = BandwidthManager()
+        return _default_manager
@@ -0,0 +1,818 @@
+import random
+import re
+import threading
+import time
+from collections import deque
+from contextlib import ExitStack, nullcontext
+from urllib.parse import urlparse
+
+from .bandwidth import weight_for_priority
+from .downloader import PAUSED, VideoDownloader
+from .expansion import is_playlist, iter_entry_urls
+from .job_queue import BatchJob
+from .metrics import JobMetrics
+from .postprocess import PostProcessPool
+from .prefetch import MetadataPrefetcher
+from .profiling import profiled
+from .progress import ProgressRecord
+from .ydl_pool import YoutubeDLPool
+
+
+class BatchResult:
+    """1件分のダウンロード結果"""
+
+    def __init__(self, index, url, success, error=None, elapsed=0.0, skipped=False, paused=False, metrics=None):
+        self.index = index
+        self.url = url
+        self.success = success
+        self.error = error
+        self.elapsed = elapsed
+        self.skipped = skipped
+        # 一時停止されたジョブ（.part ファイルが残っており、再開すると続きからダウンロードする）
+        self.paused = paused
+        # 段階ごとの所要時間・バイト数などの計測値（JobMetrics）
+        self.metrics = metrics
+
+    @property
+    def status(self):
+        if self.skipped:
+            return "skipped"
+        if self.paused:
+            return "paused"
+        return "done" if self.success else "failed"
+
+
+class BatchSummary:
+    """バッチ全体の集計結果"""
+
+    def __init__(self):
+        self.results = []
+        self.success_count = 0
+        self.error_count = 0
+        self.skipped_count = 0
+        self.paused_count = 0
+        self.started_at = time.time()
+        self.finished_at = None
+
+    def add(self, result):
+        self.results.append(result)
+        if result.skipped:
+            self.skipped_count += 1
+        elif result.paused:
+            self.paused_count += 1
+        elif result.success:
+            self.success_count += 1
+        else:
+            self.error_count += 1
+
+    @property
+    def elapsed(self):
+        end = self.finished_at or time.time()
+        return end - self.started_at
+
+
+class HostLimiter:
+    """
+    ホスト単位の同時実行数と、スロットリングを受けたホストの待機（バックオフ）を管理する。
+
+    HTTP 429 / 403 で失敗したホストは指数バックオフ（ジッター付き）の間は新しいジョブを開始せず、
+    成功するまでは同時実行数を1に絞る。他のホストのジョブには影響しない。
+    limit_by="extractor" にすると youtube.com と youtu.be のように同じサイトの別ドメインをまとめて数える。
+    """
+
+    THROTTLE_RE = re.compile(r'HTTP Error (?:429|403)\b|Too Many Requests', re.I)
+
+    def __init__(self, per_host_limit=2, limit_by="host", max_retries=3, backoff_base=5.0,
+                 backoff_max=300.0, clock=time.monotonic, rng=random.random):
+        self.per_host_limit = max(1, int(per_host_limit or 1))
+        self.limit_by = limit_by
+        # スロットリングで失敗したジョブを同じホストのキューに戻す回数
+        self.max_retries = max(0, int(max_retries or 0))
+        self.backoff_base = float(backoff_base)
+        self.backoff_max = float(backoff_max)
+        self.clock = clock
+        self.rng = rng
+        self._active = {}
+        # ホスト -> [連続したスロットリングの回数, 待機の終了時刻]
+        self._backoff = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def host_of(url):
+        try:
+            host = urlparse(url).hostname or ""
+        except ValueError:
+            host = ""
+        host = host.lower()
+        if host.startswith("www."):
+            host = host[4:]
+        return host
+
+    def key_of(self, url):
+        """同時実行数とバックオフを数える単位（ホスト名、またはエクストラクタ名）"""
+        if self.limit_by == "extractor":
+            from .media_id import resolve_media_id
+            media_id = resolve_media_id(url)
+            if media_id:
+                return f"extractor:{media_id[0]}"
+        return self.host_of(url)
+
+    @classmethod
+    def is_throttled(cls, error):
+        """エラー（例外または文字列）がスロットリングによるものか"""
+        return error is not None and bool(cls.THROTTLE_RE.search(str(error)))
+
+    def available(self, host):
+        # バックオフ中のホストには新しいジョブを出さず、明けた後も成功するまでは1件ずつ試す
+        limit = 1 if host in self._backoff else self.per_host_limit
+        return self._active.get(host, 0) < limit and self.backoff_remaining(host) <= 0
+
+    def acquire(self, host):
+        self._active[host] = self._active.get(host, 0) + 1
+
+    def release(self, host):
+        count = self._active.get(host, 0) - 1
+        if count > 0:
+            self._active[host] = count
+        else:
+            self._active.pop(host, None)
+
+    def penalize(self, host):
+        """スロットリングを記録し、そのホストの待機秒数を返す"""
+        with self._lock:
+            state = self._backoff.setdefault(host, [0, 0.0])
+            state[0] += 1
+            delay = min(self.backoff_max, self.backoff_base * 2 ** (state[0] - 1))
+            # 同時に弾かれたジョブが同じ時刻に一斉に再開しないよう、待機時間を半分から全体の間でばらつかせる
+            delay = delay / 2 + self.rng() * delay / 2
+            state[1] = max(state[1], self.clock() + delay)
+            return state[1] - self.clock()
+
+    def succeed(self, host):
+        with self._lock:
+            self._backoff.pop(host, None)
+
+    def backoff_remaining(self, host):
+        with self._lock:
+            state = self._backoff.get(host)
+            return max(0.0, state[1] - self.clock()) if state else 0.0
+
+    def next_ready(self, hosts):
+        """hosts のうちバックオフが最も早く明けるまでの秒数（待機中のホストがなければ None）"""
+        waits = [w for w in (self.backoff_remaining(host) for host in hosts) if w > 0]
+        return min(waits) if waits else None
+
+
+class BatchDownloader:
+    """
+    複数URLをN個のワーカーで並列ダウンロードする。
+    同一ホストへの同時接続数は per_host_limit で制限し、
+    制限中のホストのジョブは他ホストのジョブに順番を譲る。
+    読み込んだジョブは優先度（BatchJob.priority）の高いものから開始し、同じ優先度ならホストのラウンドロビンで選ぶ
+    （ソースは先読みの範囲ずつ読み進めるため、順番を入れ替えるのはその範囲の中）。
+    スロットリング（HTTP 429 / 403）で失敗したジョブはそのホストのバックオフ後に再試行する。
+    host_limiter を渡すと per_host_limit の代わりにその設定を使う（GUI ではバッチ間でバックオフの状態を共有する）。
+
+    pipeline_postprocess が有効なら、ffmpeg による結合などの後処理は PostProcessPool
+    （postprocess_workers 本、既定は CPU 数）で実行し、ワーカーは通信が終わりしだい次のジョブに移る。
+    ジョブの結果は後処理の完了時に通知される。
+
+    expand_playlists が有効なら、各URLをまず処理前の状態で抽出し（動画ならその結果でダウンロードする）、
+    プレイリスト・チャンネルは別スレッドでページごとに読み進めながら各エントリを個別のジョブとして流す。
+    エントリの結果は1件ずつ通知され、展開元のジョブは全エントリが終わった時点で完了になる。
+
+    prefetch に1以上を指定すると、次に処理されるジョブのうち最大その件数のメタデータを
+    ダウンロード中に先に抽出しておき（MetadataPrefetcher）、ジョブの開始時の抽出待ちを省く。
+    先読みの抽出もホストの同時実行数に数えるため、per_host_limit に空きのあるホストの分だけ行う。
+
+    profiler に Profiler を渡すと、run() 全体（ワーカー・後処理・展開の各スレッドを含む）をプロファイルする。
+
+    hooks に PluginHooks を渡すと、プラグインのフックを呼ぶ。URLの前処理はジョブを取り出したワーカーが
+    アーカイブとの照合より前に行い（ホストの割り当ては変更前のURLのまま）、それ以外は VideoDownloader が呼ぶ。
+    """
+
+    def __init__(self, output_dir="downloads", format_code="bestvideo+bestaudio/best",
+                 ffmpeg_path=None, yt_dlp_extra_opts=None, max_workers=4, per_host_limit=2,
+                 log_callback=None, result_callback=None, reuse_ydl=True, metadata_cache=None,
+                 archive=None, job_queue=None, progress_callback=None, progress_interval=0.1,
+                 bandwidth=None, host_limiter=None, pipeline_postprocess=True, postprocess_workers=None,
+                 expand_playlists=True, prefetch=2, metrics=None, profiler=None, hooks=None):
+        self.output_dir = output_dir
+        self.format_code = format_code
+        self.ffmpeg_path = ffmpeg_path
+        self.yt_dlp_extra_opts = yt_dlp_extra_opts
+        self.max_workers = max(1, int(max_workers or 1))
+        self.limiter = host_limiter or HostLimiter(per_host_limit)
+        self.log_callback = log_callback
+        self.result_callback = result_callback
+        self.reuse_ydl = reuse_ydl
+        self.metadata_cache = metadata_cache
+        self.archive = archive
+        # JobQueue を渡すと、ジョブの状態をディスクに記録して中断後に再開できるようにする
+        self.job_queue = job_queue
+        # 各ジョブの ProgressRecord を受け取るコールバック（ワーカースレッドから呼ばれる）
+        self.progress_callback = progress_callback
+        self.progress_interval = progress_interval
+        # BandwidthManager を渡すと、全ワーカーの合計速度を上限内に抑える
+        self.bandwidth = bandwidth
+        self.pipeline_postprocess = pipeline_postprocess
+        self.postprocess_workers = postprocess_workers
+        self.expand_playlists = expand_playlists
+        self.prefetch = max(0, int(prefetch or 0))
+        # MetricsCollector を渡すと、終わったジョブの計測値を集計する
+        self.metrics = metrics
+        self.profiler = profiler
+        # PluginHooks を渡すと、各段階でプラグインのフックを呼ぶ（engine.hooks を参照）
+        self.hooks = hooks
+        self._prefetcher = None
+        # URLの前処理を済ませたジョブ（キーは _active と同じ）。再試行・展開のたびには繰り返さない
+        self._preprocessed = set()
+
+        self._cond = threading.Condition()
+        self._queues = {}
+        self._hosts = deque()
+        self._source = None
+        self._source_done = False
+        # ソースを読み進めるのは一度に1つのワーカーだけ（読み込みは _cond の外で行う）
+        self._source_lock = threading.Lock()
+        self._queued = 0
+        self._stopped = False
+        self._total = None
+        # 実行中のジョブ（キーは進捗通知の job_id と同じ）
+        self._active = {}
+        # スロットリングで再試行した回数（キーは _active と同じ）
+        self._retries = {}
+        # 実行中・待機中の後処理（Future）
+        self._postprocessing = set()
+        # 展開中のプレイリストの数と、エントリの完了を待っている展開元のジョブ（キーは _active と同じ）
+        self._expanding = 0
+        self._parents = {}
+        # 取り出したが、展開するかどうかがまだ決まっていないジョブの数
+        self._inflight = 0
+
+    def run(self, jobs, total=None):
+        """
+        すべてのジョブを処理し終えるまでブロックし、集計結果を返す。
+        jobs はURL文字列または BatchJob の iterable（ジェネレータ可）。
+        """
+        profiling = self.profiler.session("batch") if self.profiler is not None else nullcontext()
+        with profiling:
+            return self._run(jobs, total)
+
+    def _run(self, jobs, total):
+        summary = BatchSummary()
+        if total is None and hasattr(jobs, "__len__"):
+            total = len(jobs)
+        self._total = total
+        self._source = self._as_jobs(jobs)
+        self._source_done = False
+        self._stopped = False
+
+        postprocess_pool = PostProcessPool(self.postprocess_workers) if self.pipeline_postprocess else None
+        # ワーカー間で YoutubeDL インスタンスを共有し、URLごとの初期化を省く。
+        # 後処理と先読みもダウンロードと同時に借りるため、その分も待機させておく（足りないと毎回作り直しになる）
+        idle = self.max_workers + self.prefetch + (postprocess_pool.max_workers if postprocess_pool else 0)
+        pool = YoutubeDLPool(max_idle_per_key=idle) if self.reuse_ydl else None
+        if self.prefetch:
+            self._prefetcher = MetadataPrefetcher(
+                lambda: VideoDownloader(ffmpeg_path=self.ffmpeg_path, yt_dlp_extra_opts=self.yt_dlp_extra_opts,
+                                        ydl_pool=pool, metadata_cache=self.metadata_cache, archive=self.archive),
+                depth=self.prefetch)
+        workers = []
+        try:
+            for n in range(self.max_workers):
+                t = threading.Thread(target=profiled(self._worker), args=(summary, pool, postprocess_pool),
+                                     name=f"spinova-batch-{n}", daemon=True)
+                t.start()
+                workers.append(t)
+            for t in workers:
+                t.join()
+            # 通信がすべて終わった後も、残っている後処理と（停止時は）展開スレッドの終了を待つ
+            with self._cond:
+                while self._postprocessing or self._expanding:
+                    self._cond.wait()
+                unsettled = [state["job"] for state in self._parents.values()]
+            # 停止でエントリが残った展開元のジョブは未着手に戻し、再開時に展開し直す
+            if self.job_queue is not None:
+                for job in unsettled:
+                    if job.job_id is not None:
+                        self.job_queue.mark_pending(job.job_id)
+        finally:
+            if self._prefetcher is not None:
+                self._prefetcher.close()
+                self._prefetcher = None
+            if postprocess_pool:
+                postprocess_pool.shutdown()
+            if pool:
+                pool.close()
+
+        summary.finished_at = time.time()
+        return summary
+
+    @property
+    def stopped(self):
+        return self._stopped
+
+    def stop(self):
+        """未開始のジョブを破棄する（実行中のジョブは完了まで続く）"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    def pause(self):
+        """未開始のジョブを破棄し、実行中のジョブも一時停止する（JobQueue 上は未着手に戻る）"""
+        self.stop()
+        with self._cond:
+            active = list(self._active.values())
+        for downloader in active:
+            downloader.pause()
+
+    def cancel(self):
+        """未開始のジョブを破棄し、実行中のジョブも中止する"""
+        self.stop()
+        with self._cond:
+            active = list(self._active.values())
+        for downloader in active:
+            downloader.cancel()
+
+    def pause_job(self, key):
+        """実行中の1件だけを一時停止する。該当するジョブがなければ False"""
+        with self._cond:
+            downloader = self._active.get(key)
+        if downloader is None:
+            return False
+        downloader.pause()
+        return True
+
+    @classmethod
+    def _job_key(cls, job):
+        if job.parent is not None:
+            return f"{cls._job_key(job.parent)}-{job.entry_index}"
+        return job.job_id if job.job_id is not None else job.index
+
+    @staticmethod
+    def _as_jobs(jobs):
+        for n, item in enumerate(jobs, 1):
+            if isinstance(item, BatchJob):
+                if not item.index:
+                    item.index = n
+                yield item
+            else:
+                yield BatchJob(item, index=n)
+
+    def _label(self, job):
+        total = self._total if self._total is not None else "?"
+        if job.parent is not None:
+            return f"{self._label(job.parent)}#{job.entry_index}"
+        return f"[{job.index}/{total}]"
+
+    def _log(self, message):
+        if self.log_callback:
+            try:
+                self.log_callback(message)
+            except Exception as e:
+                print(f"Batch log callback error: {e}")
+
+    def _fill_window(self):
+        # 先読みは max_workers の数倍までに抑え、巨大な入力でもメモリを圧迫しない。
+        # バックオフ中のホストのジョブは数えず、他のホストのジョブを読み進められるようにする（上限はその8倍）。
+        # ソースの読み込み（JobQueue・CSV）と key_of() は _cond の外で行い、その間も他のワーカーを止めない。
+        # 他のワーカーが読み込み中なら何もしない（ジョブを積むたびに起こされる）
+        if not self._source_lock.acquire(blocking=False):
+            return
+        try:
+            window = self.max_workers * 8
+            with self._cond:
+                backing_off = sum(len(queue) for host, queue in self._queues.items()
+                                  if self.limiter.backoff_remaining(host) > 0)
+            while True:
+                with self._cond:
+                    if (self._stopped or self._source_done
+                            or self._queued - backing_off >= window or self._queued >= window * 8):
+                        return
+                try:
+                    job = next(self._source)
+                except StopIteration:
+                    self._end_source()
+                    return
+                except Exception as e:
+                    # CSVの途中の読み込みエラーなど。読み込めた分のジョブは続ける
+                    self._log(f"ジョブの読み込みに失敗しました: {e}")
+                    self._end_source()
+                    return
+                host = self.limiter.key_of(job.url)
+                with self._cond:
+                    self._enqueue(job, host)
+                    self._cond.notify_all()
+                if self.limiter.backoff_remaining(host) > 0:
+                    backing_off += 1
+        finally:
+            self._source_lock.release()
+
+    def _end_source(self):
+        with self._cond:
+            self._source_done = True
+            self._cond.notify_all()
+
+    def _enqueue(self, job, host, front=False):
+        queue = self._queues.get(host)
+        if queue is None:
+            queue = self._queues[host] = deque()
+            self._hosts.append(host)
+        if front:
+            queue.appendleft((job, host))
+        else:
+            # 同じホストのキューの中も優先度の高い順に並べる（同じ優先度なら読み込んだ順）
+            priority = job.priority or 0
+            position = len(queue)
+            while position > 0 and (queue[position - 1][0].priority or 0) < priority:
+                position -= 1
+            queue.insert(position, (job, host))
+        self._queued += 1
+        self._report(ProgressRecord("queued", job_id=self._job_key(job), url=job.url, label=self._label(job)))
+
+    def _take(self):
+        # 空きのあるホストのうち、先頭のジョブの優先度が最も高いものを選ぶ（同じ優先度ならラウンドロビン）
+        chosen = None
+        for n, host in enumerate(self._hosts):
+            queue = self._queues[host]
+            if queue and self.limiter.available(host):
+                priority = queue[0][0].priority or 0
+                if chosen is None or priority > chosen[1]:
+                    chosen = (n, priority)
+        if chosen is None:
+            return None
+        n = chosen[0]
+        host = self._hosts[n]
+        # 選んだホストを末尾に回す
+        self._hosts.rotate(-(n + 1))
+        queue = self._queues[host]
+        self._queued -= 1
+        self.limiter.acquire(host)
+        job = queue.popleft()
+        if not queue:
+            del self._queues[host]
+            self._hosts.remove(host)
+        return job
+
+    def _schedule_prefetch(self):
+        # 次に取り出されるジョブ（各ホストの先頭を _take() と同じ優先度の高い順）を先読みする。
+        # 先読みの抽出もそのホストへの接続なので、ホストの枠を取って行い、終わるか取り消されたら返す。
+        # 空きのないホスト（バックオフ中を含む）には要求を送らない
+        if self._prefetcher is None:
+            return
+        heads = [(self._queues[host][0][0], host) for host in self._hosts if self._queues.get(host)]
+        heads.sort(key=lambda head: -(head[0].priority or 0))
+        for job, host in heads[:self.prefetch]:
+            if not self.limiter.available(host):
+                continue
+            self.limiter.acquire(host)
+            if not self._prefetcher.schedule(self._job_key(job), job.url, job.output_dir or self.output_dir,
+                                             job.format_code or self.format_code,
+                                             on_done=lambda host=host: self._release(host)):
+                self.limiter.release(host)
+
+    def _next_job(self):
+        while True:
+            self._fill_window()
+            with self._cond:
+                if self._stopped:
+                    return None
+                job = self._take()
+                if job:
+                    self._inflight += 1
+                    self._schedule_prefetch()
+                    # キューの空きを待っている展開スレッドを起こす
+                    self._cond.notify_all()
+                    return job
+                # 実行中のジョブがプレイリストだった場合に備え、展開の有無が決まるまでは終了しない
+                if (self._source_done and self._queued == 0
+                        and self._expanding == 0 and self._inflight == 0):
+                    return None
+                # バックオフ中のホストしか残っていなければ、最初に明けるまで待つ
+                self._cond.wait(self.limiter.next_ready(self._hosts))
+
+    def _release(self, host):
+        with self._cond:
+            self.limiter.release(host)
+            self._cond.notify_all()
+
+    def _retry_later(self, job, host, error):
+        """
+        スロットリングで失敗したジョブをホストのバックオフ後に再試行する。
+        再試行の上限に達した、またはバッチが停止された場合は False
+        """
+        key = self._job_key(job)
+        delay = self.limiter.penalize(host)
+        with self._cond:
+            attempt = self._retries.get(key, 0) + 1
+            if self._stopped or attempt > self.limiter.max_retries:
+                return False
+            self._retries[key] = attempt
+            # 枠を返す前に戻しておく（キューが空になったと判断したワーカーが終了しないように）
+            self._enqueue(job, host, front=True)
+        if self.job_queue is not None and job.job_id is not None:
+            self.job_queue.mark_pending(job.job_id)
+        self._log(f"{self._label(job)} スロットリングを検出 ({host}): {delay:.1f}秒後に再試行します "
+                  f"({attempt}/{self.limiter.max_retries}) エラー: {error}")
+        return True
+
+    def _worker(self, summary, pool, postprocess_pool=None):
+        while True:
+            entry = self._next_job()
+            if entry is None:
+                return
+            job, host = entry
+            if self.hooks is not None:
+                self._preprocess(job)
+            index, url = job.index, job.url
+            started = time.time()
+            record = (self.archive.lookup_url(url, job.format_code or self.format_code)
+                      if self.archive is not None else None)
+            if record:
+                result = BatchResult(index, url, True, skipped=True,
+                                     metrics=JobMetrics(job_id=self._job_key(job), url=url))
+                self._log(f"{self._label(job)} ダウンロード済みのためスキップ: {url}")
+                if self._prefetcher is not None:
+                    self._prefetcher.discard(self._job_key(job))
+                with self._cond:
+                    self._inflight -= 1
+                self._release(host)
+                self._finish(summary, job, result)
+                continue
+
+            if self.job_queue is not None and job.job_id is not None:
+                self.job_queue.mark_running(job.job_id)
+            self._report(ProgressRecord("started", job_id=self._job_key(job), url=url, label=self._label(job)))
+            # 一時停止・中止の要求が他のジョブに残らないよう、ダウンローダーはジョブごとに作る
+            downloader = VideoDownloader(
+                ffmpeg_path=self.ffmpeg_path,
+                yt_dlp_extra_opts=self.yt_dlp_extra_opts,
+                ydl_pool=pool,
+                metadata_cache=self.metadata_cache,
+                archive=self.archive,
+                progress_callback=self.progress_callback,
+                progress_interval=self.progress_interval,
+                bandwidth=self.bandwidth,
+                bandwidth_weight=weight_for_priority(job.priority),
+                postprocess_pool=postprocess_pool,
+                hooks=self.hooks,
+            )
+            key = self._job_key(job)
+            with self._cond:
+                self._active[key] = downloader
+            expansion = None
+            # 先読みの待ちと処理前の抽出は download_video() の外なので、ここで抽出の時間として測る
+            extract_started = time.monotonic()
+            extract_seconds = None
+            try:
+                self._log(f"{self._label(job)} ダウンロード開始: {url}")
+                info = self._prefetcher.take(key) if self._prefetcher is not None else None
+                prefetched = info is not None
+                if (not prefetched and self.expand_playlists
+                        and (self.metadata_cache is None or self.metadata_cache.get(url) is None)):
+                    expansion, info = self._probe(downloader, job)
+                extract_seconds = time.monotonic() - extract_started
+                if expansion is None:
+                    ok = downloader.download_video(url, output_dir=job.output_dir or self.output_dir,
+                                                   format_code=job.format_code or self.format_code,
+                                                   job_id=key, info=info, prefetched=prefetched)
+                    if not ok and downloader.stop_reason == PAUSED:
+                        result = BatchResult(index, url, False, error=Exception(downloader.last_error),
+                                             elapsed=time.time() - started, paused=True)
+                        self._log(f"{self._label(job)} 一時停止: {url}")
+                    elif not ok:
+                        raise Exception(downloader.last_error)
+                    else:
+                        result = BatchResult(index, url, True, elapsed=time.time() - started)
+                        if downloader.postprocess_future is None:
+                            self._log(f"{self._label(job)} ダウンロード成功: {url}")
+                        else:
+                            self._log(f"{self._label(job)} 通信完了、後処理を待機: {url}")
+            except Exception as e:
+                result = BatchResult(index, url, False, error=e, elapsed=time.time() - started)
+            finally:
+                with self._cond:
+                    self._active.pop(key, None)
+                    # 展開するジョブは _expanding に数えてから手放す
+                    if expansion is not None:
+                        self._expanding += 1
+                    self._inflight -= 1
+                    self._cond.notify_all()
+
+            if expansion is not None:
+                # エントリの読み込みは別スレッドで続け、このワーカーは見つかったエントリのダウンロードに回る。
+                # ホストの枠はここで返す（エントリも同じホストのジョブなので、持ったままだと展開が進まなくなる）
+                self.limiter.succeed(host)
+                self._release(host)
+                self._start_expansion(job, host, *expansion)
+                continue
+
+            result.metrics = downloader.metrics or JobMetrics(job_id=key, url=url)
+            if extract_seconds is None:
+                extract_seconds = time.monotonic() - extract_started
+            result.metrics.add("extract", extract_seconds)
+            if result.success:
+                self.limiter.succeed(host)
+            elif (not result.paused and downloader.stop_reason is None
+                    and HostLimiter.is_throttled(result.error)):
+                if self._retry_later(job, host, result.error):
+                    self._release(host)
+                    continue
+            if not result.success and not result.paused:
+                self._log(f"{self._label(job)} ダウンロード失敗: {url} エラー: {str(result.error)}")
+            self._release(host)
+            if result.success and downloader.postprocess_future is not None:
+                self._finish_after_postprocess(summary, job, downloader.postprocess_future, started, result.metrics)
+            else:
+                self._finish(summary, job, result)
+
+    def _preprocess(self, job):
+        key = self._job_key(job)
+        with self._cond:
+            if key in self._preprocessed:
+                return
+            self._preprocessed.add(key)
+        url = self.hooks.preprocess_url(job.url, job_id=key)
+        if url == job.url:
+            return
+        self._log(f"{self._label(job)} プラグインによりURLを変更: {job.url} -> {url}")
+        job.url = url
+        # 先読みした情報は変更前のURLのものなので使わない
+        if self._prefetcher is not None:
+            self._prefetcher.discard(key)
+
+    def _finish_after_postprocess(self, summary, job, future, started, metrics=None):
+        def done(f):
+            try:
+                error = f.exception()
+                if error is None:
+                    result = BatchResult(job.index, job.url, True, elapsed=time.time() - started, metrics=metrics)
+                    self._log(f"{self._label(job)} ダウンロード成功: {job.url}")
+                else:
+                    result = BatchResult(job.index, job.url, False, error=error, elapsed=time.time() - started,
+                                         metrics=metrics)
+                    self._log(f"{self._label(job)} 後処理失敗: {job.url} エラー: {str(error)}")
+                self._finish(summary, job, result)
+            finally:
+                with self._cond:
+                    self._postprocessing.discard(f)
+                    self._cond.notify_all()
+
+        with self._cond:
+            self._postprocessing.add(future)
+        future.add_done_callback(done)
+
+    def _probe(self, downloader, job):
+        """
+        URLを処理前の状態で抽出する。
+        プレイリストなら ((YoutubeDL を保持する ExitStack, ie_result), None)、動画なら (None, ie_result) を返す
+        """
+        stack = ExitStack()
+        ie_result = stack.enter_context(downloader.probe(
+            job.url, output_dir=job.output_dir or self.output_dir, format_code=job.format_code or self.format_code))
+        if is_playlist(ie_result):
+            return (stack, ie_result), None
+        stack.close()
+        return None, ie_result
+
+    def _start_expansion(self, job, host, stack, ie_result):
+        with self._cond:
+            self._parents[self._job_key(job)] = {
+                "job": job, "pending": 0, "failed": 0, "paused": 0,
+                "entries": 0, "expanded": False, "complete": False, "error": None,
+            }
+        threading.Thread(target=profiled(self._expand), args=(job, host, stack, ie_result),
+                         name="spinova-expand", daemon=True).start()
+
+    def _expand(self, job, host, stack, ie_result):
+        key = self._job_key(job)
+        state = self._parents[key]
+        window = self.max_workers * 8
+        count = 0
+        last_report = 0.0
+        try:
+            with stack:
+                entries = iter_entry_urls(ie_result.get("entries"))
+                while True:
+                    with self._cond:
+                        # 未着手のジョブが溜まりすぎないよう、ワーカーが追いつくまで次のページを読まない
+                        while not self._stopped and self._queued >= window:
+                            self._cond.wait()
+                        # 次のページの取得もホストの同時実行数とバックオフに従う。枠は取得の間だけ持つ
+                        while not self._stopped and not self.limiter.available(host):
+                            self._cond.wait(self.limiter.next_ready([host]))
+                        if self._stopped:
+                            break
+                        self.limiter.acquire(host)
+                    try:
+                        entry_url = next(entries, None)
+                    finally:
+                        self._release(host)
+                    if entry_url is None:
+                        state["complete"] = True
+                        break
+                    entry_host = self.limiter.key_of(entry_url)
+                    with self._cond:
+                        count += 1
+                        state["entries"] = count
+                        state["pending"] += 1
+                        child = BatchJob(entry_url, index=job.index, format_code=job.format_code,
+                                         output_dir=job.output_dir, priority=job.priority,
+                                         parent=job, entry_index=count)
+                        self._enqueue(child, entry_host)
+                        self._cond.notify_all()
+                    now = time.monotonic()
+                    if count == 1 or now - last_report >= (self.progress_interval or 0):
+                        last_report = now
+                        self._report(ProgressRecord("expanding", job_id=key, url=job.url, entries=count))
+        except Exception as e:
+            state["error"] = e
+
+        if state["error"] is not None:
+            self._log(f"{self._label(job)} プレイリストの展開に失敗: {job.url} エラー: {state['error']} "
+                      f"({count}件まで展開済み)")
+        elif state["complete"]:
+            self._log(f"{self._label(job)} プレイリストを展開: {job.url} ({count}件)")
+        else:
+            self._log(f"{self._label(job)} プレイリストの展開を中断: {job.url} ({count}件まで展開済み)")
+        self._report(ProgressRecord("expanded", job_id=key, url=job.url, entries=count))
+        with self._cond:
+            state["expanded"] = True
+        self._settle(key)
+        with self._cond:
+            self._expanding -= 1
+            self._cond.notify_all()
+
+    def _settle(self, key):
+        """展開を終え、すべてのエントリが終わった展開元のジョブを完了にする"""
+        with self._cond:
+            state = self._parents.get(key)
+            if state is None or not state["expanded"] or state["pending"] > 0:
+                return
+            del self._parents[key]
+        job = state["job"]
+        # 一時停止・停止で残ったエントリがあれば未着手に戻し、再開時に展開し直す（済んだエントリはアーカイブで飛ばされる）
+        paused = bool(state["paused"]) or not state["complete"] and state["error"] is None
+        failed = state["failed"] or state["error"] is not None
+        error = None
+        if failed:
+            error = state["error"] or f"{state['failed']} of {state['entries']} entries failed"
+        if self.job_queue is not None and job.job_id is not None:
+            if paused:
+                self.job_queue.mark_pending(job.job_id)
+            elif failed:
+                self.job_queue.mark_failed(job.job_id, str(error))
+            else:
+                self.job_queue.mark_done(job.job_id)
+        status = "paused" if paused else "failed" if failed else "done"
+        self._report(ProgressRecord(status, job_id=key, url=job.url, entries=state["entries"],
+                                    error=str(error) if error is not None else None))
+        if job.parent is not None:
+            self._entry_finished(job, success=not failed and not paused, paused=paused)
+
+    def _entry_finished(self, job, success, paused):
+        key = self._job_key(job.parent)
+        with self._cond:
+            state = self._parents.get(key)
+            if state is None:
+                return
+            state["pending"] -= 1
+            if paused:
+                state["paused"] += 1
+            elif not success:
+                state["failed"] += 1
+        self._settle(key)
+
+    def _report(self, record):
+        if self.progress_callback:
+            try:
+                self.progress_callback(record)
+            except Exception as e:
+                print(f"Progress callback error: {e}")
+
+    def _finish(self, summary, job, result):
+        if self.job_queue is not None and job.job_id is not None:
+            if result.paused:
+                self.job_queue.mark_pending(job.job_id)
+            elif result.success:
+                self.job_queue.mark_done(job.job_id)
+            else:
+                self.job_queue.mark_failed(job.job_id, str(result.error))
+        with self._cond:
+            summary.add(result)
+            retries = self._retries.pop(self._job_key(job), 0)
+        if result.metrics is not None:
+            result.metrics.retries = retries
+            result.metrics.finish(result.status, result.error)
+            if self.metrics is not None:
+                self.metrics.record(result.metrics)
+        self._report(ProgressRecord(result.status, job_id=self._job_key(job), url=job.url,
+                                    error=str(result.error) if result.error is not None else None))
+        if self.result_callback:
+            try:
+                self.result_callback(result)
+            except Exception as e:
+                print(f"Batch result callback error: {e}")
+        if job.parent is not None:
+            self._entry_finished(job, result.success, result.paused)
@@ -0,0 +1,90 @@
+import csv
+import hashlib
+import itertools
+import os
+
+from .job_queue import BatchJob
+
+# ヘッダー行の列名（小文字）と BatchJob の属性の対応
+COLUMN_ALIASES = {
+    "url": "url",
+    "urls": "url",
+    "link": "url",
+    "format": "format_code",
+    "format_code": "format_code",
+    "output_dir": "output_dir",
+    "output": "output_dir",
+    "dir": "output_dir",
+    "folder": "output_dir",
+    "priority": "priority",
+}
+# ヘッダー行がない場合の列の並び
+DEFAULT_COLUMNS = ("url", "format_code", "output_dir", "priority")
+
+
+def _priority(value):
+    try:
+        return int(value) if value else 0
+    except ValueError:
+        return 0
+
+
+def iter_csv_jobs(f, format_names=None):
+    """
+    CSV を1行ずつ読みながら BatchJob を返す（ファイル全体をメモリに読み込まない）。
+
+    1列目（ヘッダー行があれば url 列）の http(s) URL だけを対象にし、同じURLは最初の行だけを残す。
+    2〜4列目（ヘッダー行があれば format / output_dir / priority 列）で行ごとのフォーマット・保存先・優先度を
+    指定でき、空欄ならバッチ全体の設定を使う。format_names を渡すと、フォーマット名をフォーマット指定に置き換える。
+    """
+    format_names = format_names or {}
+    # 重複の判定にはURLそのものではなく短いダイジェストを保持し、巨大なファイルでもメモリを抑える
+    seen = set()
+    columns = DEFAULT_COLUMNS
+    first = True
+    for row in csv.reader(f):
+        if not row:
+            continue
+        cells = [cell.strip() for cell in row]
+        if first:
+            first = False
+            if (not any(cell.startswith("http") for cell in cells)
+                    and any(cell.lower() in COLUMN_ALIASES for cell in cells)):
+                columns = tuple(COLUMN_ALIASES.get(cell.lower()) for cell in cells)
+                continue
+        values = dict(zip(columns, cells))
+        url = values.get("url") or ""
+        if not url.startswith("http"):
+            continue
+        digest = hashlib.blake2b(url.encode("utf-8"), digest_size=16).digest()
+        if digest in seen:
+            continue
+        seen.add(digest)
+        format_code = values.get("format_code") or None
+        yield BatchJob(url, format_code=format_names.get(format_code, format_code),
+                       output_dir=values.get("output_dir") or None, priority=_priority(values.get("priority")))
+
+
+def iter_csv_file(path, format_names=None):
+    """iter_csv_jobs() のファイル版。Excel が付ける BOM も読み飛ばす"""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        yield from iter_csv_jobs(f, format_names)
+
+
+def resume_jobs(job_queue, batch_id, format_names=None):
+    """
+    中断したバッチの未完了のジョブを返す。
+    ソースのCSVを読み込む途中で止まっていた場合は、登録済みの行を飛ばして残りを読み込みながら登録する
+    """
+    batch = job_queue.get_batch(batch_id)
+    if batch is None:
+        return
+    yield from job_queue.iter_pending(batch_id)
+    source = batch["source"]
+    if not batch["loaded"] and source and os.path.isfile(source):
+        ingested = job_queue.job_count(batch_id)
+        rest = itertools.islice(iter_csv_file(source, format_names), ingested, None)
+        for job in job_queue.feed(batch_id, rest):
+            job.format_code = job.format_code or batch["format_code"]
+            job.output_dir = job.output_dir or batch["output_dir"]
+            yield job
@@ -1,23 +1,153 @@
+import glob
 import os
-import yt_dlp
+import threading
+import time
+from contextlib import contextmanager
+
+from .metrics import JobMetrics
+from .progress import ProgressCoalescer, ProgressRecord
+from .variants import SharedStreams, has_variants, join_variants
+from .ydl_pool import create_ydl
+
+# 中断の種類。一時停止は .part ファイルを残し、次回のダウンロードで続きから再開する
+PAUSED = 'paused'
+CANCELLED = 'cancelled'
 
 class VideoDownloader:
-    def __init__(self, progress_callback=None, ffmpeg_path=None, yt_dlp_extra_opts=None, cookie_path=None):
+    def __init__(self, progress_callback=None, ffmpeg_path=None, yt_dlp_extra_opts=None, cookie_path=None,
+                 ydl_pool=None, metadata_cache=None, archive=None, progress_interval=0.1,
+                 bandwidth=None, bandwidth_weight=1.0, postprocess_pool=None, hooks=None):
         self.progress_callback = progress_callback
         self.ffmpeg_path = ffmpeg_path
         self.yt_dlp_extra_opts = yt_dlp_extra_opts or {}
         self.cookie_path = cookie_path or os.path.join(os.getcwd(), 'cookie.txt')
+        # YoutubeDLPool を渡すと、同じ設定のインスタンスを使い回す
+        self.ydl_pool = ydl_pool
+        # MetadataCache を渡すと、取得済みのメタデータで抽出処理を省略する
+        self.metadata_cache = metadata_cache
+        # DownloadArchive を渡すと、ダウンロード済みの動画をネットワークアクセス前に除外する
+        self.archive = archive
+        # 進捗はジョブごとに最新状態だけを保持し、この間隔（秒）でまとめて通知する。0 以下なら間引かない
+        self.progress_interval = progress_interval
+        # BandwidthManager を渡すと、他のダウンロードと合わせた合計速度の上限に従う（重みで配分）
+        self.bandwidth = bandwidth
+        self.bandwidth_weight = bandwidth_weight
+        # PostProcessPool を渡すと、ffmpeg による結合などの後処理をそちらで実行し、
+        # download_video() は通信が終わった時点で戻る。後処理の完了は postprocess_future で待つ
+        self.postprocess_pool = postprocess_pool
+        self.postprocess_future = None
+        # PluginHooks を渡すと、抽出後の情報の確認と通信・後処理の完了時にプラグインのフックを呼ぶ
+        # （URLの前処理はアーカイブとの照合や先読みより前に行うため、呼び出し側で行う）
+        self.hooks = hooks
+        # 直前のダウンロードの計測値（JobMetrics）。後処理を別ワーカーで行う場合は、その完了時に後処理の時間が加わる
+        self.metrics = None
+        self._bytes_seen = {}
+        self._coalescer = None
+        self._current_url = None
+        self._current_job_id = None
+        self._stop_event = threading.Event()
+        self._stop_request = None
+        self._partial_files = set()
+        self._shared_streams = None
+        # 実行中のダウンロードのフォーマット指定（アーカイブはフォーマット指定ごとに記録する）
+        self._format_code = None
+        self.last_error = None
+        # 直前のダウンロードが中断された場合の理由（PAUSED / CANCELLED）
+        self.stop_reason = None
 
-    def download_video(self, url: str, output_dir: str = "downloads", format_code: str = "bestvideo+bestaudio/best"):
-        # 出力ディレクトリがなければ作成
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
+    def cancel(self):
+        """
+        実行中のダウンロードを中止し、途中までのファイルを削除する（別スレッドから呼び出し可）。
+        yt-dlp の処理は次の進捗フック呼び出しで止まる。実行中でなければ次回のダウンロードが中止される
+        """
+        self._request_stop(CANCELLED)
+
+    def pause(self):
+        """cancel() と同様に中断するが、.part ファイルは残して再開できるようにする"""
+        self._request_stop(PAUSED)
+
+    def _request_stop(self, reason):
+        if self._stop_request != CANCELLED:
+            self._stop_request = reason
+        self._stop_event.set()
+
+    @property
+    def stop_requested(self):
+        return self._stop_event.is_set()
+
+    def download_video(self, url: str, output_dir: str = "downloads", format_code: str = "bestvideo+bestaudio/best",
+                       job_id=None, info=None, prefetched=False):
+        # 進捗コールバックには ProgressRecord が渡される。job_id 省略時はURLを使う
+        # 成功（スキップ含む）なら True を返す。コールバックがない場合、失敗は例外になる
+        # 一時停止・中止された場合は False を返し、stop_reason に理由が入る
+        # info に probe() の結果など抽出済みの情報を渡すと、抽出を省略してダウンロードする
+        # 先に抽出しておいた情報（prefetched=True）で失敗した場合は、抽出からやり直す
+        # format_code にフォーマット指定のリスト（または "," 区切り）を渡すと、1回の抽出からそれぞれをダウンロードし、
+        # 共通するストリーム（MP4 の結合に使う音声と音声のみの出力など）は1回だけ通信する
+        format_code = join_variants(format_code)
+        self._format_code = format_code
+        self.last_error = None
+        self.stop_reason = None
+        self.postprocess_future = None
+        self._partial_files = set()
+        self._bytes_seen = {}
+        self._current_url = url
+        self._current_job_id = job_id if job_id is not None else url
+        self.metrics = JobMetrics(job_id=self._current_job_id, url=url)
+        # 最初の進捗フックまでを抽出の時間とする
+        self.metrics.begin('extract')
+        self._shared_streams = SharedStreams() if has_variants(format_code) else None
+        if self.progress_callback:
+            self._coalescer = ProgressCoalescer(self.progress_callback, self.progress_interval)
+        if self.bandwidth is not None:
+            self.bandwidth.register(self, self.bandwidth_weight)
+        try:
+            self._download_video(url, output_dir, format_code, info, prefetched)
+            return self.last_error is None
+        finally:
+            self._release_shared_streams()
+            self.metrics.end()
+            if self.bandwidth is not None:
+                self.bandwidth.unregister(self)
+            self._stop_event.clear()
+            self._stop_request = None
+            if self._coalescer is not None:
+                self._coalescer.close()
+                self._coalescer = None
+
+    def _release_shared_streams(self):
+        # 保留した中間ファイルは、別のワーカーで実行する後処理（結合）が終わってから削除する
+        streams, self._shared_streams = self._shared_streams, None
+        if streams is None:
+            return
+        if self.postprocess_future is not None:
+            self.postprocess_future.add_done_callback(lambda f: streams.cleanup())
+        else:
+            streams.cleanup()
 
+    @contextmanager
+    def probe(self, url, output_dir="downloads", format_code="bestvideo+bestaudio/best"):
+        """
+        ダウンロードせずに抽出し、yt-dlp の処理前の結果（ie_result）を返す。
+        プレイリスト・チャンネルの entries は読み進めたときにページごとに取得されるため、
+        読み終わるまで with を抜けないこと（その間 YoutubeDL を占有する）。
+        動画の場合は結果を download_video(info=...) に渡すと、抽出をやり直さずにダウンロードできる
+        """
+        with self._open_ydl(self._build_opts(output_dir, format_code)) as ydl:
+            ie_result = ydl.extract_info(url, download=False, process=False)
+            if ie_result is None:
+                # ignoreerrors 指定時は例外にならず None が返る
+                errors = getattr(ydl, 'error_messages', None)
+                raise Exception(f"[DownloadError] {errors[-1] if errors else 'yt-dlp reported an error'}")
+            yield ie_result
+
+    def _build_opts(self, output_dir, format_code):
         ydl_opts = {
             'format': format_code,
             'outtmpl': os.path.join(output_dir, '%(title)s.%(ext)s'),
             'ignoreerrors': True,
-            'progress_hooks': [self._progress_hook] if self.progress_callback else [],
+            # 中断要求もフック内で確認するため、進捗コールバックがなくても登録する
+            'progress_hooks': [self._progress_hook],
         }
 
         if self.ffmpeg_path:
@@ -29,31 +159,311 @@ class VideoDownloader:
         if self.yt_dlp_extra_opts:
             ydl_opts.update(self.yt_dlp_extra_opts)
 
+        if self.archive is not None:
+            # プレイリスト内の各動画も yt-dlp 側でアーカイブと照合される（同じフォーマット指定の記録だけ）
+            ydl_opts['download_archive'] = self.archive.for_format(format_code)
+
+        if self._shared_streams is not None:
+            ydl_opts['shared_streams'] = self._shared_streams
+            # yt-dlp は1つ目のフォーマットを終えた時点で動画をアーカイブに記録し、2つ目以降を除外してしまうため、
+            # アーカイブへの記録はすべてのフォーマットが終わってからこちらで行う（_store_info / _post_process）
+            ydl_opts.pop('download_archive', None)
+
+        if self.hooks is not None:
+            self._add_hook_opts(ydl_opts)
+        return ydl_opts
+
+    def _add_hook_opts(self, ydl_opts):
+        hooks = self.hooks
+        job_id = self._current_job_id
+        if hooks.has('filter_info'):
+            previous = ydl_opts.get('match_filter')
+            # yt-dlp はフォーマット選択の前後で同じ動画を2回確認するため、動画ごとに1回だけフックを呼ぶ
+            decided = {}
+
+            def match_filter(info, *, incomplete=False):
+                if callable(previous):
+                    reason = previous(info, incomplete=incomplete)
+                    if reason is not None:
+                        return reason
+                if incomplete:
+                    return None
+                key = (info.get('extractor_key'), info.get('id'))
+                if key not in decided:
+                    decided[key] = hooks.filter_info(info, job_id=job_id)
+                return decided[key]
+
+            ydl_opts['match_filter'] = match_filter
+        if hooks.has('post_download'):
+            ydl_opts['post_download_hook'] = lambda filename, info: hooks.post_download(filename, info, job_id=job_id)
+        if hooks.has('post_process'):
+            ydl_opts['post_process_hook'] = lambda info: hooks.post_process(info.get('filepath'), info, job_id=job_id)
+
+    def _download_video(self, url, output_dir, format_code, info=None, prefetched=False):
+        # yt_dlp はエクストラクタの登録だけで読み込みに時間がかかるため、最初のダウンロード時に読み込む
+        import yt_dlp
+
+        if self.archive is not None:
+            record = self.archive.lookup_url(url, format_code)
+            if record:
+                self._report_skipped(url, record)
+                return
+
+        if self.stop_requested:
+            self._handle_stopped(url)
+            return
+
+        # 出力ディレクトリがなければ作成
+        os.makedirs(output_dir, exist_ok=True)
+
+        ydl_opts = self._build_opts(output_dir, format_code)
+
+        if info is not None and self._download_with_info(url, ydl_opts, info,
+                                                         source='prefetch' if prefetched else 'probe'):
+            return
+
+        if self.metadata_cache is not None:
+            cached = self.metadata_cache.get(url)
+            if cached is not None and self._download_with_info(url, ydl_opts, cached, source='cache'):
+                return
+
         try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                ydl.download([url])
+            with self._open_ydl(ydl_opts) as ydl:
+                self._defer_postprocessing(ydl)
+                info = ydl.extract_info(
+                    url, force_generic_extractor=ydl.params.get('force_generic_extractor', False))
+                retcode = ydl._download_retcode
+                errors = list(getattr(ydl, 'error_messages', ()))
+                pending = self._take_deferred(ydl)
+                if info and not retcode:
+                    self._store_info(url, info)
+        except yt_dlp.utils.DownloadCancelled as e:
+            if self.stop_requested:
+                self._handle_stopped(url)
+            else:
+                self._handle_error('DownloadError', str(e), url)
+            return
         except yt_dlp.utils.DownloadError as e:
             self._handle_error('DownloadError', str(e), url)
+            return
         except yt_dlp.utils.ExtractorError as e:
             self._handle_error('ExtractorError', str(e), url)
+            return
         except Exception as e:
             self._handle_error('UnknownError', str(e), url)
+            return
+
+        if pending:
+            self._submit_postprocess(url, ydl_opts, pending)
+
+        # ignoreerrors 指定時は例外にならないため終了コードで失敗を判定する
+        # （HTTP 429 などを呼び出し側で判別できるよう、yt-dlp が報告した最後のエラーを返す）
+        if retcode:
+            self._handle_error('DownloadError', errors[-1] if errors else 'yt-dlp reported an error', url)
+
+    def _download_with_info(self, url, ydl_opts, info, source='cache'):
+        """
+        抽出済みの情報でダウンロードする。
+        source はキャッシュ（'cache'）、先読み（'prefetch'）、直前の抽出（'probe'）のいずれか。
+        キャッシュ・先読みの情報で失敗した場合は False を返し、呼び出し側で抽出からやり直す。
+        直前に抽出した情報での失敗はそのままエラーとして報告する（同じホストに二重に要求しないため）
+        """
+        fresh = source == 'probe'
+        try:
+            with self._open_ydl(ydl_opts) as ydl:
+                self._defer_postprocessing(ydl)
+                info = ydl.process_ie_result(info, download=True)
+                pending = self._take_deferred(ydl)
+                retcode = ydl._download_retcode
+                errors = list(getattr(ydl, 'error_messages', ()))
+                if not retcode:
+                    if source != 'cache':
+                        self._store_info(url, info)
+                    elif self.archive is not None:
+                        self._record_archive(url, info)
+        except Exception as e:
+            if self.stop_requested:
+                self._handle_stopped(url)
+                return True
+            if fresh:
+                self._handle_error('UnknownError', str(e), url)
+                return True
+            if source == 'cache':
+                print(f"キャッシュ済みメタデータでのダウンロードに失敗しました: {e}")
+            else:
+                print(f"先読みしたメタデータでのダウンロードに失敗しました: {e}")
+        else:
+            if pending and (not retcode or fresh):
+                self._submit_postprocess(url, ydl_opts, pending)
+            if not retcode:
+                return True
+            if fresh:
+                self._handle_error('DownloadError', errors[-1] if errors else 'yt-dlp reported an error', url)
+                return True
+
+        # 署名付きURLの期限切れなどに備え、キャッシュを破棄して通常の抽出からやり直す
+        if source == 'cache':
+            self.metadata_cache.invalidate(url)
+        return False
+
+    def _store_info(self, url, info):
+        if self.metadata_cache is not None:
+            self.metadata_cache.put(url, info)
+        if self.archive is not None:
+            self._record_archive(url, info)
+
+    def _record_archive(self, url, info):
+        if self._shared_streams is not None:
+            # 複数フォーマットのダウンロードでは yt-dlp に download_archive を渡していないため、代わりに登録する
+            self._add_archived(info)
+        self.archive.record(url, info, self._format_code)
+
+    def _add_archived(self, info):
+        if info.get('_type', 'video') == 'playlist':
+            for entry in info.get('entries') or []:
+                if entry:
+                    self._add_archived(entry)
+            return
+        extractor = info.get('extractor_key') or info.get('ie_key')
+        if extractor and info.get('id') is not None:
+            from yt_dlp.utils import make_archive_id
+            self.archive.add(make_archive_id(extractor, info['id']), self._format_code)
+
+    def _defer_postprocessing(self, ydl):
+        if self.postprocess_pool is not None and hasattr(ydl, 'deferred_postprocessing'):
+            ydl.deferred_postprocessing = []
+
+    @staticmethod
+    def _take_deferred(ydl):
+        pending = getattr(ydl, 'deferred_postprocessing', None) or []
+        if pending:
+            ydl.deferred_postprocessing = None
+        return pending
+
+    def _submit_postprocess(self, url, ydl_opts, pending):
+        # 空きを待つ間はこのスレッド（ダウンロード側）が止まり、後処理の滞留を抑える
+        self.postprocess_future = self.postprocess_pool.submit(self._run_postprocess, url, ydl_opts, pending,
+                                                               self.metrics)
+
+    def _run_postprocess(self, url, ydl_opts, pending, metrics=None):
+        """保留した post_process を別の YoutubeDL で実行する（後処理ワーカーのスレッドで呼ばれる）"""
+        started = time.monotonic()
+        try:
+            return self._post_process(url, ydl_opts, pending)
+        finally:
+            if metrics is not None:
+                metrics.add('postprocess', time.monotonic() - started)
+
+    def _post_process(self, url, ydl_opts, pending):
+        # post_download のフックは通信の終了時（保留した時点）に呼び出し済み
+        with self._open_ydl(dict(ydl_opts, post_download_hook=None)) as ydl:
+            for filename, info, files_to_move in pending:
+                # 結合処理などはダウンロードした YoutubeDL に紐づいているため付け替える
+                for pp in info.get('__postprocessors') or []:
+                    pp.set_downloader(ydl)
+                before = len(ydl.error_messages)
+                try:
+                    info = ydl.post_process(filename, info, files_to_move)
+                except Exception as e:
+                    # ignoreerrors が無効な場合は PostProcessingError が送出される
+                    ydl.error_messages.append(str(e))
+                if len(ydl.error_messages) > before:
+                    self._forget_archived(info, ydl_opts.get('format'))
+                elif self.archive is not None:
+                    self.archive.record(url if len(pending) == 1 else None, info, ydl_opts.get('format'))
+            errors = list(ydl.error_messages)
+        if errors:
+            raise Exception(f"[PostProcessingError] {errors[-1]}")
+        return True
+
+    def _forget_archived(self, info, format_code):
+        # yt-dlp は後処理の前にアーカイブへ記録するため、失敗したら取り消して次回やり直せるようにする
+        if self.archive is None or info.get('id') is None:
+            return
+        extractor = info.get('extractor_key') or info.get('ie_key')
+        if extractor:
+            from yt_dlp.utils import make_archive_id
+            self.archive.remove(make_archive_id(extractor, info['id']), format_code or "")
+
+    def _report_skipped(self, url, record):
+        if self.progress_callback:
+            self._emit(ProgressRecord('already_downloaded', job_id=self._current_job_id,
+                                      url=url, filename=record.get('filepath')))
+
+    def _open_ydl(self, ydl_opts):
+        if self.ydl_pool is not None:
+            return self.ydl_pool.lease(ydl_opts)
+        return create_ydl(ydl_opts)
 
     def _progress_hook(self, d):
+        if self.metrics is not None:
+            self.metrics.observe(d)
+        if d.get('tmpfilename'):
+            self._partial_files.add(d['tmpfilename'])
+        if self.bandwidth is not None and d.get('status') == 'downloading':
+            self._throttle(d)
+        if self._stop_event.is_set():
+            import yt_dlp
+            raise yt_dlp.utils.DownloadCancelled()
         if self.progress_callback:
-            try:
-                self.progress_callback(d)
-            except Exception as e:
-                # コールバック内例外は抑制しつつ報告
-                print(f"Progress callback error: {e}")
+            self._emit(ProgressRecord.from_hook(d, job_id=self._current_job_id, url=self._current_url))
+
+    def _throttle(self, d):
+        # 前回のフック呼び出しから増えたバイト数だけトークンを消費する（待つ間は次の読み込みが止まる）
+        name = d.get('tmpfilename') or d.get('filename')
+        downloaded = d.get('downloaded_bytes') or 0
+        last = self._bytes_seen.get(name)
+        self._bytes_seen[name] = downloaded
+        if last is not None and downloaded > last:
+            self.bandwidth.consume(self, downloaded - last, abort=self._stop_event)
+
+    def _emit(self, record):
+        if self._coalescer is not None:
+            self._coalescer.push(record.job_id, record)
+            return
+        try:
+            self.progress_callback(record)
+        except Exception as e:
+            # コールバック内例外は抑制しつつ報告
+            print(f"Progress callback error: {e}")
+
+    def _handle_stopped(self, url):
+        self.stop_reason = self._stop_request or CANCELLED
+        if self.stop_reason == PAUSED:
+            self.last_error = "[Paused] The download was paused"
+            if self.progress_callback:
+                partial = next(iter(self._partial_files), None)
+                self._emit(ProgressRecord(PAUSED, job_id=self._current_job_id, url=url, filename=partial))
+            return
+        self._remove_partial_files()
+        self._handle_error('Cancelled', 'The download was cancelled', url)
+
+    def _remove_partial_files(self):
+        remove_partial_files(self._partial_files)
+        self._partial_files = set()
 
     def _handle_error(self, error_type, error_message, url):
+        if self.stop_requested and self.stop_reason is None:
+            # 中断を要求した後のエラー（停止中の通信のタイムアウトなど）は中断として扱う
+            self._handle_stopped(url)
+            return
+        self.last_error = f"[{error_type}] {error_message}"
         if self.progress_callback:
-            self.progress_callback({
-                'status': 'error',
-                'error_type': error_type,
-                'error': error_message,
-                'url': url,
-            })
+            self._emit(ProgressRecord('error', job_id=self._current_job_id, url=url,
+                                      error_type=error_type, error=error_message))
         else:
-            raise Exception(f"[{error_type}] {error_message}")
+            raise Exception(self.last_error)
+
+
+def remove_partial_files(tmpfilenames):
+    """.part ファイルを削除する。断片ダウンロード（HLS/DASH）の一時ファイルと .ytdl もあわせて削除する"""
+    for tmpfilename in tmpfilenames:
+        if not tmpfilename:
+            continue
+        paths = [tmpfilename, tmpfilename + '.ytdl'] + glob.glob(glob.escape(tmpfilename) + '-Frag*')
+        for path in paths:
+            try:
+                if os.path.isfile(path):
+                    os.remove(path)
+            except OSError as e:
+                print(f"一時ファイルの削除に失敗しました: {path} - {e}")
@@ -0,0 +1,44 @@
+# プレイリスト・チャンネルの展開。
+# yt-dlp の処理前の抽出結果（extract_info(process=False)）の entries は、多くのエクストラクタで
+# 読み進めたときに1ページずつ取得されるジェネレータになっている。
+# これを順に読みながら各エントリを別のジョブとして流すと、全件の解決を待たずにダウンロードを始められる。
+
+import itertools
+
+PLAYLIST_TYPES = ('playlist', 'multi_video')
+
+# PagedList を読み進める単位（多くのエクストラクタの1ページの件数に合わせる）
+PAGE_CHUNK = 50
+
+
+def is_playlist(ie_result):
+    return bool(ie_result) and ie_result.get('_type') in PLAYLIST_TYPES
+
+
+def iter_entry_urls(entries):
+    """entries を読み進めながら各エントリのURLを返す。入れ子のプレイリストも展開する"""
+    if entries is None:
+        return
+    from yt_dlp.utils import PagedList
+
+    if isinstance(entries, PagedList):
+        entries = _iter_paged(entries)
+    for entry in entries:
+        if not entry:
+            continue
+        if entry.get('_type') in PLAYLIST_TYPES:
+            yield from iter_entry_urls(entry.get('entries'))
+            continue
+        # url 型（フラットな結果）は url、解決済みの動画は webpage_url がページのURL
+        url = entry.get('webpage_url') or entry.get('original_url') or entry.get('url')
+        if url and url.startswith('http'):
+            yield url
+
+
+def _iter_paged(entries):
+    # 範囲を指定しない getslice() は全ページを取得してから返すため、PAGE_CHUNK 件ずつ必要なページだけ取得する
+    for start in itertools.count(0, PAGE_CHUNK):
+        chunk = entries.getslice(start, start + PAGE_CHUNK)
+        yield from chunk
+        if len(chunk) < PAGE_CHUNK:
+            return
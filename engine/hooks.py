@@ -0,0 +1,293 @@
+"""
+プラグインがダウンロードの各段階に処理を差し込むためのフック。
+
+プラグインのモジュールに次の名前の関数を定義すると、その段階で呼ばれる（いずれも省略可）。
+
+    preprocess_url(url)
+        ダウンロード前（アーカイブとの照合・抽出より前）に呼ばれる。書き換えたURLを返すと、
+        以降の処理はそのURLで行う。None を返せば変更しない。
+        一時停止・再試行のたびに呼ばれることがあるため、同じURLに何度適用しても結果が変わらないようにすること。
+    filter_info(info)
+        抽出した動画の情報（フォーマット選択後）を受け取り、ダウンロードするかどうかを決める。
+        False か理由の文字列を返すとその動画をスキップする。None / True ならダウンロードする。
+    post_download(filename, info)
+        動画の通信が終わり、結合・変換などの後処理を始める前に呼ばれる。
+    post_process(filepath, info)
+        後処理が成功し、最終的なファイル（filepath）ができた後に呼ばれる。
+
+info は浅いコピーを渡すため、変更しても yt-dlp の処理には反映されない。
+複数のプラグインが同じフックを定義している場合は、プラグイン名の順に呼ぶ
+（preprocess_url は前のプラグインが書き換えたURLを次に渡す）。
+
+フックはダウンロードのスレッドではなく PluginHooks のワーカーで実行し、呼び出し元は1回につき
+最大 timeout 秒だけ待つ。時間内に終わらなかったフックは結果を使わずに先へ進み、
+max_timeouts 回続けて時間切れになったフックはこのセッションの間は呼ばない。
+"""
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+from .profiling import profiled
+
+# フックの名前（プラグインで定義する関数名）
+HOOKS = ("preprocess_url", "filter_info", "post_download", "post_process")
+
+
+class HookStats:
+    """プラグインのフック1つ分の計測値"""
+
+    __slots__ = ("plugin", "hook", "calls", "errors", "timeouts", "seconds", "max_seconds",
+                 "consecutive_timeouts", "disabled")
+
+    def __init__(self, plugin, hook):
+        self.plugin = plugin
+        self.hook = hook
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.consecutive_timeouts = 0
+        self.disabled = False
+
+    def to_dict(self):
+        return {
+            "plugin": self.plugin,
+            "hook": self.hook,
+            "calls": self.calls,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "seconds": round(self.seconds, 6),
+            "mean_seconds": round(self.seconds / self.calls, 6) if self.calls else None,
+            "max_seconds": round(self.max_seconds, 6),
+            "disabled": self.disabled,
+        }
+
+
+class _HookWorkers:
+    """
+    フックを実行するデーモンスレッドのプール。
+    時間切れのまま戻らないフックのスレッドは abandon() で数から外し、代わりのスレッドを起こす
+    （止まったプラグインが他のプラグインのフックの実行枠を使い切らないように）。
+    デーモンスレッドなので、終わらないフックがあってもプロセスの終了は妨げない
+    """
+
+    def __init__(self, max_workers=4):
+        self.max_workers = max(1, int(max_workers or 1))
+        self._lock = threading.Lock()
+        self._tasks = []
+        self._ready = threading.Condition(self._lock)
+        self._workers = 0
+        self._idle = 0
+        self._abandoned = set()
+        self._closed = False
+
+    def submit(self, fn, *args):
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("PluginHooks is closed")
+            self._tasks.append((future, fn, args))
+            self._wake()
+        return future
+
+    def abandon(self, future):
+        """実行中のまま時間切れになったタスクのスレッドを数から外す"""
+        with self._lock:
+            if future.done() or future in self._abandoned:
+                return
+            self._abandoned.add(future)
+            self._workers -= 1
+            if self._tasks:
+                self._wake()
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            tasks, self._tasks = self._tasks, []
+            self._ready.notify_all()
+        for future, _, _ in tasks:
+            future.cancel()
+
+    def _wake(self):
+        # ロックを保持した状態で呼ぶ
+        if self._idle:
+            self._ready.notify()
+        elif self._workers < self.max_workers:
+            self._workers += 1
+            threading.Thread(target=self._loop, name="spinova-plugin-hook", daemon=True).start()
+
+    def _loop(self):
+        while True:
+            with self._lock:
+                while not self._tasks and not self._closed:
+                    self._idle += 1
+                    self._ready.wait()
+                    self._idle -= 1
+                if self._closed:
+                    self._workers -= 1
+                    return
+                future, fn, args = self._tasks.pop(0)
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = fn(*args)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+            with self._lock:
+                if future in self._abandoned:
+                    # 代わりのスレッドがすでに動いているため、このスレッドは終える
+                    self._abandoned.discard(future)
+                    return
+
+
+class PluginHooks:
+    """
+    PluginManager のプラグインが定義したフックを、時間の上限つきで実行する。
+    どのプラグインがどのフックを持つかはマニフェストから判断し、モジュールはフックを初めて呼ぶときに読み込む。
+
+    timeout は1回の呼び出しで待つ秒数。時間切れ・例外のどちらでもダウンロードは続け、フックの結果は使わない。
+    フックごとの呼び出し回数・所要時間・時間切れの回数は stats() で取得でき、
+    metrics（MetricsCollector）を渡すとそちらにも記録する。
+    log_callback は時間切れやフックの無効化を知らせる文字列を受け取る（フックのワーカーからも呼ばれる）
+    """
+
+    def __init__(self, plugin_manager, timeout=5.0, max_timeouts=3, max_workers=4, metrics=None,
+                 log_callback=None):
+        self.plugin_manager = plugin_manager
+        self.timeout = max(0.001, float(timeout or 0))
+        self.max_timeouts = max(1, int(max_timeouts or 1))
+        self.metrics = metrics
+        self.log_callback = log_callback
+        self._workers = _HookWorkers(max_workers)
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._providers = {hook: plugin_manager.hook_providers(hook) for hook in HOOKS}
+
+    @property
+    def enabled(self):
+        return any(self._providers.values())
+
+    def has(self, hook):
+        return any(not self._stat(name, hook).disabled for name in self._providers.get(hook, ()))
+
+    def preprocess_url(self, url, job_id=None):
+        for name in self._active("preprocess_url"):
+            result = self._call(name, "preprocess_url", url, job_id=job_id)
+            if isinstance(result, str) and result.strip():
+                url = result.strip()
+        return url
+
+    def filter_info(self, info, job_id=None):
+        """ダウンロードしない場合はその理由の文字列、する場合は None を返す（yt-dlp の match_filter と同じ）"""
+        for name in self._active("filter_info"):
+            result = self._call(name, "filter_info", dict(info), job_id=job_id)
+            if result is False:
+                return f"{info.get('title') or info.get('id')} はプラグイン {name} によりスキップされました"
+            if isinstance(result, str):
+                return f"{result} ({name})"
+        return None
+
+    def post_download(self, filename, info, job_id=None):
+        self._notify("post_download", (filename, dict(info)), job_id)
+
+    def post_process(self, filepath, info, job_id=None):
+        self._notify("post_process", (filepath, dict(info)), job_id)
+
+    def stats(self):
+        with self._lock:
+            return [stat.to_dict() for stat in self._stats.values()]
+
+    def close(self):
+        self._workers.close()
+
+    def _active(self, hook):
+        return [name for name in self._providers.get(hook, ()) if not self._stat(name, hook).disabled]
+
+    def _stat(self, name, hook):
+        with self._lock:
+            stat = self._stats.get((name, hook))
+            if stat is None:
+                stat = self._stats[(name, hook)] = HookStats(name, hook)
+            return stat
+
+    def _notify(self, hook, args, job_id):
+        # 通知だけのフックは全プラグインに同時に渡し、まとめて timeout 秒まで待つ
+        calls = [(name, self._submit(name, hook, args)) for name in self._active(hook)]
+        deadline = time.monotonic() + self.timeout
+        for name, future in calls:
+            self._wait(name, hook, future, deadline - time.monotonic(), job_id)
+
+    def _call(self, name, hook, *args, job_id=None):
+        return self._wait(name, hook, self._submit(name, hook, args), self.timeout, job_id)
+
+    def _submit(self, name, hook, args):
+        return self._workers.submit(profiled(self._run), name, hook, args)
+
+    def _wait(self, name, hook, future, timeout, job_id):
+        try:
+            return future.result(timeout=max(0.0, timeout))
+        except FutureTimeout:
+            if future.cancel():
+                # 他のフックが実行枠を使っていて始まらなかった。このフックの時間切れとは数えない
+                self._log(f"プラグイン {name} の {hook} を実行できませんでした（フックの実行枠に空きがありません）")
+                return None
+            self._workers.abandon(future)
+            self._timed_out(name, hook, job_id)
+            return None
+        except Exception as e:
+            self._log(f"プラグイン {name} の {hook} でエラーが発生しました: {e}")
+            return None
+
+    def _run(self, name, hook, args):
+        """フックのワーカーで実行する。時間切れの後に終わった場合も所要時間を記録する"""
+        module = self.plugin_manager.activate(name)
+        function = getattr(module, hook, None) if module is not None else None
+        if function is None:
+            return None
+        started = time.monotonic()
+        outcome = "ok"
+        try:
+            return function(*args)
+        except Exception:
+            outcome = "error"
+            raise
+        finally:
+            seconds = time.monotonic() - started
+            stat = self._stat(name, hook)
+            with self._lock:
+                stat.calls += 1
+                stat.seconds += seconds
+                stat.max_seconds = max(stat.max_seconds, seconds)
+                if outcome == "error":
+                    stat.errors += 1
+                elif seconds <= self.timeout:
+                    stat.consecutive_timeouts = 0
+            if self.metrics is not None:
+                self.metrics.record_hook(name, hook, outcome, seconds)
+
+    def _timed_out(self, name, hook, job_id):
+        stat = self._stat(name, hook)
+        with self._lock:
+            stat.timeouts += 1
+            stat.consecutive_timeouts += 1
+            disable = not stat.disabled and stat.consecutive_timeouts >= self.max_timeouts
+            if disable:
+                stat.disabled = True
+        if self.metrics is not None:
+            self.metrics.record_hook(name, hook, "timeout")
+        target = f" (ジョブ {job_id})" if job_id is not None else ""
+        self._log(f"警告: プラグイン {name} の {hook} が {self.timeout:g} 秒以内に終わらなかったため結果を使わずに続行します{target}")
+        if disable:
+            self._log(f"警告: プラグイン {name} の {hook} は {self.max_timeouts} 回続けて時間切れになったため無効にしました")
+
+    def _log(self, message):
+        if self.log_callback:
+            try:
+                self.log_callback(message)
+                return
+            except Exception as e:
+                print(f"Hook log callback error: {e}")
+        print(message)
@@ -0,0 +1,243 @@
+import itertools
+import os
+import sqlite3
+import threading
+import time
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class BatchJob:
+    """バッチ内の1件分のジョブ"""
+
+    def __init__(self, url, index=0, job_id=None, format_code=None, output_dir=None, priority=0,
+                 parent=None, entry_index=None):
+        self.url = url
+        self.index = index
+        self.job_id = job_id
+        self.format_code = format_code
+        self.output_dir = output_dir
+        # 優先度（0 が標準）。大きいほど先に開始し、帯域も多く配分される
+        self.priority = priority
+        # プレイリスト・チャンネルを展開したエントリの場合、展開元のジョブとその中での番号
+        self.parent = parent
+        self.entry_index = entry_index
+
+
+class JobQueue:
+    """
+    バッチのジョブ状態（pending / running / done / failed）を SQLite に保存する永続キュー。
+    状態は変化のたびにコミットされるため、アプリが異常終了しても
+    次回は未完了のジョブから再開できる。
+    """
+
+    def __init__(self, path="data/job_queue.sqlite3"):
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS batches (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                source TEXT,
+                output_dir TEXT NOT NULL,
+                format_code TEXT NOT NULL,
+                total INTEGER NOT NULL DEFAULT 0,
+                created REAL NOT NULL,
+                finished REAL,
+                loaded INTEGER NOT NULL DEFAULT 1
+            );
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                batch_id INTEGER NOT NULL,
+                position INTEGER NOT NULL,
+                url TEXT NOT NULL,
+                state TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                updated REAL NOT NULL,
+                format_code TEXT,
+                output_dir TEXT,
+                priority INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_batch_state ON jobs (batch_id, state, position);
+        """)
+        # 行ごとの設定と読み込み途中の状態は後から追加した列なので、古いデータベースには足す
+        self._add_missing_columns("batches", {"loaded": "INTEGER NOT NULL DEFAULT 1"})
+        self._add_missing_columns("jobs", {"format_code": "TEXT", "output_dir": "TEXT",
+                                           "priority": "INTEGER NOT NULL DEFAULT 0"})
+        # 未完了のジョブを優先度順に読み出すための索引（priority 列を足した後に作る）
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_batch_priority "
+                           "ON jobs (batch_id, state, priority DESC, position)")
+        # 前回の異常終了で running のまま残ったジョブは未着手に戻す
+        self._conn.execute("UPDATE jobs SET state = ? WHERE state = ?", (PENDING, RUNNING))
+        self._conn.commit()
+
+    def _add_missing_columns(self, table, columns):
+        existing = {row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")}
+        for name, definition in columns.items():
+            if name not in existing:
+                self._conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+
+    def create_batch(self, urls, output_dir, format_code, source=None):
+        """urls（URL または BatchJob）をすべて登録してバッチIDを返す"""
+        batch_id = self.open_batch(output_dir, format_code, source=source)
+        for _ in self.feed(batch_id, urls):
+            pass
+        return batch_id
+
+    def open_batch(self, output_dir, format_code, source=None):
+        """空のバッチを作る。ジョブは feed() で読み込みながら登録する"""
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT INTO batches (source, output_dir, format_code, created, loaded) VALUES (?, ?, ?, ?, 0)",
+                (source, output_dir, format_code, time.time()))
+            self._conn.commit()
+        return cur.lastrowid
+
+    def feed(self, batch_id, jobs, chunk_size=512):
+        """
+        jobs（URL または BatchJob の iterable）を少しずつ登録しながら、job_id を付けた BatchJob を返す。
+        最初は1件ずつ登録してすぐに返し、以降はまとめる件数を chunk_size まで倍々に増やす
+        （巨大なCSVでも最初のダウンロードを待たせず、コミットの回数も抑える）。
+        最後まで登録するとバッチの total が確定し、途中で止まった場合は resume 時に続きから登録できる
+        """
+        with self._lock:
+            position = self._conn.execute(
+                "SELECT COALESCE(MAX(position), 0) FROM jobs WHERE batch_id = ?", (batch_id,)).fetchone()[0]
+        jobs = iter(jobs)
+        size = 1
+        while True:
+            chunk = [item if isinstance(item, BatchJob) else BatchJob(item)
+                     for item in itertools.islice(jobs, size)]
+            if not chunk:
+                break
+            now = time.time()
+            with self._lock:
+                for job in chunk:
+                    position += 1
+                    cur = self._conn.execute(
+                        "INSERT INTO jobs (batch_id, position, url, state, updated, format_code, output_dir, priority) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (batch_id, position, job.url, PENDING, now, job.format_code, job.output_dir,
+                         job.priority or 0))
+                    job.job_id = cur.lastrowid
+                    job.index = position
+                self._conn.execute("UPDATE batches SET total = ? WHERE id = ?", (position, batch_id))
+                self._conn.commit()
+            yield from chunk
+            size = min(size * 2, chunk_size)
+        with self._lock:
+            self._conn.execute("UPDATE batches SET total = ?, loaded = 1 WHERE id = ?", (position, batch_id))
+            self._conn.commit()
+
+    def get_batch(self, batch_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, source, output_dir, format_code, total, created, finished, loaded "
+                "FROM batches WHERE id = ?", (batch_id,)).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("id", "source", "output_dir", "format_code", "total", "created", "finished", "loaded"),
+                        row))
+
+    def job_count(self, batch_id):
+        """登録済みのジョブ数（状態を問わない）"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM jobs WHERE batch_id = ?", (batch_id,)).fetchone()[0]
+
+    def unfinished_batches(self):
+        """未完了のバッチを新しい順に返す（ソースの読み込みが途中のバッチも含む）"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT b.id, b.source, b.total, "
+                "COALESCE(SUM(CASE WHEN j.state IN (?, ?) THEN 1 ELSE 0 END), 0), b.loaded "
+                "FROM batches b LEFT JOIN jobs j ON j.batch_id = b.id "
+                "WHERE b.finished IS NULL GROUP BY b.id ORDER BY b.id DESC",
+                (PENDING, RUNNING)).fetchall()
+        return [{"id": r[0], "source": r[1], "total": r[2], "remaining": r[3], "loaded": bool(r[4])}
+                for r in rows if r[3] or (not r[4] and r[1] and os.path.isfile(r[1]))]
+
+    def iter_pending(self, batch_id, page_size=500):
+        """未完了のジョブを優先度の高い順（同じ優先度なら position 順）に少しずつ読み出す"""
+        batch = self.get_batch(batch_id)
+        if batch is None:
+            return
+        # 読み出し済みの最後の (priority, position)。次のページはその後から続ける
+        last_priority, last_position = None, 0
+        while True:
+            with self._lock:
+                if last_priority is None:
+                    rows = self._conn.execute(
+                        "SELECT id, position, url, format_code, output_dir, priority FROM jobs "
+                        "WHERE batch_id = ? AND state IN (?, ?) "
+                        "ORDER BY priority DESC, position LIMIT ?",
+                        (batch_id, PENDING, RUNNING, page_size)).fetchall()
+                else:
+                    rows = self._conn.execute(
+                        "SELECT id, position, url, format_code, output_dir, priority FROM jobs "
+                        "WHERE batch_id = ? AND state IN (?, ?) "
+                        "AND (priority < ? OR (priority = ? AND position > ?)) "
+                        "ORDER BY priority DESC, position LIMIT ?",
+                        (batch_id, PENDING, RUNNING, last_priority, last_priority, last_position,
+                         page_size)).fetchall()
+            if not rows:
+                return
+            for job_id, position, url, format_code, output_dir, priority in rows:
+                # 行ごとの指定がなければバッチ全体の設定を使う
+                yield BatchJob(url, index=position, job_id=job_id,
+                               format_code=format_code or batch["format_code"],
+                               output_dir=output_dir or batch["output_dir"], priority=priority or 0)
+            last_priority, last_position = rows[-1][5], rows[-1][1]
+
+    def counts(self, batch_id):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT state, COUNT(*) FROM jobs WHERE batch_id = ? GROUP BY state",
+                (batch_id,)).fetchall()
+        return dict(rows)
+
+    def mark_running(self, job_id):
+        self._set_state(job_id, RUNNING, increment=True)
+
+    def mark_pending(self, job_id):
+        """一時停止したジョブを未着手に戻す（再開時に続きからダウンロードされる）"""
+        self._set_state(job_id, PENDING)
+
+    def mark_done(self, job_id):
+        self._set_state(job_id, DONE)
+
+    def mark_failed(self, job_id, error=None):
+        self._set_state(job_id, FAILED, error=error)
+
+    def reset_running(self, batch_id):
+        """強制停止などで running のまま残ったジョブを未着手に戻す"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET state = ? WHERE batch_id = ? AND state = ?",
+                (PENDING, batch_id, RUNNING))
+            self._conn.commit()
+
+    def finish_batch(self, batch_id):
+        with self._lock:
+            self._conn.execute("UPDATE batches SET finished = ? WHERE id = ?", (time.time(), batch_id))
+            self._conn.commit()
+
+    def _set_state(self, job_id, state, error=None, increment=False):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET state = ?, error = ?, updated = ?, attempts = attempts + ? WHERE id = ?",
+                (state, error, time.time(), 1 if increment else 0, job_id))
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,53 @@
+import logging
+import logging.handlers
+import os
+import queue
+
+# メッセージの内容からログレベルを推定するための語（バッチや単体ダウンロードのログは文字列で届くため）
+_ERROR_WORDS = ("失敗", "エラー", "error", "failed")
+_WARNING_WORDS = ("警告", "スロットリング", "中断", "一時停止", "warning")
+
+
+def guess_level(message):
+    text = str(message).lower()
+    if any(word in text for word in _ERROR_WORDS):
+        return logging.ERROR
+    if any(word in text for word in _WARNING_WORDS):
+        return logging.WARNING
+    return logging.INFO
+
+
+class FileLog:
+    """
+    ログの全履歴をサイズでローテーションするファイルに書き出す。
+    書き込みは QueueListener のスレッドで行い、呼び出し元（GUI のスレッド）をディスクの入出力で待たせない
+    """
+
+    def __init__(self, path="logs/spinova.log", max_bytes=5 * 1024 * 1024, backups=3):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups,
+                                                             encoding="utf-8")
+        self._handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)-7s %(message)s"))
+        self._queue = queue.SimpleQueue()
+        self._listener = logging.handlers.QueueListener(self._queue, self._handler)
+        self._listener.start()
+        # 他のロガーの設定（ルートロガー）に影響しないよう、専用のロガーを使う
+        self._queue_handler = logging.handlers.QueueHandler(self._queue)
+        self.logger = logging.getLogger(f"spinova.file.{id(self)}")
+        self.logger.propagate = False
+        self.logger.setLevel(logging.DEBUG)
+        self.logger.addHandler(self._queue_handler)
+
+    def write(self, message, level=None):
+        self.logger.log(guess_level(message) if level is None else level, message)
+
+    def close(self):
+        """未書き込みのログを書き出してファイルを閉じる"""
+        if self._listener is not None:
+            self.logger.removeHandler(self._queue_handler)
+            self._listener.stop()
+            self._listener = None
+            self._handler.close()
@@ -0,0 +1,99 @@
+import functools
+import threading
+from urllib.parse import urlparse
+
+# 一度も一致したことがなく、続けてこの回数だけどのエクストラクタにも一致しなかったホストは、
+# 対応するものがないとみなして照合を省く
+# （直接のファイルを配信するサーバーなど。1件あたり全エクストラクタの正規表現を試すと数ミリ秒かかる）
+MISS_LIMIT = 8
+# ホストごとの記録の上限（超えたら記録し直す）
+MAX_HOSTS = 4096
+
+# ホスト -> [一致したことのあるエクストラクタの (一覧での順番, クラス), 続けて一致しなかった回数]
+_hosts = {}
+_hosts_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=1)
+def _extractor_classes():
+    # yt_dlp のエクストラクタ一覧は読み込みが重いため、初回の照合時に読み込む
+    from yt_dlp.extractor import gen_extractor_classes
+
+    # Generic は何にでもマッチするため対象外
+    return [ie for ie in gen_extractor_classes() if ie.ie_key() != 'Generic']
+
+
+def _host_of(url):
+    try:
+        host = urlparse(url).hostname or ""
+    except ValueError:
+        return ""
+    host = host.lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def _match(ie, url):
+    """一致すれば (extractor_key, video_id) か None、一致しなければ False"""
+    try:
+        if not ie.suitable(url):
+            return False
+        video_id = ie.get_temp_id(url)
+    except Exception:
+        return False
+    return (ie.ie_key(), str(video_id)) if video_id else None
+
+
+@functools.lru_cache(maxsize=8192)
+def resolve_media_id(url):
+    """
+    URLから (extractor_key, video_id) をネットワークアクセスなしで求める。
+    対応するエクストラクタがない、またはIDを抽出できない場合は None。
+
+    同じホストで一致したことのあるエクストラクタを先に試し、一度も一致せずに一致しないことが続いたホストは照合を省く。
+    省いた場合も None になるだけで、アーカイブはURLそのもので、同時実行数はホスト名で数える
+    """
+    host = _host_of(url)
+    with _hosts_lock:
+        state = _hosts.get(host)
+        hits = list(state[0]) if state else []
+        # 一致したことのあるホストでは、まだ一致していない形のURL（/playlist など）のために常に全体を照合する
+        skip = bool(state) and not hits and state[1] >= MISS_LIMIT
+    for _, ie in hits:
+        result = _match(ie, url)
+        if result is not False:
+            with _hosts_lock:
+                state = _hosts.get(host)
+                if state is not None:
+                    state[1] = 0
+            return result
+    if skip:
+        return None
+
+    for n, ie in enumerate(_extractor_classes()):
+        result = _match(ie, url)
+        if result is False:
+            continue
+        with _hosts_lock:
+            state = _hosts.setdefault(host, [[], 0])
+            state[1] = 0
+            if all(index != n for index, _ in state[0]):
+                state[0].append((n, ie))
+                state[0].sort(key=lambda hit: hit[0])
+        return result
+
+    with _hosts_lock:
+        if len(_hosts) >= MAX_HOSTS and host not in _hosts:
+            _hosts.clear()
+        _hosts.setdefault(host, [[], 0])[1] += 1
+    return None
+
+
+def media_id_from_info(info):
+    """抽出済みの info dict から (extractor_key, video_id) を求める"""
+    if not info:
+        return None
+    extractor = info.get('extractor_key') or info.get('ie_key')
+    video_id = info.get('id')
+    if not extractor or video_id is None:
+        return None
+    return extractor, str(video_id)
@@ -0,0 +1,164 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from .media_id import resolve_media_id, media_id_from_info
+
+# エクストラクタごとの有効期限（秒）。動画URLに署名付きの期限があるサイトは短めにする
+DEFAULT_EXTRACTOR_TTLS = {
+    'Youtube': 3 * 60 * 60,
+}
+
+
+class MetadataCache:
+    """
+    extract_info の結果を (extractor_key, video_id) 単位で保存するディスクキャッシュ。
+    info dict は JSON を zlib 圧縮して SQLite に格納し、
+    合計サイズが max_bytes を超えたら最終アクセスの古いものから削除する。
+    """
+
+    def __init__(self, path="cache/metadata.sqlite3", max_bytes=64 * 1024 * 1024,
+                 default_ttl=60 * 60, extractor_ttls=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.extractor_ttls = dict(DEFAULT_EXTRACTOR_TTLS)
+        if extractor_ttls:
+            self.extractor_ttls.update(extractor_ttls)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS metadata (
+                extractor TEXT NOT NULL,
+                video_id TEXT NOT NULL,
+                data BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL,
+                PRIMARY KEY (extractor, video_id)
+            );
+            CREATE INDEX IF NOT EXISTS idx_metadata_accessed ON metadata (accessed);
+            CREATE TABLE IF NOT EXISTS url_alias (
+                url TEXT PRIMARY KEY,
+                extractor TEXT NOT NULL,
+                video_id TEXT NOT NULL
+            );
+        """)
+        self._conn.commit()
+
+    def ttl_for(self, extractor):
+        return self.extractor_ttls.get(extractor, self.default_ttl)
+
+    def _key_for_url(self, url):
+        key = resolve_media_id(url)
+        if key:
+            return key
+        row = self._conn.execute(
+            "SELECT extractor, video_id FROM url_alias WHERE url = ?", (url,)).fetchone()
+        return tuple(row) if row else None
+
+    def get(self, url):
+        """キャッシュ済みの info dict を返す。期限切れ・未登録なら None"""
+        with self._lock:
+            key = self._key_for_url(url)
+            row = None
+            if key:
+                row = self._conn.execute(
+                    "SELECT data, created FROM metadata WHERE extractor = ? AND video_id = ?",
+                    key).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            data, created = row
+            now = time.time()
+            if now - created > self.ttl_for(key[0]):
+                self._conn.execute(
+                    "DELETE FROM metadata WHERE extractor = ? AND video_id = ?", key)
+                self._conn.commit()
+                self.misses += 1
+                return None
+
+            self._conn.execute(
+                "UPDATE metadata SET accessed = ? WHERE extractor = ? AND video_id = ?",
+                (now, *key))
+            self._conn.commit()
+
+        try:
+            info = json.loads(zlib.decompress(data))
+        except Exception as e:
+            print(f"メタデータキャッシュの読み込みに失敗しました: {e}")
+            self.invalidate(url)
+            return None
+        self.hits += 1
+        return info
+
+    def put(self, url, info):
+        """info dict を保存する。プレイリストなど単一動画以外は保存しない"""
+        if not info or info.get('_type', 'video') != 'video':
+            return
+        key = media_id_from_info(info)
+        if not key:
+            return
+
+        import yt_dlp
+        sanitized = yt_dlp.YoutubeDL.sanitize_info(dict(info), remove_private_keys=True)
+        data = zlib.compress(json.dumps(sanitized, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO metadata (extractor, video_id, data, size, created, accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (*key, data, len(data), now, now))
+            if url and resolve_media_id(url) != key:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO url_alias (url, extractor, video_id) VALUES (?, ?, ?)",
+                    (url, *key))
+            self._evict()
+            self._conn.commit()
+
+    def invalidate(self, url):
+        with self._lock:
+            key = self._key_for_url(url)
+            if key:
+                self._conn.execute(
+                    "DELETE FROM metadata WHERE extractor = ? AND video_id = ?", key)
+                self._conn.commit()
+
+    def total_bytes(self):
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM metadata").fetchone()[0]
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM metadata").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        while total > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT extractor, video_id, size FROM metadata ORDER BY accessed ASC LIMIT 64").fetchall()
+            if not rows:
+                break
+            for extractor, video_id, size in rows:
+                if total <= self.max_bytes:
+                    break
+                self._conn.execute(
+                    "DELETE FROM metadata WHERE extractor = ? AND video_id = ?", (extractor, video_id))
+                total -= size
+        self._conn.execute(
+            "DELETE FROM url_alias WHERE NOT EXISTS (SELECT 1 FROM metadata m "
+            "WHERE m.extractor = url_alias.extractor AND m.video_id = url_alias.video_id)")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,311 @@
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+
+# ジョブの処理段階。抽出（ページの取得・解析）、通信、後処理（結合・変換・移動）
+PHASES = ('extract', 'transfer', 'postprocess')
+
+# 所要時間（秒）と平均速度（バイト/秒）のヒストグラムの区切り
+DURATION_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+THROUGHPUT_BUCKETS = tuple(1024 * 2 ** n for n in range(0, 20, 2))
+# プラグインのフックの所要時間（秒）の区切り
+HOOK_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30)
+
+_ERROR_CLASS_RE = re.compile(r'^\[(\w+)\]')
+
+
+def error_class(error):
+    """'[DownloadError] ...' 形式のエラーから分類名を取り出す。形式が違えば例外のクラス名"""
+    if error is None:
+        return None
+    match = _ERROR_CLASS_RE.match(str(error))
+    if match:
+        return match.group(1)
+    return type(error).__name__ if isinstance(error, BaseException) else 'UnknownError'
+
+
+class JobMetrics:
+    """
+    1件のジョブの計測値。VideoDownloader が進捗フックから段階ごとの時間・バイト数・速度を記録し、
+    バッチ側が再試行回数と最終的な状態を書き込む
+    """
+
+    def __init__(self, job_id=None, url=None, clock=time.monotonic):
+        self.job_id = job_id
+        self.url = url
+        self.clock = clock
+        self.seconds = dict.fromkeys(PHASES, 0.0)
+        self.peak_speed = None
+        self.retries = 0
+        self.status = None
+        self.error_class = None
+        self._file_bytes = {}
+        self._phase = None
+        self._since = None
+
+    def begin(self, phase):
+        """現在の段階を閉じて phase を始める"""
+        self.end()
+        self._phase = phase
+        self._since = self.clock()
+
+    def end(self):
+        if self._phase is not None:
+            self.seconds[self._phase] += self.clock() - self._since
+            self._phase = None
+
+    def add(self, phase, seconds):
+        self.seconds[phase] += seconds
+
+    def observe(self, d):
+        """yt-dlp の進捗フック引数を受け取る"""
+        status = d.get('status')
+        name = d.get('filename')
+        if status == 'downloading':
+            if self._phase != 'transfer':
+                self.begin('transfer')
+            self._file_bytes[name] = d.get('downloaded_bytes') or 0
+            speed = d.get('speed')
+            if speed and (self.peak_speed is None or speed > self.peak_speed):
+                self.peak_speed = speed
+        elif status == 'finished':
+            self._file_bytes[name] = (d.get('total_bytes') or d.get('downloaded_bytes')
+                                      or self._file_bytes.get(name, 0))
+            # 映像と音声を別々に取得する場合は、次のファイルの通信が始まった時点で transfer に戻る
+            self.begin('postprocess')
+
+    @property
+    def bytes(self):
+        return sum(self._file_bytes.values())
+
+    @property
+    def average_speed(self):
+        if self.seconds['transfer'] > 0:
+            return self.bytes / self.seconds['transfer']
+        return None
+
+    def finish(self, status, error=None):
+        self.end()
+        self.status = status
+        self.error_class = error_class(error)
+
+    def to_dict(self):
+        return {
+            'job_id': self.job_id,
+            'url': self.url,
+            'status': self.status,
+            'error_class': self.error_class,
+            'retries': self.retries,
+            'bytes': self.bytes,
+            'average_speed': self.average_speed,
+            'peak_speed': self.peak_speed,
+            **{f'{phase}_seconds': round(value, 6) for phase, value in self.seconds.items()},
+        }
+
+
+class _Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for n, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[n] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name, labels=''):
+        sep = ',' if labels else ''
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels}{sep}le="{bound:g}"}} {cumulative}'
+        yield f'{name}_bucket{{{labels}{sep}le="+Inf"}} {self.count}'
+        suffix = f'{{{labels}}}' if labels else ''
+        yield f'{name}_sum{suffix} {self.sum:.6f}'
+        yield f'{name}_count{suffix} {self.count}'
+
+
+class MetricsCollector:
+    """
+    ジョブの計測値を集計し、Prometheus のテキスト形式（node_exporter の textfile collector 用）と
+    JSON のサマリーで書き出す。record() はどのスレッドから呼んでもよい。
+
+    prometheus_path を指定すると、record() のたびに最短 write_interval 秒間隔でファイルを更新する。
+    json_path は flush()（バッチの終了時など）で書き出す。JSON に含めるジョブは直近 keep_jobs 件まで
+    """
+
+    def __init__(self, prometheus_path=None, json_path=None, write_interval=5.0, keep_jobs=1000,
+                 clock=time.monotonic):
+        self.prometheus_path = prometheus_path or None
+        self.json_path = json_path or None
+        self.write_interval = write_interval
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._jobs = deque(maxlen=keep_jobs)
+        self._status = {}
+        self._errors = {}
+        self._bytes = 0
+        self._retries = 0
+        self._peak_speed = 0.0
+        self._phases = {phase: _Histogram(DURATION_BUCKETS) for phase in PHASES}
+        self._throughput = _Histogram(THROUGHPUT_BUCKETS)
+        # プラグインのフックの所要時間（フック名ごと）と、結果（ok / error / timeout）ごとの呼び出し回数
+        self._hook_seconds = {}
+        self._hook_calls = {}
+        self._started = time.time()
+        self._written = None
+
+    def record(self, metrics):
+        with self._lock:
+            self._jobs.append(metrics.to_dict())
+            self._status[metrics.status] = self._status.get(metrics.status, 0) + 1
+            if metrics.error_class:
+                self._errors[metrics.error_class] = self._errors.get(metrics.error_class, 0) + 1
+            self._bytes += metrics.bytes
+            self._retries += metrics.retries
+            if metrics.peak_speed:
+                self._peak_speed = max(self._peak_speed, metrics.peak_speed)
+            # スキップしたジョブは処理していないため、時間と速度の分布には含めない
+            if metrics.status != 'skipped':
+                for phase, seconds in metrics.seconds.items():
+                    self._phases[phase].observe(seconds)
+            if metrics.average_speed:
+                self._throughput.observe(metrics.average_speed)
+            due = (self.prometheus_path is not None
+                   and (self._written is None or self.clock() - self._written >= self.write_interval))
+            if due:
+                self._written = self.clock()
+        if due:
+            self._write(self.prometheus_path, self.to_prometheus())
+
+    def record_hook(self, plugin, hook, outcome, seconds=None):
+        """プラグインのフック1回分を記録する（PluginHooks から呼ばれる）。時間切れは終わった時点で別に記録される"""
+        with self._lock:
+            key = (plugin, hook, outcome)
+            self._hook_calls[key] = self._hook_calls.get(key, 0) + 1
+            if seconds is not None:
+                histogram = self._hook_seconds.get(hook)
+                if histogram is None:
+                    histogram = self._hook_seconds[hook] = _Histogram(HOOK_BUCKETS)
+                histogram.observe(seconds)
+
+    def to_prometheus(self):
+        with self._lock:
+            lines = [
+                '# HELP spinova_jobs_total Finished download jobs by final status.',
+                '# TYPE spinova_jobs_total counter',
+            ]
+            lines += [f'spinova_jobs_total{{status="{status}"}} {count}'
+                      for status, count in sorted(self._status.items())]
+            lines += [
+                '# HELP spinova_job_errors_total Failed download jobs by error class.',
+                '# TYPE spinova_job_errors_total counter',
+            ]
+            lines += [f'spinova_job_errors_total{{error_class="{name}"}} {count}'
+                      for name, count in sorted(self._errors.items())]
+            lines += [
+                '# HELP spinova_downloaded_bytes_total Bytes transferred by download jobs.',
+                '# TYPE spinova_downloaded_bytes_total counter',
+                f'spinova_downloaded_bytes_total {self._bytes}',
+                '# HELP spinova_job_retries_total Retries after throttling.',
+                '# TYPE spinova_job_retries_total counter',
+                f'spinova_job_retries_total {self._retries}',
+                '# HELP spinova_job_peak_speed_bytes Highest transfer speed seen in a single job.',
+                '# TYPE spinova_job_peak_speed_bytes gauge',
+                f'spinova_job_peak_speed_bytes {self._peak_speed:.1f}',
+                '# HELP spinova_job_phase_seconds Time spent per job in each phase.',
+                '# TYPE spinova_job_phase_seconds histogram',
+            ]
+            for phase, histogram in self._phases.items():
+                lines += histogram.lines('spinova_job_phase_seconds', f'phase="{phase}"')
+            lines += [
+                '# HELP spinova_job_throughput_bytes Average transfer speed per job in bytes per second.',
+                '# TYPE spinova_job_throughput_bytes histogram',
+            ]
+            lines += self._throughput.lines('spinova_job_throughput_bytes')
+            if self._hook_calls:
+                lines += [
+                    '# HELP spinova_plugin_hook_calls_total Plugin hook calls by outcome.',
+                    '# TYPE spinova_plugin_hook_calls_total counter',
+                ]
+                lines += [f'spinova_plugin_hook_calls_total{{plugin="{plugin}",hook="{hook}",outcome="{outcome}"}} {count}'
+                          for (plugin, hook, outcome), count in sorted(self._hook_calls.items())]
+                lines += [
+                    '# HELP spinova_plugin_hook_seconds Time spent in plugin hooks.',
+                    '# TYPE spinova_plugin_hook_seconds histogram',
+                ]
+                for hook, histogram in sorted(self._hook_seconds.items()):
+                    lines += histogram.lines('spinova_plugin_hook_seconds', f'hook="{hook}"')
+        return '\n'.join(lines) + '\n'
+
+    def summary(self):
+        with self._lock:
+            jobs = list(self._jobs)
+            processed = [job for job in jobs if job['status'] != 'skipped']
+            return {
+                'started': self._started,
+                'finished': time.time(),
+                'jobs': sum(self._status.values()),
+                'status': dict(self._status),
+                'errors': dict(self._errors),
+                'bytes': self._bytes,
+                'retries': self._retries,
+                'peak_speed': self._peak_speed or None,
+                'phases': {phase: _percentiles([job[f'{phase}_seconds'] for job in processed])
+                           for phase in PHASES},
+                'average_speed': _percentiles([job['average_speed'] for job in processed
+                                               if job['average_speed']]),
+                'hooks': [{'plugin': plugin, 'hook': hook, 'outcome': outcome, 'count': count}
+                          for (plugin, hook, outcome), count in sorted(self._hook_calls.items())],
+                'recent_jobs': jobs,
+            }
+
+    def flush(self):
+        """Prometheus のファイルと JSON のサマリーを書き出す"""
+        if self.prometheus_path is not None:
+            self._write(self.prometheus_path, self.to_prometheus())
+        if self.json_path is not None:
+            self._write(self.json_path, json.dumps(self.summary(), ensure_ascii=False, indent=2))
+
+    @staticmethod
+    def _write(path, text):
+        # 収集側が書きかけのファイルを読まないよう、一時ファイルに書いてから置き換える。
+        # 一時ファイルの名前にはプロセスとスレッドを含め、GUI と CLI、定期的な書き出しと終了時の書き出しが
+        # 同じパスに同時に書いても互いの一時ファイルを置き換えないようにする
+        # （NamedTemporaryFile は権限が 0600 になり、別ユーザーの収集側から読めなくなるため使わない）
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(tmp, 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"メトリクスの書き出しに失敗しました: {e}")
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+
+def _percentiles(values):
+    if not values:
+        return None
+    values = sorted(values)
+
+    def at(q):
+        return values[min(len(values) - 1, int(q * len(values)))]
+
+    return {'count': len(values), 'mean': sum(values) / len(values),
+            'p50': at(0.5), 'p95': at(0.95), 'max': values[-1]}
@@ -1,17 +1,86 @@
+import ast
+import hashlib
 import importlib
 import os
 import sys
 import json
+import threading
+
+# マニフェストの形式が変わったら上げる（古いキャッシュは読み捨てる）
+INDEX_VERSION = 1
+
+# get_formats 以外で、モジュールに定義されていれば有効化時に呼ぶ関数
+_LIFECYCLE = ("initialize", "register")
+
+
+def _literal(node):
+    try:
+        return ast.literal_eval(node)
+    except (ValueError, TypeError, SyntaxError, RecursionError):
+        return None
+
+
+def read_manifest(path, name):
+    """
+    プラグインのファイルを import せずに解析し、マニフェスト（メタ情報・フォーマット・定義済みの関数）を作る。
+    get_formats が辞書のリテラルを返すだけなら、その値をフォーマットとして取り出す。
+    それ以外の get_formats は formats を None にし、有効化したときに呼んで結果をキャッシュする
+    """
+    with open(path, "rb") as f:
+        source = f.read()
+    manifest = {
+        "sha256": hashlib.sha256(source).hexdigest(),
+        "meta": {"name": name, "version": "unknown", "description": ""},
+        "functions": [],
+        "formats": {},
+    }
+    tree = ast.parse(source, filename=path)
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            key = node.targets[0].id
+            value = _literal(node.value)
+            if key in manifest["meta"] and value is not None:
+                manifest["meta"][key] = value if key == "name" else str(value)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            manifest["functions"].append(node.name)
+            if node.name == "get_formats":
+                manifest["formats"] = _literal_return(node)
+    return manifest
+
+
+def _literal_return(function):
+    body = function.body
+    if body and isinstance(body[0], ast.Expr) and isinstance(getattr(body[0], "value", None), ast.Constant):
+        body = body[1:]
+    if len(body) == 1 and isinstance(body[0], ast.Return) and body[0].value is not None:
+        value = _literal(body[0].value)
+        if isinstance(value, dict):
+            return value
+    return None
 
 
 class PluginManager:
-    def __init__(self, plugin_dir=None, config_file="plugin_config.json"):
+    """
+    plugins フォルダのプラグインを管理する。
+
+    起動時はファイルを import せず、ディスクにキャッシュしたマニフェスト（index_file）から
+    メタ情報とフォーマット一覧を読む。キャッシュはファイルの更新時刻とサイズで照合し、
+    変わっていれば内容のハッシュを比べて、内容が違うファイルだけ解析し直す。
+    モジュールは有効なプラグインが実際に使われたとき（run_plugin / activate / フックの呼び出し）に初めて import し、
+    initialize() と register() を呼ぶ。ダウンロードの各段階のフックは engine.hooks を参照。
+    """
+
+    def __init__(self, plugin_dir=None, config_file="plugin_config.json", index_file="cache/plugin_index.json"):
         self.plugin_dir = plugin_dir or self.get_default_plugin_dir()
+        # 有効化（import）済みのモジュール
         self.plugins = {}
         self.plugin_metadata = {}
         self.formats = {}
         self.enabled_plugins = set()
         self.config_file = config_file
+        self.index_file = index_file
+        self._manifests = {}
+        self._lock = threading.RLock()
         self.load_enabled_plugins()
         self.load_plugins()
         self.load_external_format_files()
@@ -44,65 +113,140 @@ class PluginManager:
             base_path = os.path.abspath(".")
         return os.path.join(base_path, "plugins")
 
+    def is_enabled(self, name):
+        # 有効なプラグインの一覧が空ならすべて有効
+        return not self.enabled_plugins or name in self.enabled_plugins
+
+    def available_plugins(self):
+        """インデックスにある有効なプラグインの名前（import はしない）。メタ情報は plugin_metadata にある"""
+        return [name for name in self._manifests if self.is_enabled(name)]
+
+    def hook_providers(self, hook):
+        """関数 hook（engine.hooks.HOOKS のいずれか）を定義している有効なプラグインの名前（import はしない）"""
+        return [name for name, manifest in sorted(self._manifests.items())
+                if self.is_enabled(name) and hook in manifest.get("functions", ())]
+
     def load_plugins(self):
+        """マニフェストのインデックスを更新し、有効なプラグインのメタ情報とフォーマットを読み込む"""
         if not os.path.isdir(self.plugin_dir):
             print(f"プラグインフォルダが存在しません: {self.plugin_dir}")
             return
 
-        for file in os.listdir(self.plugin_dir):
-            if file.endswith(".py") and not file.startswith("_"):
-                name = file[:-3]
-
-                try:
-                    if self.config.get('enabled_plugins') and name not in self.config['enabled_plugins']:
-                        continue
-                except Exception as e:
-                    print(f"プラグイン設定の参照エラー: {e}")
+        cached = self._read_index()
+        manifests = {}
+        changed = False
+        for file in sorted(os.listdir(self.plugin_dir)):
+            if not file.endswith(".py") or file.startswith("_"):
+                continue
+            name = file[:-3]
+            path = os.path.join(self.plugin_dir, file)
+            try:
+                manifest, updated = self._manifest_for(path, name, cached.get(file))
+            except Exception as e:
+                print(f"プラグイン読み込み失敗 (解析エラー) {name}: {e}")
+                continue
+            manifests[file] = manifest
+            changed = changed or updated
+        changed = changed or set(manifests) != set(cached)
 
-                try:
-                    if self.plugin_dir not in sys.path:
-                        sys.path.insert(0, self.plugin_dir)
-                    module = importlib.import_module(name)
-                except (ModuleNotFoundError, ImportError) as e:
-                    print(f"プラグイン読み込み失敗 (インポートエラー) {name}: {e}")
-                    continue
-                except Exception as e:
-                    print(f"プラグイン読み込み失敗 (不明なエラー) {name}: {e}")
+        with self._lock:
+            self._manifests = {file[:-3]: manifest for file, manifest in manifests.items()}
+            for name, manifest in self._manifests.items():
+                self.plugin_metadata.setdefault(name, manifest["meta"])
+                if not self.is_enabled(name):
                     continue
+                formats = manifest["formats"]
+                if formats is None:
+                    # get_formats の結果が内容から決まらないプラグインは、ここで有効化して取得する。
+                    # 次回の起動からは import せずに済むよう、ファイルの内容が変わるまでこの結果を使う
+                    formats = manifest["formats"] = self._dynamic_formats(name)
+                    changed = changed or formats is not None
+                if isinstance(formats, dict):
+                    self.formats.update(formats)
+        if changed:
+            self._write_index(manifests)
 
-                self.plugins[name] = module
+    def _manifest_for(self, path, name, cached):
+        st = os.stat(path)
+        if cached is not None and cached.get("mtime_ns") == st.st_mtime_ns and cached.get("size") == st.st_size:
+            return cached, False
+        manifest = read_manifest(path, name)
+        if cached is not None and cached.get("sha256") == manifest["sha256"]:
+            # 更新時刻だけが変わった（内容は同じ）場合は、キャッシュ済みのフォーマットをそのまま使う
+            manifest["formats"] = cached.get("formats", manifest["formats"])
+        manifest["mtime_ns"] = st.st_mtime_ns
+        manifest["size"] = st.st_size
+        return manifest, True
 
-                try:
-                    meta = {
-                        "name": getattr(module, "name", name),
-                        "version": getattr(module, "version", "unknown"),
-                        "description": getattr(module, "description", ""),
-                    }
-                except Exception as e:
-                    print(f"プラグインメタ情報取得失敗 {name}: {e}")
-                    meta = {"name": name, "version": "unknown", "description": ""}
+    def _dynamic_formats(self, name):
+        module = self.activate(name)
+        if module is None or not hasattr(module, "get_formats"):
+            return None
+        try:
+            fmts = module.get_formats()
+        except Exception as e:
+            print(f"プラグインフォーマット取得失敗 {name}: {e}")
+            return None
+        return fmts if isinstance(fmts, dict) else None
 
-                self.plugin_metadata[name] = meta
+    def activate(self, name):
+        """有効なプラグインを import して initialize() / register() を呼ぶ。失敗・無効なら None"""
+        with self._lock:
+            if name in self.plugins:
+                return self.plugins[name]
+            if name not in self._manifests or not self.is_enabled(name):
+                return None
+            try:
+                if self.plugin_dir not in sys.path:
+                    sys.path.insert(0, self.plugin_dir)
+                module = importlib.import_module(name)
+            except (ModuleNotFoundError, ImportError) as e:
+                print(f"プラグイン読み込み失敗 (インポートエラー) {name}: {e}")
+                return None
+            except Exception as e:
+                print(f"プラグイン読み込み失敗 (不明なエラー) {name}: {e}")
+                return None
 
+            self.plugins[name] = module
+            self.plugin_metadata[name] = {
+                "name": getattr(module, "name", name),
+                "version": getattr(module, "version", "unknown"),
+                "description": getattr(module, "description", ""),
+            }
+            for function in _LIFECYCLE:
                 try:
-                    if hasattr(module, 'initialize'):
-                        module.initialize()
+                    if hasattr(module, function):
+                        getattr(module, function)()
                 except Exception as e:
-                    print(f"プラグイン初期化失敗 {name}: {e}")
+                    label = "初期化" if function == "initialize" else "登録処理"
+                    print(f"プラグイン{label}失敗 {name}: {e}")
+            return module
 
-                try:
-                    if hasattr(module, 'get_formats'):
-                        fmts = module.get_formats()
-                        if isinstance(fmts, dict):
-                            self.formats.update(fmts)
-                except Exception as e:
-                    print(f"プラグインフォーマット取得失敗 {name}: {e}")
+    def _read_index(self):
+        try:
+            with open(self.index_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"プラグインのインデックスを読み込めませんでした: {e}")
+            return {}
+        if data.get("version") != INDEX_VERSION or data.get("plugin_dir") != os.path.abspath(self.plugin_dir):
+            return {}
+        return data.get("plugins", {})
 
-                try:
-                    if hasattr(module, 'register'):
-                        module.register()
-                except Exception as e:
-                    print(f"プラグイン登録処理失敗 {name}: {e}")
+    def _write_index(self, manifests):
+        data = {"version": INDEX_VERSION, "plugin_dir": os.path.abspath(self.plugin_dir), "plugins": manifests}
+        try:
+            directory = os.path.dirname(self.index_file)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp = f"{self.index_file}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp, self.index_file)
+        except OSError as e:
+            print(f"プラグインのインデックスを保存できませんでした: {e}")
 
     def load_external_format_files(self):
         if not os.path.isdir(self.plugin_dir):
@@ -120,7 +264,7 @@ class PluginManager:
                     print(f"フォーマットJSON読み込み失敗: {file} - {e}")
 
     def run_plugin(self, name, **kwargs):
-        module = self.plugins.get(name)
+        module = self.activate(name)
         if module and hasattr(module, 'run'):
             module.run(**kwargs)
 
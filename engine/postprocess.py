@@ -0,0 +1,38 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .profiling import profiled
+
+
+class PostProcessPool:
+    """
+    yt-dlp の後処理（ffmpeg による結合・変換、ファイルの移動）をダウンロードとは別に実行するワーカー。
+    ダウンロードのスレッドは後処理を登録するとすぐに次の通信に移れるため、
+    バッチ全体で通信と ffmpeg の処理が重なって進む。
+
+    実際の CPU 処理は ffmpeg の子プロセスが行うため、ワーカーはスレッドで足りる（既定は CPU 数）。
+    実行中と待機中の合計が max_pending に達すると submit() はブロックし、
+    ダウンロードが後処理を追い越してディスクに未結合のファイルが溜まり続けないようにする。
+    """
+
+    def __init__(self, max_workers=None, max_pending=None):
+        self.max_workers = max(1, int(max_workers or os.cpu_count() or 1))
+        self.max_pending = max(self.max_workers, int(max_pending or self.max_workers * 2))
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                            thread_name_prefix="spinova-postprocess")
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+
+    def submit(self, fn, *args, **kwargs):
+        """後処理を登録して Future を返す。空きがなければ空くまで待つ"""
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(profiled(fn), *args, **kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda f: self._slots.release())
+        return future
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,87 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .expansion import is_playlist
+from .profiling import profiled
+
+
+class MetadataPrefetcher:
+    """
+    バッチで次に処理されるジョブのメタデータ抽出（ページの取得やプレーヤーのJSの解析）を、
+    前のジョブのダウンロード中に済ませておく先読みの段階。
+    ワーカーは take() で抽出済みの情報を受け取り、VideoDownloader.download_video(info=..., prefetched=True) に渡す。
+
+    先読みは depth 件まで同時に行い、結果は受け取られるまで depth の2倍まで保持する。
+    取得から max_age 秒を過ぎた結果は署名付きURLの期限切れに備えて使わない。
+    schedule() の on_done は抽出が終わるか取り消されたときに1回だけ呼ばれる（ホストの枠を返すのに使う）。
+    """
+
+    def __init__(self, make_downloader, depth=2, max_age=600.0, clock=time.monotonic):
+        self.make_downloader = make_downloader
+        self.depth = max(1, int(depth))
+        self.max_age = max_age
+        self.clock = clock
+        self._executor = ThreadPoolExecutor(max_workers=self.depth, thread_name_prefix="spinova-prefetch")
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def schedule(self, key, url, output_dir, format_code, on_done=None):
+        """
+        まだ先読みしていないジョブの抽出を登録し、登録したら True を返す。
+        先読み済み、または保持数の上限に達していれば何もせずに False（on_done も呼ばない）
+        """
+        with self._lock:
+            if key in self._futures or len(self._futures) >= self.depth * 2:
+                return False
+            future = self._futures[key] = self._executor.submit(profiled(self._extract), url, output_dir, format_code)
+        if on_done is not None:
+            future.add_done_callback(lambda f: on_done())
+        return True
+
+    def take(self, key):
+        """
+        先読みした情報を返す。抽出中なら完了を待つ。
+        未着手・失敗・プレイリスト・期限切れの場合は None（ワーカーが自分で抽出し、エラーもそこで報告する）
+        """
+        with self._lock:
+            future = self._futures.pop(key, None)
+        if future is None or future.cancel():
+            return None
+        try:
+            result = future.result()
+        except Exception:
+            return None
+        if result is None:
+            return None
+        fetched_at, info = result
+        if self.clock() - fetched_at > self.max_age:
+            return None
+        return info
+
+    def discard(self, key):
+        with self._lock:
+            future = self._futures.pop(key, None)
+        if future is not None:
+            future.cancel()
+
+    def close(self):
+        with self._lock:
+            futures = list(self._futures.values())
+            self._futures.clear()
+        for future in futures:
+            future.cancel()
+        self._executor.shutdown(wait=False)
+
+    def _extract(self, url, output_dir, format_code):
+        downloader = self.make_downloader()
+        # ダウンロード済み・キャッシュ済みのURLは抽出しない
+        if downloader.archive is not None and downloader.archive.lookup_url(url, format_code):
+            return None
+        if downloader.metadata_cache is not None and downloader.metadata_cache.get(url) is not None:
+            return None
+        with downloader.probe(url, output_dir=output_dir, format_code=format_code) as ie_result:
+            # プレイリストはページを読み進める間 YoutubeDL を占有するため、ワーカーが改めて抽出して展開する
+            if is_playlist(ie_result):
+                return None
+            return self.clock(), ie_result
@@ -0,0 +1,252 @@
+import cProfile
+import functools
+import io
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+
+# プロファイルの方式。cprofile は関数ごとの呼び出し回数と時間（pstats）、
+# sampling は一定間隔で全スレッドのスタックを記録する（flamegraph.pl や speedscope で読める折りたたみ形式）
+MODES = ("cprofile", "sampling")
+
+# tracemalloc で記録するスタックの深さの既定値（設定の profile_tracemalloc_frames）。
+# 割り当て元の呼び出し経路をたどれる深さにしておく。深くするほど記録の処理とメモリが増える
+TRACEMALLOC_FRAMES = 25
+
+# 同時に記録できるセッションは1つだけ（tracemalloc とスレッドの記録はプロセス全体で共有されるため）
+_active_lock = threading.Lock()
+
+# threads=True で記録中の cProfile のセッション（profiled() で包んだ処理はこれに参加する）
+_current = None
+# スレッドごとの記録中の cProfile（同じスレッドで入れ子に参加しないように）
+_local = threading.local()
+
+# Python 3.12 以降の cProfile は sys.monitoring を使い、1つでプロセス内の全スレッドを記録する
+# （同時に有効にできるのも1つだけ）。その場合はスレッドごとの cProfile を作らない
+_PER_THREAD_PROFILE = sys.version_info < (3, 12)
+
+
+def profiled(fn):
+    """
+    ワーカーのスレッドで実行する処理を包み、threads=True のセッションを記録中なら、
+    その処理の間だけそのスレッドでも cProfile を有効にする。
+    cProfile の disable() は呼び出したスレッドにしか効かないため、各スレッドが処理の終わりに自分で無効にする。
+    Python 3.12 以降はセッションの cProfile が全スレッドを記録するため、何もせずにそのまま呼ぶ
+    """
+    if not _PER_THREAD_PROFILE:
+        return fn
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        session = _current
+        if session is None or getattr(_local, "profile", None) is not None:
+            return fn(*args, **kwargs)
+        profile = session._enable_profile()
+        if profile is None:
+            return fn(*args, **kwargs)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profile.disable()
+            _local.profile = None
+            session._finish_profile(profile)
+    return wrapper
+
+
+class ProfileSession:
+    """
+    1回分のプロファイル。start() から stop() までの間、呼び出したスレッドと、
+    その間に他のスレッドで実行した profiled() の処理（バッチのワーカー・後処理・先読み・展開）を記録する。
+    stop() の時点でまだ終わっていない処理の分は含めない。
+    threads=False なら呼び出したスレッドだけを記録する（同時に動く他のジョブを含めないように）。
+    ただし Python 3.12 以降の cProfile は threads に関わらず全スレッドを記録する。
+    trace_memory が有効なら tracemalloc で memory_frames 段までのスタックを記録する。
+    stop() は書き出したファイルのパスを返す
+    """
+
+    def __init__(self, label, mode="cprofile", trace_memory=False, output_dir="logs/profiles", interval=0.005,
+                 threads=True, memory_frames=TRACEMALLOC_FRAMES):
+        self.label = label
+        self.threads = threads
+        self.mode = mode if mode in MODES else None
+        self.trace_memory = trace_memory
+        self.memory_frames = max(1, int(memory_frames or TRACEMALLOC_FRAMES))
+        self.output_dir = output_dir
+        self.interval = interval
+        self.paths = []
+        # 書き出す cProfile（呼び出したスレッドの分と、終わった profiled() の処理の分）
+        self._profiles = []
+        self._profiles_lock = threading.Lock()
+        self._recording = False
+        self._samples = Counter()
+        self._sampler = None
+        self._stop_sampling = threading.Event()
+        self._started_tracemalloc = False
+        self._owner = None
+        self._owner_profile = None
+
+    def start(self):
+        global _current
+        self._owner = threading.get_ident()
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start(self.memory_frames)
+            self._started_tracemalloc = True
+        if self.mode == "cprofile":
+            self._recording = True
+            self._owner_profile = self._enable_profile()
+            if self.threads:
+                _current = self
+        elif self.mode == "sampling":
+            self._sampler = threading.Thread(target=self._sample_loop, name="spinova-profiler", daemon=True)
+            self._sampler.start()
+        return self
+
+    def stop(self):
+        global _current
+        base = os.path.join(self.output_dir, f"{_safe_name(self.label)}-{time.strftime('%Y%m%d-%H%M%S')}")
+        os.makedirs(self.output_dir, exist_ok=True)
+        if self.mode == "cprofile":
+            if _current is self:
+                _current = None
+            if self._owner_profile is not None:
+                self._owner_profile.disable()
+            _local.profile = None
+            with self._profiles_lock:
+                self._recording = False
+                profiles = [profile for profile in [self._owner_profile] + self._profiles if profile is not None]
+            self._write_pstats(base, profiles)
+        elif self.mode == "sampling":
+            self._stop_sampling.set()
+            self._sampler.join()
+            self._write_collapsed(base)
+        if self.trace_memory and tracemalloc.is_tracing():
+            self._write_tracemalloc(base, tracemalloc.take_snapshot())
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+        return self.paths
+
+    def _enable_profile(self):
+        """呼び出したスレッドで cProfile を有効にして返す（記録を終えていれば None）"""
+        with self._profiles_lock:
+            if not self._recording:
+                return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # 他のプロファイラが有効（Python 3.12 以降の sys.monitoring など）。記録せずに処理は続ける
+            _local.profile = None
+            return None
+        _local.profile = profile
+        return profile
+
+    def _finish_profile(self, profile):
+        # stop() の後に終わった処理の分は書き出さない
+        with self._profiles_lock:
+            if self._recording:
+                self._profiles.append(profile)
+
+    def _sample_loop(self):
+        me = threading.get_ident()
+        while not self._stop_sampling.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me or (not self.threads and ident != self._owner):
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self._samples[";".join(reversed(stack))] += 1
+
+    def _write_pstats(self, base, profiles):
+        if not profiles:
+            return
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            stats.add(profile)
+        path = f"{base}.pstats"
+        stats.dump_stats(path)
+        self.paths.append(path)
+        # そのまま読めるよう、累積時間の上位も書き出す
+        text = io.StringIO()
+        pstats.Stats(path, stream=text).sort_stats("cumulative").print_stats(40)
+        self._write_text(f"{base}.txt", text.getvalue())
+
+    def _write_collapsed(self, base):
+        lines = [f"{stack} {count}" for stack, count in self._samples.most_common()]
+        self._write_text(f"{base}.collapsed", "\n".join(lines) + "\n")
+
+    def _write_tracemalloc(self, base, snapshot):
+        path = f"{base}.tracemalloc"
+        snapshot.dump(path)
+        self.paths.append(path)
+        lines = [f"{stat.size / 1024:10.1f} KiB {stat.count:8d} blocks  {stat.traceback}"
+                 for stat in snapshot.statistics("lineno")[:40]]
+        current, peak = tracemalloc.get_traced_memory()
+        header = f"current {current / 1024 / 1024:.1f} MiB, peak {peak / 1024 / 1024:.1f} MiB\n"
+        self._write_text(f"{base}.memory.txt", header + "\n".join(lines) + "\n")
+
+    def _write_text(self, path, text):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        self.paths.append(path)
+
+
+class Profiler:
+    """
+    設定に従ってダウンロード1件やバッチ全体をプロファイルする。
+    mode が未指定で trace_memory も無効なら session() は何もしない。
+    on_saved は書き出したファイルのパスのリストを受け取る（記録したスレッドから呼ばれる）
+    """
+
+    def __init__(self, mode=None, trace_memory=False, output_dir="logs/profiles", interval=0.005, on_saved=None,
+                 memory_frames=TRACEMALLOC_FRAMES):
+        self.mode = mode if mode in MODES else None
+        self.trace_memory = trace_memory
+        self.memory_frames = memory_frames
+        self.output_dir = output_dir or "logs/profiles"
+        self.interval = interval
+        self.on_saved = on_saved
+
+    @property
+    def enabled(self):
+        return self.mode is not None or self.trace_memory
+
+    @contextmanager
+    def session(self, label, threads=True):
+        if not self.enabled or not _active_lock.acquire(blocking=False):
+            # 別のセッションを記録中なら、そちらを優先してこの処理は記録しない
+            yield None
+            return
+        session = ProfileSession(label, self.mode, self.trace_memory, self.output_dir, self.interval,
+                                 threads, self.memory_frames)
+        try:
+            session.start()
+            try:
+                yield session
+            finally:
+                try:
+                    paths = session.stop()
+                except Exception as e:
+                    print(f"プロファイルの書き出しに失敗しました: {e}")
+                    paths = []
+        finally:
+            _active_lock.release()
+        if paths and self.on_saved:
+            try:
+                self.on_saved(paths)
+            except Exception as e:
+                print(f"Profile callback error: {e}")
+
+
+def _safe_name(label):
+    return re.sub(r'[^\w.-]+', '_', str(label)) or "profile"
@@ -0,0 +1,189 @@
+import threading
+import time
+
+# これらの状態は間引かずに必ず通知する
+# （done / failed / skipped はバッチがジョブの最終結果として通知する）
+TERMINAL_STATUSES = ('finished', 'error', 'already_downloaded', 'paused', 'expanded', 'done', 'failed', 'skipped')
+
+
+class ProgressRecord:
+    """
+    エンジンとGUIの間で受け渡す進捗情報。
+    yt-dlp のフック引数には info_dict 全体（フォーマット一覧やサムネイル等）が
+    含まれるため、GUIやログで使う項目だけを取り出して渡す。
+    """
+
+    __slots__ = ('job_id', 'status', 'downloaded_bytes', 'total_bytes', 'speed', 'eta',
+                 'url', 'filename', 'error_type', 'error', 'entries', 'label')
+
+    def __init__(self, status, job_id=None, downloaded_bytes=0, total_bytes=None, speed=None, eta=None,
+                 url=None, filename=None, error_type=None, error=None, entries=None, label=None):
+        self.job_id = job_id
+        self.status = status
+        self.downloaded_bytes = downloaded_bytes
+        self.total_bytes = total_bytes
+        self.speed = speed
+        self.eta = eta
+        self.url = url
+        self.filename = filename
+        self.error_type = error_type
+        self.error = error
+        # プレイリスト・チャンネルの展開中（expanding / expanded）に見つかったエントリ数
+        self.entries = entries
+        # バッチのジョブの表示名（ログと同じ "[3/10]#2" 形式）。queued / started でのみ設定される
+        self.label = label
+
+    @classmethod
+    def from_hook(cls, d, job_id=None, url=None):
+        """yt-dlp の進捗フック引数から生成する"""
+        return cls(
+            d.get('status'),
+            job_id=job_id,
+            downloaded_bytes=d.get('downloaded_bytes') or 0,
+            total_bytes=d.get('total_bytes') or d.get('total_bytes_estimate'),
+            speed=d.get('speed'),
+            eta=d.get('eta'),
+            url=url,
+            filename=d.get('filename'),
+        )
+
+    @property
+    def percent(self):
+        if self.total_bytes:
+            return int(self.downloaded_bytes / self.total_bytes * 100)
+        return None
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        return f"ProgressRecord({self.to_dict()!r})"
+
+
+class ProgressCoalescer:
+    """
+    yt-dlp の進捗フックはチャンクごとに呼ばれるため、そのままGUIへ送ると
+    スレッド間のコピーとシグナル処理がチャンク数だけ発生する。
+    ジョブごとに最新の ProgressRecord だけを保持し、interval 秒ごとにまとめて通知する。
+    終了・エラーなどの状態は保留中の最新状態を通知した直後に即時通知する。
+
+    通知は取り出しからコールバックまでを1つのロックで直列化し、終了を通知した後に
+    それより前の進捗（通知スレッドが取り出し済みだったもの）が届くことはない。
+    """
+
+    def __init__(self, callback, interval=0.1):
+        self.callback = callback
+        self.interval = interval
+        self._lock = threading.Lock()
+        # 取り出しから通知までを直列化する（コールバックから push されても止まらないよう RLock）
+        self._deliver_lock = threading.RLock()
+        self._pending = {}
+        # ジョブごとに通知した終了状態の数。保留中の進捗はその時点の数と組にして持ち、
+        # 後から終了が通知されたものは古い進捗として捨てる
+        self._terminals = {}
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._closed = False
+        self.received = 0
+        self.delivered = 0
+
+    def push(self, key, data):
+        self.received += 1
+        if not self.interval or self.interval <= 0:
+            self._deliver(data)
+            return
+
+        if data.status in TERMINAL_STATUSES:
+            with self._deliver_lock:
+                with self._lock:
+                    latest = self._pending.pop(key, None)
+                    self._terminals[key] = self._terminals.get(key, 0) + 1
+                if latest is not None:
+                    self._deliver(latest[1])
+                self._deliver(data)
+            return
+
+        with self._lock:
+            self._pending[key] = (self._terminals.get(key, 0), data)
+            if self._thread is None and not self._closed:
+                self._thread = threading.Thread(target=self._run, name="spinova-progress", daemon=True)
+                self._thread.start()
+
+    def flush(self):
+        with self._deliver_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                terminals = dict(self._terminals)
+            for key, (generation, data) in pending.items():
+                if generation == terminals.get(key, 0):
+                    self._deliver(data)
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._closed = True
+            thread, self._thread = self._thread, None
+        self._wakeup.set()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=1)
+
+    def _run(self):
+        while not self._wakeup.wait(self.interval):
+            self.flush()
+
+    def _deliver(self, data):
+        self.delivered += 1
+        try:
+            self.callback(data)
+        except Exception as e:
+            # コールバック内例外は抑制しつつ報告
+            print(f"Progress callback error: {e}")
+
+
+class ProgressWatchdog:
+    """
+    ジョブごとに最後に進捗を受け取った時刻を記録し、stall_timeout 秒以上進捗のないジョブを検出する。
+    固定時間のタイムアウトと違い、転送が続いている限り大きなファイルでも止めない。
+    結合などの後処理中は進捗が届かないため、finished を受け取ってから次の downloading までは監視しない。
+    """
+
+    def __init__(self, stall_timeout=60, clock=time.monotonic):
+        self.stall_timeout = stall_timeout
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._last = {}
+
+    def watch(self, key):
+        """ジョブの開始時に呼ぶ（抽出処理もこの時点から監視する）"""
+        with self._lock:
+            self._last[key] = self.clock()
+
+    def unwatch(self, key):
+        with self._lock:
+            self._last.pop(key, None)
+
+    def beat(self, record, key=None):
+        """進捗を受け取るたびに呼ぶ。key 省略時は record.job_id"""
+        if key is None:
+            key = record.job_id
+        with self._lock:
+            # 待機中（queued）のジョブは、取り出されて started になるまで監視しない
+            if record.status in TERMINAL_STATUSES or record.status == 'queued':
+                self._last.pop(key, None)
+            else:
+                self._last[key] = self.clock()
+
+    def stalled(self):
+        """stall_timeout 秒以上進捗のないジョブのキーを返す"""
+        if not self.stall_timeout or self.stall_timeout <= 0:
+            return []
+        now = self.clock()
+        with self._lock:
+            return [key for key, last in self._last.items() if now - last >= self.stall_timeout]
+
+    def clear(self):
+        with self._lock:
+            self._last.clear()
+
+    def __len__(self):
+        return len(self._last)
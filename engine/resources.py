@@ -0,0 +1,104 @@
+from .archive import DownloadArchive
+from .batch import HostLimiter
+from .hooks import PluginHooks
+from .job_queue import JobQueue
+from .logfile import FileLog
+from .metadata_cache import MetadataCache
+from .metrics import MetricsCollector
+from .profiling import Profiler, TRACEMALLOC_FRAMES
+
+# GUI と CLI で共有する永続ストアを設定（ConfigManager）から開く。
+# 無効化されている、または開けない場合は None を返す。
+
+
+def open_metadata_cache(config):
+    if not config.get("metadata_cache", True):
+        return None
+    try:
+        return MetadataCache(
+            path=config.get("metadata_cache_path", "cache/metadata.sqlite3"),
+            max_bytes=int(config.get("metadata_cache_max_mb", 64)) * 1024 * 1024,
+            default_ttl=config.get("metadata_cache_ttl", 3600),
+            extractor_ttls=config.get("metadata_cache_extractor_ttls", {}),
+        )
+    except Exception as e:
+        print(f"メタデータキャッシュを開けませんでした: {e}")
+        return None
+
+
+def open_download_archive(config):
+    if not config.get("download_archive", True):
+        return None
+    try:
+        return DownloadArchive(path=config.get("download_archive_path", "data/download_archive.sqlite3"))
+    except Exception as e:
+        print(f"ダウンロードアーカイブを開けませんでした: {e}")
+        return None
+
+
+def open_job_queue(config):
+    if not config.get("job_queue", True):
+        return None
+    try:
+        return JobQueue(path=config.get("job_queue_path", "data/job_queue.sqlite3"))
+    except Exception as e:
+        print(f"ジョブキューを開けませんでした: {e}")
+        return None
+
+
+def open_file_log(config):
+    path = config.get("log_file", "logs/spinova.log")
+    if not path:
+        return None
+    try:
+        return FileLog(path=path, max_bytes=int(config.get("log_file_max_mb", 5)) * 1024 * 1024,
+                       backups=config.get("log_file_backups", 3))
+    except Exception as e:
+        print(f"ログファイルを開けませんでした: {e}")
+        return None
+
+
+def open_metrics(config, prometheus_path=None, json_path=None):
+    """ジョブの計測値の書き出し先が設定されていれば MetricsCollector を作る"""
+    prometheus_path = prometheus_path or config.get("metrics_prometheus_path", "")
+    json_path = json_path or config.get("metrics_json_path", "")
+    if not prometheus_path and not json_path:
+        return None
+    return MetricsCollector(prometheus_path=prometheus_path, json_path=json_path,
+                            write_interval=config.get("metrics_write_interval", 5))
+
+
+def make_profiler(config, mode=None, trace_memory=None, output_dir=None, on_saved=None, memory_frames=None):
+    """開発者向け設定のプロファイル方式から Profiler を作る（無効なら None）"""
+    mode = mode or config.get("profile_mode", "")
+    trace_memory = config.get("profile_tracemalloc", False) if trace_memory is None else trace_memory
+    if not mode and not trace_memory:
+        return None
+    return Profiler(mode=mode, trace_memory=trace_memory,
+                    output_dir=output_dir or config.get("profile_dir", "logs/profiles"),
+                    interval=config.get("profile_interval", 0.005), on_saved=on_saved,
+                    memory_frames=memory_frames or config.get("profile_tracemalloc_frames", TRACEMALLOC_FRAMES))
+
+
+def make_plugin_hooks(config, plugin_manager, metrics=None, log_callback=None):
+    """有効なプラグインのどれかがフックを定義していれば PluginHooks を作る（無効・フックがなければ None）"""
+    if not config.get("plugin_hooks", True) or plugin_manager is None:
+        return None
+    hooks = PluginHooks(plugin_manager, timeout=config.get("plugin_hook_timeout", 5),
+                        max_timeouts=config.get("plugin_hook_max_timeouts", 3),
+                        max_workers=config.get("plugin_hook_workers", 4), metrics=metrics, log_callback=log_callback)
+    if not hooks.enabled:
+        hooks.close()
+        return None
+    return hooks
+
+
+def make_host_limiter(config, per_host_limit=None):
+    """ホスト単位の同時実行数とスロットリング時のバックオフの設定から HostLimiter を作る"""
+    return HostLimiter(
+        per_host_limit=per_host_limit or config.get("batch_per_host_limit", 2),
+        limit_by=config.get("batch_limit_by", "host"),
+        max_retries=config.get("throttle_max_retries", 3),
+        backoff_base=config.get("throttle_backoff_base", 5),
+        backoff_max=config.get("throttle_backoff_max", 300),
+    )
@@ -0,0 +1,312 @@
+import asyncio
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+from .bandwidth import weight_for_priority
+from .batch import BatchResult, BatchSummary, HostLimiter
+from .downloader import PAUSED, VideoDownloader
+from .metrics import JobMetrics
+from .progress import ProgressRecord
+from .variants import join_variants
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+TIMED_OUT = "timeout"
+
+
+class JobHandle:
+    """
+    DownloadScheduler.submit() が返すジョブのハンドル。
+    await すると BatchResult を返す（失敗・タイムアウト・一時停止も BatchResult の success=False で返る）。
+    cancel() されたジョブを await すると asyncio.CancelledError になる。
+    一時停止したジョブは同じURL・保存先で submit し直すと .part ファイルの続きから再開する。
+    """
+
+    def __init__(self, scheduler, job_id, url, output_dir, format_code, timeout):
+        self.job_id = job_id
+        self.url = url
+        self.output_dir = output_dir
+        self.format_code = format_code
+        self.timeout = timeout
+        self.state = QUEUED
+        self.started_at = None
+        self._scheduler = scheduler
+        self._downloader = None
+        self._task = None
+        # プラグインによるURLの前処理は再試行のたびには繰り返さない
+        self._preprocessed = False
+
+    def cancel(self):
+        """ジョブを取り消す（別スレッドから呼び出し可）。途中までのファイルは削除される"""
+        self._downloader.cancel()
+        self._scheduler.loop.call_soon_threadsafe(self._task.cancel)
+
+    def pause(self):
+        """ジョブを一時停止する（別スレッドから呼び出し可）。未開始なら開始直後に停止する"""
+        self._downloader.pause()
+
+    def done(self):
+        return self._task.done()
+
+    def cancelled(self):
+        return self._task.cancelled()
+
+    def result(self):
+        return self._task.result()
+
+    def add_done_callback(self, callback):
+        """完了時に callback(handle) をイベントループのスレッドで呼び出す"""
+        self._task.add_done_callback(lambda task: callback(self))
+
+    def __await__(self):
+        return self._task.__await__()
+
+    def __repr__(self):
+        return f"JobHandle(job_id={self.job_id!r}, url={self.url!r}, state={self.state!r})"
+
+
+class DownloadScheduler:
+    """
+    asyncio からダウンロードを実行するスケジューラ。
+    yt-dlp の処理は max_workers 本のスレッドプールで実行し、待機中のジョブはスレッドを消費しない。
+    同一ホストへの同時実行数は per_host_limit で制限する。
+    スロットリングで失敗したジョブはそのホストのバックオフ後に再試行し、他のホストのジョブは待たせない。
+
+    submit() / run() / close() はイベントループのスレッドから呼び出すこと。
+    progress_callback はワーカースレッドから ProgressRecord を引数に呼ばれる。
+    """
+
+    def __init__(self, output_dir="downloads", format_code="bestvideo+bestaudio/best",
+                 ffmpeg_path=None, yt_dlp_extra_opts=None, max_workers=4, per_host_limit=2,
+                 ydl_pool=None, metadata_cache=None, archive=None, progress_callback=None,
+                 progress_interval=0.1, bandwidth=None, host_limiter=None, metrics=None, profiler=None,
+                 hooks=None):
+        self.output_dir = output_dir
+        self.format_code = format_code
+        self.ffmpeg_path = ffmpeg_path
+        self.yt_dlp_extra_opts = yt_dlp_extra_opts
+        self.max_workers = max(1, int(max_workers or 1))
+        self.per_host_limit = max(1, int(per_host_limit or 1))
+        # スロットリング（HTTP 429 / 403）を受けたホストのバックオフと再試行回数を管理する
+        self.limiter = host_limiter or HostLimiter(self.per_host_limit)
+        self.ydl_pool = ydl_pool
+        self.metadata_cache = metadata_cache
+        self.archive = archive
+        self.progress_callback = progress_callback
+        self.progress_interval = progress_interval
+        self.bandwidth = bandwidth
+        # MetricsCollector を渡すと、終わったジョブの計測値を集計する
+        self.metrics = metrics
+        # Profiler を渡すと、ダウンロード1件ごとにそのワーカースレッドをプロファイルする
+        self.profiler = profiler
+        # PluginHooks を渡すと、各段階でプラグインのフックを呼ぶ（engine.hooks を参照）
+        self.hooks = hooks
+
+        self.loop = None
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="spinova-download")
+        self._slots = None
+        self._host_slots = {}
+        self._handles = {}
+        self._running = set()
+        self._ids = itertools.count(1)
+        self._closed = False
+
+    def submit(self, url, output_dir=None, format_code=None, timeout=None, job_id=None, priority=0):
+        """
+        ジョブを登録して JobHandle を返す。timeout はダウンロード開始からの秒数。
+        priority は帯域の配分に使う（bandwidth を指定した場合のみ）
+        """
+        if self._closed:
+            raise RuntimeError("DownloadScheduler is closed")
+        loop = asyncio.get_running_loop()
+        if self.loop is None:
+            self.loop = loop
+            self._slots = asyncio.Semaphore(self.max_workers)
+        elif self.loop is not loop:
+            raise RuntimeError("DownloadScheduler is bound to a different event loop")
+
+        if job_id is None:
+            job_id = next(self._ids)
+        handle = JobHandle(self, job_id, url, output_dir or self.output_dir,
+                           format_code or self.format_code, timeout)
+        handle._downloader = VideoDownloader(
+            progress_callback=self.progress_callback,
+            ffmpeg_path=self.ffmpeg_path,
+            yt_dlp_extra_opts=self.yt_dlp_extra_opts,
+            ydl_pool=self.ydl_pool,
+            metadata_cache=self.metadata_cache,
+            archive=self.archive,
+            progress_interval=self.progress_interval,
+            bandwidth=self.bandwidth,
+            bandwidth_weight=weight_for_priority(priority),
+            hooks=self.hooks,
+        )
+        handle._task = loop.create_task(self._run(handle))
+        self._handles[job_id] = handle
+        handle._task.add_done_callback(lambda task: self._handles.pop(job_id, None))
+        return handle
+
+    def get(self, job_id):
+        return self._handles.get(job_id)
+
+    def jobs(self):
+        return list(self._handles.values())
+
+    async def run(self, urls, timeout=None):
+        """URLをまとめて実行し、取り消されたジョブも含めて BatchSummary を返す"""
+        summary = BatchSummary()
+        handles = [self.submit(url, timeout=timeout) for url in urls]
+        for handle in handles:
+            try:
+                result = await handle
+            except asyncio.CancelledError:
+                if not handle.cancelled():
+                    raise
+                result = BatchResult(handle.job_id, handle.url, False, error=asyncio.CancelledError())
+            summary.add(result)
+        summary.finished_at = time.time()
+        return summary
+
+    def cancel_all(self):
+        for handle in list(self._handles.values()):
+            handle.cancel()
+
+    async def close(self, cancel=False):
+        """新規登録を止め、実行中のジョブとワーカースレッドの終了を待つ"""
+        self._closed = True
+        if cancel:
+            self.cancel_all()
+        tasks = [handle._task for handle in self._handles.values()]
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        # 取り消し・タイムアウト後もスレッドは次の進捗フックまで動くため、その終了も待つ
+        if self._running:
+            await asyncio.wait(set(self._running))
+        self._executor.shutdown(wait=False)
+
+    async def _run(self, handle):
+        if self.limiter.limit_by == "extractor":
+            # エクストラクタの照合（初回は yt-dlp の全エクストラクタの読み込み）はイベントループの外で行う
+            try:
+                host = await self.loop.run_in_executor(None, self.limiter.key_of, handle.url)
+            except asyncio.CancelledError:
+                handle.state = CANCELLED
+                raise
+        else:
+            host = HostLimiter.host_of(handle.url)
+        host_slots = self._host_slots.get(host)
+        if host_slots is None:
+            host_slots = self._host_slots[host] = asyncio.Semaphore(self.per_host_limit)
+        retries = 0
+        while True:
+            result = await self._attempt(handle, host, host_slots)
+            if result.success:
+                self.limiter.succeed(host)
+            elif (handle.state == FAILED and handle._downloader.stop_reason is None
+                    and HostLimiter.is_throttled(result.error)):
+                # そのホストだけをバックオフさせ、上限まではキューに戻して再試行する
+                self.limiter.penalize(host)
+                if retries < self.limiter.max_retries:
+                    retries += 1
+                    handle.state = QUEUED
+                    # 失敗（error）を通知済みのジョブを待機中に戻したことを知らせる
+                    self._report(ProgressRecord(QUEUED, job_id=handle.job_id, url=handle.url))
+                    continue
+            if result.metrics is not None:
+                result.metrics.retries = retries
+                result.metrics.finish(result.status, result.error)
+                if self.metrics is not None:
+                    self.metrics.record(result.metrics)
+            return result
+
+    def _report(self, record):
+        if self.progress_callback:
+            try:
+                self.progress_callback(record)
+            except Exception as e:
+                print(f"Progress callback error: {e}")
+
+    async def _attempt(self, handle, host, host_slots):
+        try:
+            # バックオフ中のホストは枠を取らずに待つ（他のホストのジョブはそのまま進む）
+            delay = self.limiter.backoff_remaining(host)
+            while delay > 0:
+                await asyncio.sleep(delay)
+                delay = self.limiter.backoff_remaining(host)
+            await host_slots.acquire()
+            try:
+                await self._slots.acquire()
+            except BaseException:
+                host_slots.release()
+                raise
+        except asyncio.CancelledError:
+            handle.state = CANCELLED
+            raise
+
+        handle.state = RUNNING
+        handle.started_at = time.time()
+        future = self.loop.run_in_executor(self._executor, self._download, handle)
+        self._running.add(future)
+
+        def release(_):
+            # 枠はワーカースレッドが実際に終わってから返す（同時実行数が max_workers を超えないように）
+            self._running.discard(future)
+            self._slots.release()
+            host_slots.release()
+
+        future.add_done_callback(release)
+
+        try:
+            done, _ = await asyncio.wait({future}, timeout=handle.timeout)
+        except asyncio.CancelledError:
+            handle.state = CANCELLED
+            handle._downloader.cancel()
+            raise
+
+        if not done:
+            handle.state = TIMED_OUT
+            handle._downloader.cancel()
+            return BatchResult(handle.job_id, handle.url, False,
+                               error=asyncio.TimeoutError(f"timed out after {handle.timeout} seconds"),
+                               elapsed=time.time() - handle.started_at,
+                               metrics=handle._downloader.metrics or JobMetrics(handle.job_id, handle.url))
+
+        result = future.result()
+        if result.paused:
+            handle.state = PAUSED
+        else:
+            handle.state = DONE if result.success else FAILED
+        return result
+
+    def _download(self, handle):
+        started = time.time()
+        if self.hooks is not None and not handle._preprocessed:
+            handle._preprocessed = True
+            handle.url = self.hooks.preprocess_url(handle.url, job_id=handle.job_id)
+        url = handle.url
+        record = (self.archive.lookup_url(url, join_variants(handle.format_code))
+                  if self.archive is not None else None)
+        if record:
+            return BatchResult(handle.job_id, url, True, skipped=True, metrics=JobMetrics(handle.job_id, url))
+
+        downloader = handle._downloader
+        profiling = (self.profiler.session(f"download-{handle.job_id}", threads=False)
+                     if self.profiler is not None else nullcontext())
+        try:
+            with profiling:
+                ok = downloader.download_video(url, output_dir=handle.output_dir, format_code=handle.format_code,
+                                               job_id=handle.job_id)
+            if not ok and downloader.stop_reason == PAUSED:
+                return BatchResult(handle.job_id, url, False, error=Exception(downloader.last_error),
+                                   elapsed=time.time() - started, paused=True, metrics=downloader.metrics)
+            if not ok:
+                raise Exception(downloader.last_error)
+        except Exception as e:
+            return BatchResult(handle.job_id, url, False, error=e, elapsed=time.time() - started,
+                               metrics=downloader.metrics)
+        return BatchResult(handle.job_id, url, True, elapsed=time.time() - started, metrics=downloader.metrics)
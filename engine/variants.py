@@ -0,0 +1,90 @@
+import os
+import shutil
+import threading
+
+
+def join_variants(format_codes):
+    """
+    複数のフォーマット指定を、1回の抽出からそれぞれダウンロードする1つの指定にまとめる
+    （yt-dlp の "," 区切り。例: MP4 と音声のみ → "(bestvideo+bestaudio),(bestaudio)"）。
+    文字列で表せるため、ジョブキューや CSV にもそのまま保存できる
+    """
+    if isinstance(format_codes, str):
+        return format_codes
+    codes = list(dict.fromkeys(code for code in format_codes if code))
+    if len(codes) == 1:
+        return codes[0]
+    return ",".join(f"({code})" for code in codes)
+
+
+def has_variants(format_code):
+    """"," で複数のフォーマットを指定しているか（フィルタ内の "," も含むが、その場合も害はない）"""
+    return isinstance(format_code, str) and "," in format_code
+
+
+class SharedStreams:
+    """
+    1回の抽出から複数のフォーマットをダウンロードする間、通信済みのストリームを共有する。
+
+    ストリームは動画とフォーマットIDで区別し、後のフォーマットが同じストリーム
+    （MP4 の結合に使った音声と、音声のみの出力など）を必要としたら、ファイルをハードリンク
+    （できなければコピー）して通信を省く。結合後に yt-dlp が削除する中間ファイル（title.f140.m4a など）は
+    hold() で削除を保留し、すべての後処理が終わってから cleanup() で削除する
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._files = {}
+        self._held = set()
+        self.reused = 0
+        self.saved_bytes = 0
+
+    @staticmethod
+    def key_of(info):
+        format_id = info.get("format_id")
+        video_id = info.get("id")
+        # "137+140" は ffmpeg でまとめて取得する場合の表記で、個別のストリームではない
+        if not format_id or not video_id or "+" in str(format_id):
+            return None
+        return info.get("extractor_key") or info.get("extractor"), video_id, str(format_id)
+
+    def add(self, key, filename):
+        with self._lock:
+            self._files.setdefault(key, os.path.abspath(filename))
+
+    def fetch(self, key, filename):
+        """取得済みのストリームを filename に置く。なければ False"""
+        with self._lock:
+            path = self._files.get(key)
+        if path is None or not os.path.isfile(path):
+            return False
+        if os.path.abspath(filename) != path:
+            try:
+                os.link(path, filename)
+            except OSError:
+                # ハードリンクに対応していないファイルシステム（FAT など）や、別のドライブの場合
+                shutil.copyfile(path, filename)
+        with self._lock:
+            self.reused += 1
+            self.saved_bytes += os.path.getsize(path)
+        return True
+
+    def hold(self, filename):
+        """共有中のファイルなら削除を保留して True を返す"""
+        path = os.path.abspath(filename)
+        with self._lock:
+            if path not in self._files.values():
+                return False
+            self._held.add(path)
+            return True
+
+    def cleanup(self):
+        with self._lock:
+            held, self._held = self._held, set()
+            self._files = {}
+        for path in held:
+            try:
+                if os.path.isfile(path):
+                    os.remove(path)
+            except OSError as e:
+                print(f"中間ファイルの削除に失敗しました: {path} - {e}")
@@ -1,14 +1,24 @@
-import yt_dlp
-
 class VideoInfo:
-    def __init__(self, url: str):
+    def __init__(self, url: str, metadata_cache=None):
         self.url = url
         self.info = None
+        self.metadata_cache = metadata_cache
+
+    def fetch_info(self, use_cache=True):
+        if self.metadata_cache is not None and use_cache:
+            cached = self.metadata_cache.get(self.url)
+            if cached is not None:
+                self.info = cached
+                return self.info
+
+        import yt_dlp
 
-    def fetch_info(self):
         ydl_opts = {'quiet': True, 'skip_download': True}
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
             self.info = ydl.extract_info(self.url, download=False)
+
+        if self.metadata_cache is not None and self.info:
+            self.metadata_cache.put(self.url, self.info)
         return self.info
 
     def get_title(self):
@@ -0,0 +1,199 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+# ダウンロードごとに差し替える項目（プールのキーには含めない）
+OVERRIDE_KEYS = ('format', 'outtmpl', 'progress_hooks', 'match_filter', 'post_download_hook', 'post_process_hook',
+                 'shared_streams')
+
+# yt-dlp のオプションではなく RecordingYoutubeDL の属性として設定する項目
+_ATTRIBUTE_KEYS = ('post_download_hook', 'post_process_hook', 'shared_streams')
+
+_ydl_class = None
+
+
+def create_ydl(opts):
+    """
+    報告したエラーメッセージを error_messages に記録する YoutubeDL を作る。
+    ignoreerrors 指定時は例外にならず、HTTP 429 などの原因が終了コードからは分からないため。
+    deferred_postprocessing にリストを入れると、post_process（ffmpeg による結合・変換と移動）を
+    実行せずに引数を溜め、ダウンロードとは別のスレッドで後から実行できるようにする。
+    opts の post_download_hook(filename, info) は動画の通信が終わって post_process に入るとき、
+    post_process_hook(info) は post_process が成功したときに呼ばれる（プラグインのフック用）。
+    opts の shared_streams に SharedStreams を渡すと、"," 区切りで複数のフォーマットを指定した場合に
+    フォーマット間で共通するストリームを1回だけ通信する
+    """
+    global _ydl_class
+    if _ydl_class is None:
+        import yt_dlp
+
+        class RecordingYoutubeDL(yt_dlp.YoutubeDL):
+            def __init__(self, params=None, *args, **kwargs):
+                self.error_messages = []
+                self.deferred_postprocessing = None
+                params = dict(params or {})
+                for key in _ATTRIBUTE_KEYS:
+                    setattr(self, key, params.pop(key, None))
+                super().__init__(params, *args, **kwargs)
+
+            def report_error(self, message, *args, **kwargs):
+                self.error_messages.append(str(message))
+                return super().report_error(message, *args, **kwargs)
+
+            def dl(self, name, info, subtitle=False, test=False):
+                streams = self.shared_streams
+                key = None if streams is None or subtitle or test or name == '-' else streams.key_of(info)
+                if key is not None and not os.path.exists(name) and streams.fetch(key, name):
+                    self.to_screen(f'[download] {name} は取得済みのストリームを使います')
+                    # 通信していないため、バイト数は計測値（転送量・速度）に含めない
+                    for hook in self._progress_hooks:
+                        hook({'status': 'finished', 'filename': name, 'info_dict': info})
+                    return True, False
+                result = super().dl(name, info, subtitle, test)
+                if key is not None and result[0]:
+                    streams.add(key, name)
+                return result
+
+            def _delete_downloaded_files(self, *files_to_delete, info={}, msg=None):
+                if self.shared_streams is not None:
+                    # 後のフォーマットが使うかもしれない中間ファイルは、すべて終わるまで残す
+                    held = [f for f in files_to_delete if f and self.shared_streams.hold(f)]
+                    for filename in held:
+                        info.get('__files_to_move', {}).pop(filename, None)
+                    files_to_delete = [f for f in files_to_delete if f not in held]
+                return super()._delete_downloaded_files(*files_to_delete, info=info, msg=msg)
+
+            def post_process(self, filename, info, files_to_move=None):
+                if self.post_download_hook is not None:
+                    self.post_download_hook(filename, info)
+                if self.deferred_postprocessing is None:
+                    before = len(self.error_messages)
+                    info = super().post_process(filename, info, files_to_move)
+                    if self.post_process_hook is not None and len(self.error_messages) == before:
+                        self.post_process_hook(info)
+                    return info
+                # 呼び出し元が処理後に info からキーを取り除くため、複製して保持する
+                self.deferred_postprocessing.append((filename, dict(info), dict(files_to_move or {})))
+                info['filepath'] = filename
+                return info
+
+        _ydl_class = RecordingYoutubeDL
+    return _ydl_class(opts)
+
+
+class YoutubeDLPool:
+    """
+    実効オプションごとに YoutubeDL インスタンスを保持して再利用する。
+    cookie の読み込み、エクストラクタの初期化、HTTP セッションの確立は
+    インスタンス生成時（または初回利用時）にしか発生しないため、
+    同じ設定で多数のURLを処理するバッチではURLごとのコストを削減できる。
+
+    インスタンスは lease() の間だけ1スレッドが占有する。
+    """
+
+    def __init__(self, max_idle_per_key=8):
+        self.max_idle_per_key = max_idle_per_key
+        self._lock = threading.Lock()
+        self._idle = {}
+        self._closed = False
+        self.created = 0
+        self.reused = 0
+
+    @staticmethod
+    def make_key(opts):
+        base = {k: v for k, v in opts.items() if k not in OVERRIDE_KEYS}
+        return json.dumps(base, sort_keys=True, ensure_ascii=False, default=repr)
+
+    @contextmanager
+    def lease(self, opts):
+        key = self.make_key(opts)
+        ydl = None
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                ydl = idle.pop()
+                self.reused += 1
+        if ydl is None:
+            ydl = create_ydl({k: v for k, v in opts.items() if k not in OVERRIDE_KEYS})
+            with self._lock:
+                self.created += 1
+
+        try:
+            self._apply_overrides(ydl, opts)
+            yield ydl
+        except BaseException:
+            # 例外後の内部状態は保証できないため破棄する
+            self._discard(ydl)
+            raise
+        else:
+            self._release(key, ydl)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, {}
+        for instances in idle.values():
+            for ydl in instances:
+                self._discard(ydl)
+
+    @staticmethod
+    def _apply_overrides(ydl, opts):
+        fmt = opts.get('format')
+        ydl.params['format'] = fmt
+        ydl.format_selector = (
+            fmt if fmt in (None, '-') or callable(fmt)
+            else ydl.build_format_selector(fmt))
+
+        outtmpl = opts.get('outtmpl')
+        ydl.params['outtmpl'] = dict(outtmpl) if isinstance(outtmpl, dict) else (
+            {'default': outtmpl} if outtmpl else {})
+        ydl._parse_outtmpl()
+
+        ydl._progress_hooks = list(opts.get('progress_hooks') or [])
+        ydl.params['match_filter'] = opts.get('match_filter')
+        for name in _ATTRIBUTE_KEYS:
+            setattr(ydl, name, opts.get(name))
+        ydl._download_retcode = 0
+        ydl._num_downloads = 0
+        ydl.error_messages = []
+        ydl.deferred_postprocessing = None
+
+    def _release(self, key, ydl):
+        try:
+            ydl.save_cookies()
+        except Exception as e:
+            print(f"cookie の保存に失敗しました: {e}")
+        ydl._progress_hooks = []
+        ydl.params['match_filter'] = None
+        for name in _ATTRIBUTE_KEYS:
+            setattr(ydl, name, None)
+        ydl.deferred_postprocessing = None
+
+        with self._lock:
+            if not self._closed:
+                idle = self._idle.setdefault(key, [])
+                if len(idle) < self.max_idle_per_key:
+                    idle.append(ydl)
+                    return
+        self._discard(ydl)
+
+    @staticmethod
+    def _discard(ydl):
+        try:
+            ydl.close()
+        except Exception as e:
+            print(f"YoutubeDL の終了処理に失敗しました: {e}")
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def get_default_pool():
+    """プロセス全体で共有するプールを返す"""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = YoutubeDLPool()
+        return _default_pool
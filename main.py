@@ -1,8 +1,13 @@
-from PyQt5.QtWidgets import QApplication
-from user_interface.main_window import MainWindow
+import sys
 
 if __name__ == "__main__":
-    import sys
+    if len(sys.argv) > 1 and sys.argv[1] == "--headless":
+        # GUIなしで実行する（PyQt5 は読み込まない）
+        from cli import main
+        sys.exit(main(sys.argv[2:]))
+
+    from PyQt5.QtWidgets import QApplication
+    from user_interface.main_window import MainWindow
     app = QApplication(sys.argv)
     window = MainWindow()
     window.show()
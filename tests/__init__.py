@@ -0,0 +1,2 @@
+# Spinova のテスト
+# リポジトリのルートから `python -m pytest tests` で実行します。
@@ -0,0 +1,132 @@
+import shutil
+import tempfile
+import threading
+import unittest
+from contextlib import ExitStack
+
+from benchmarks.media_server import MediaServer, _Handler
+from benchmarks.suite import YDL_OPTS
+from engine.batch import BatchDownloader
+from engine.job_queue import BatchJob
+
+
+class _FakePlaylistBatch(BatchDownloader):
+    """playlists に登録したURLを、そのエントリを持つプレイリストとして扱う（抽出の通信を省く）"""
+
+    def __init__(self, playlists, **kwargs):
+        super().__init__(**kwargs)
+        self.playlists = playlists
+
+    def _probe(self, downloader, job):
+        entries = self.playlists.get(job.url)
+        if entries is None:
+            return super()._probe(downloader, job)
+        ie_result = {"_type": "playlist", "id": job.url,
+                     "entries": ({"_type": "url", "url": url} for url in entries)}
+        return (ExitStack(), ie_result), None
+
+
+class ExpansionTest(unittest.TestCase):
+    def setUp(self):
+        self.server = MediaServer().start()
+        self.workdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def _run(self, batch, urls, timeout=60):
+        result = {}
+        thread = threading.Thread(target=lambda: result.setdefault("summary", batch.run(urls)), daemon=True)
+        thread.start()
+        thread.join(timeout)
+        if thread.is_alive():
+            batch.cancel()
+            self.fail("バッチが終わらない（展開とエントリがホストの枠を取り合っている）")
+        return result["summary"]
+
+    def test_entries_beyond_window_with_one_slot_per_host(self):
+        # エントリ数が先読みの枠（max_workers * 8）を超え、ホストの同時実行数が1でも止まらないこと
+        playlist = f"{self.server.base_url}/playlist/1"
+        entries = [self.server.file_url(1024) for _ in range(30)]
+        batch = _FakePlaylistBatch({playlist: entries}, output_dir=self.workdir, format_code="best",
+                                   yt_dlp_extra_opts=YDL_OPTS, max_workers=2, per_host_limit=1, prefetch=0)
+        summary = self._run(batch, [playlist])
+        self.assertEqual(summary.success_count, len(entries))
+        self.assertEqual(summary.error_count, 0)
+
+    def test_two_playlists_on_the_same_host(self):
+        playlists = {f"{self.server.base_url}/playlist/{n}": [self.server.file_url(1024) for _ in range(20)]
+                     for n in range(2)}
+        batch = _FakePlaylistBatch(playlists, output_dir=self.workdir, format_code="best",
+                                   yt_dlp_extra_opts=YDL_OPTS, max_workers=2, per_host_limit=2, prefetch=0)
+        summary = self._run(batch, list(playlists))
+        self.assertEqual(summary.success_count, 40)
+
+
+class _CountingHandler(_Handler):
+    """同時に処理しているリクエスト数の最大値を server.peak に記録する"""
+
+    def _handle(self, send_body):
+        server = self.server
+        with server._lock:
+            server.inflight += 1
+            server.peak = max(server.peak, server.inflight)
+        try:
+            super()._handle(send_body)
+        finally:
+            with server._lock:
+                server.inflight -= 1
+
+
+class PrefetchTest(unittest.TestCase):
+    def setUp(self):
+        self.server = MediaServer(latency=0.05).start()
+        self.server.RequestHandlerClass = _CountingHandler
+        self.server.inflight = self.server.peak = 0
+        self.workdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def test_prefetch_counts_against_the_host_limit(self):
+        # 先読みの抽出もホストの同時実行数に含め、per_host_limit を超えて接続しないこと
+        urls = [self.server.file_url(64 * 1024) for _ in range(6)]
+        batch = BatchDownloader(output_dir=self.workdir, format_code="best", yt_dlp_extra_opts=YDL_OPTS,
+                                max_workers=2, per_host_limit=1, prefetch=2)
+        summary = batch.run(urls)
+        self.assertEqual(summary.success_count, len(urls))
+        self.assertEqual(self.server.peak, 1)
+        # 終了後に枠が残っていない
+        self.assertEqual(batch.limiter._active, {})
+
+
+class PriorityTest(unittest.TestCase):
+    def setUp(self):
+        self.server = MediaServer().start()
+        self.workdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def test_higher_priority_jobs_start_first(self):
+        priorities = [0, 2, 0, 5, 2, 0]
+        jobs = [BatchJob(self.server.file_url(1024), priority=p) for p in priorities]
+        started = []
+
+        def on_progress(record):
+            if record.status == "started":
+                started.append(record.job_id)
+
+        batch = BatchDownloader(output_dir=self.workdir, format_code="best", yt_dlp_extra_opts=YDL_OPTS,
+                                max_workers=1, per_host_limit=1, prefetch=0, expand_playlists=False,
+                                progress_callback=on_progress)
+        summary = batch.run(jobs)
+        self.assertEqual(summary.success_count, len(jobs))
+        # 優先度の高い順、同じ優先度なら読み込んだ順（job_id がないジョブは index が進捗のキー）
+        self.assertEqual(started, [4, 2, 5, 1, 3, 6])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,32 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from engine.job_queue import BatchJob, JobQueue
+
+
+class IterPendingTest(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.queue = JobQueue(os.path.join(self.workdir, "job_queue.sqlite3"))
+
+    def tearDown(self):
+        self.queue.close()
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def test_pending_jobs_come_out_by_priority_then_position(self):
+        priorities = [0, 1, 0, 3, 1, 0, 3]
+        jobs = [BatchJob(f"https://example.com/{n}", priority=p) for n, p in enumerate(priorities)]
+        batch_id = self.queue.create_batch(jobs, "downloads", "best")
+        done = jobs[3].job_id
+        self.queue.mark_done(done)
+        # ページの境目をまたいでも順番が崩れず、重複もしないこと
+        pending = list(self.queue.iter_pending(batch_id, page_size=2))
+        self.assertEqual([(job.priority, job.index) for job in pending],
+                         [(3, 7), (1, 2), (1, 5), (0, 1), (0, 3), (0, 6)])
+        self.assertNotIn(done, [job.job_id for job in pending])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,28 @@
+import unittest
+
+from engine import media_id
+from engine.media_id import MISS_LIMIT, resolve_media_id
+
+
+class ResolveMediaIdTest(unittest.TestCase):
+    def setUp(self):
+        resolve_media_id.cache_clear()
+        with media_id._hosts_lock:
+            media_id._hosts.clear()
+
+    def test_host_with_hits_keeps_scanning_new_url_shapes(self):
+        # 一致したことのあるホストでは、一致しないURLが溜まっても別の形のURLを照合し続けること
+        for n in range(MISS_LIMIT * 2):
+            resolve_media_id(f"https://www.youtube.com/watch?v=abcdefgh{n:03d}")
+            resolve_media_id(f"https://www.youtube.com/about/page{n}")
+        self.assertEqual(resolve_media_id("https://www.youtube.com/playlist?list=PLabcdefghijklmnop"),
+                         ("YoutubeTab", "PLabcdefghijklmnop"))
+
+    def test_host_without_hits_is_skipped_after_misses(self):
+        for n in range(MISS_LIMIT + 2):
+            self.assertIsNone(resolve_media_id(f"http://files.example/v{n}.mp4"))
+        self.assertEqual(media_id._hosts["files.example"], [[], MISS_LIMIT])
+
+
+if __name__ == "__main__":
+    unittest.main()
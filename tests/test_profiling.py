@@ -0,0 +1,61 @@
+import pstats
+import shutil
+import sys
+import tempfile
+import threading
+import tracemalloc
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from engine.profiling import Profiler, profiled
+
+
+def _busy():
+    return sum(range(10000))
+
+
+class ProfileSessionTest(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def test_worker_threads_stop_profiling_with_the_session(self):
+        # 記録の前からあるワーカーのスレッドも、処理が終われば cProfile が外れていること
+        executor = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(executor.shutdown)
+        executor.submit(_busy).result()
+        saved = []
+        profiler = Profiler(mode="cprofile", output_dir=self.workdir, on_saved=saved.extend)
+        with profiler.session("test"):
+            executor.submit(profiled(_busy)).result()
+            thread = threading.Thread(target=profiled(_busy))
+            thread.start()
+            thread.join()
+        self.assertIsNone(executor.submit(sys.getprofile).result())
+        stats = pstats.Stats([path for path in saved if path.endswith(".pstats")][0])
+        calls = sum(value[0] for key, value in stats.stats.items() if key[2] == "_busy")
+        self.assertEqual(calls, 2)
+
+    def test_profiled_thread_runs_during_a_session(self):
+        # Python 3.12 以降（プロファイラを同時に1つしか有効にできない）でも、記録中に処理が実行されること
+        done = []
+        profiler = Profiler(mode="cprofile", output_dir=self.workdir)
+        with profiler.session("test"):
+            thread = threading.Thread(target=profiled(lambda: done.append(_busy())))
+            thread.start()
+            thread.join()
+        self.assertEqual(done, [_busy()])
+
+    def test_tracemalloc_frames(self):
+        depths = []
+        profiler = Profiler(trace_memory=True, output_dir=self.workdir, memory_frames=7)
+        with profiler.session("test"):
+            depths.append(tracemalloc.get_traceback_limit())
+        self.assertEqual(depths, [7])
+        self.assertFalse(tracemalloc.is_tracing())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -7,7 +7,7 @@ from PyQt5.QtCore import Qt
 class BasicOptionsWidget(QWidget):
     def __init__(self, parent=None, proxy="", force_ipv4=False, force_ipv6=False,
                  socket_timeout=None, default_format="", plugin_formats=None,
-                 output_dir="downloads", i18n=None):
+                 output_dir="downloads", download_archive=True, i18n=None):
         super().__init__(parent)
         self.i18n = i18n
         self.proxy = proxy
@@ -17,6 +17,7 @@ class BasicOptionsWidget(QWidget):
         self.plugin_formats = plugin_formats or {}
         self.default_format = default_format if default_format else "bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]"
         self.output_dir = output_dir
+        self.download_archive = download_archive
         self.init_ui()
 
     def init_ui(self):
@@ -131,6 +132,12 @@ class BasicOptionsWidget(QWidget):
         self.show_bytes_cb.setChecked(True)
         layout.addRow(self.show_bytes_cb)
 
+        # ダウンロード済みの動画を記録し、同じフォーマットで保存したファイルが残っていればスキップする
+        archive_text = self.i18n.t("basic_download_archive") if self.i18n else "ダウンロード済みの動画をスキップする"
+        self.download_archive_cb = QCheckBox(archive_text, self)
+        self.download_archive_cb.setChecked(self.download_archive)
+        layout.addRow(self.download_archive_cb)
+
         self.setLayout(layout)
         self.set_default_format_selection()
 
@@ -1,4 +1,13 @@
-from PyQt5.QtWidgets import QWidget, QFormLayout, QCheckBox, QLabel
+from PyQt5.QtWidgets import QWidget, QFormLayout, QCheckBox, QLabel, QComboBox, QLineEdit, QSpinBox
+
+from engine.profiling import TRACEMALLOC_FRAMES
+
+# プロファイル方式の選択肢（設定値, 翻訳キー, 既定の表示名）
+PROFILE_MODES = (
+    ("", "developer_profile_off", "無効"),
+    ("cprofile", "developer_profile_cprofile", "cProfile（関数ごとの時間, .pstats）"),
+    ("sampling", "developer_profile_sampling", "サンプリング（flamegraph 形式, .collapsed）"),
+)
 
 class DeveloperOptionsWidget(QWidget):
     def __init__(self, parent=None, opts=None, i18n=None):
@@ -15,11 +24,41 @@ class DeveloperOptionsWidget(QWidget):
         dev_label.setStyleSheet("color: red; font-weight: bold;")
         layout.addRow(dev_label)
 
-        # 例の推奨されないオプションのチェックボックスを追加可能
-        # ここには必要に応じて追加してください
+        # ダウンロード1件、またはバッチ全体ごとにエンジンの処理をプロファイルしてファイルに書き出す
+        self.profile_mode_combo = QComboBox(self)
+        for value, key, default in PROFILE_MODES:
+            self.profile_mode_combo.addItem(self.i18n.t(key) if self.i18n else default, value)
+        index = self.profile_mode_combo.findData(self.opts.get('profile_mode', ''))
+        self.profile_mode_combo.setCurrentIndex(max(0, index))
+        mode_label = self.i18n.t("developer_profile_mode") if self.i18n else "プロファイル:"
+        layout.addRow(mode_label, self.profile_mode_combo)
+
+        tracemalloc_text = self.i18n.t("developer_profile_tracemalloc") if self.i18n else "メモリ割り当てを記録する (tracemalloc)"
+        self.profile_tracemalloc_cb = QCheckBox(tracemalloc_text, self)
+        self.profile_tracemalloc_cb.setChecked(self.opts.get('profile_tracemalloc', False))
+        layout.addRow(self.profile_tracemalloc_cb)
+
+        # 割り当て元をたどるスタックの深さ。深くするほど記録が遅くなる
+        self.profile_tracemalloc_frames_spin = QSpinBox(self)
+        self.profile_tracemalloc_frames_spin.setRange(1, 100)
+        self.profile_tracemalloc_frames_spin.setValue(self.opts.get('profile_tracemalloc_frames') or TRACEMALLOC_FRAMES)
+        frames_label = self.i18n.t("developer_profile_tracemalloc_frames") if self.i18n else "記録するスタックの深さ:"
+        layout.addRow(frames_label, self.profile_tracemalloc_frames_spin)
+
+        self.profile_dir_edit = QLineEdit(self)
+        self.profile_dir_edit.setText(self.opts.get('profile_dir', 'logs/profiles'))
+        dir_label = self.i18n.t("developer_profile_dir") if self.i18n else "プロファイルの保存先:"
+        layout.addRow(dir_label, self.profile_dir_edit)
+
+        note_text = self.i18n.t("developer_profile_note") if self.i18n else "有効にすると処理が遅くなります。ダウンロード1件・バッチ1回ごとにファイルを書き出します"
+        layout.addRow(QLabel(note_text))
 
         self.setLayout(layout)
 
     def get_options(self):
-        # 現状は空の辞書返すだけ。必要なら追加実装
-        return {}
+        return {
+            'profile_mode': self.profile_mode_combo.currentData() or '',
+            'profile_tracemalloc': self.profile_tracemalloc_cb.isChecked(),
+            'profile_tracemalloc_frames': self.profile_tracemalloc_frames_spin.value(),
+            'profile_dir': self.profile_dir_edit.text().strip() or 'logs/profiles',
+        }
@@ -6,13 +6,16 @@ from .dialog_options.developer_options_widget import DeveloperOptionsWidget
 
 class SettingsDialog(QDialog):
     def __init__(self, parent=None, current_output="downloads", plugin_manager=None,
-                 current_ffmpeg_path="", current_yt_dlp_opts=None, i18n=None):
+                 current_ffmpeg_path="", current_yt_dlp_opts=None, i18n=None, current_developer_opts=None,
+                 current_download_archive=True):
         super().__init__(parent)
         self.i18n = i18n or parent.i18n if hasattr(parent, 'i18n') else None
         self.plugin_manager = plugin_manager
         self.current_yt_dlp_opts = current_yt_dlp_opts or {}
+        self.current_developer_opts = current_developer_opts or {}
         self.output_dir = current_output
         self.ffmpeg_path = current_ffmpeg_path
+        self.download_archive = current_download_archive
         self.init_ui()
 
     def init_ui(self):
@@ -34,6 +37,7 @@ class SettingsDialog(QDialog):
             socket_timeout=self.current_yt_dlp_opts.get('socket_timeout', None),
             default_format=self.current_yt_dlp_opts.get('default_format', ''),
             plugin_formats=plugin_formats,
+            download_archive=self.download_archive,
             i18n=self.i18n
         )
 
@@ -41,7 +45,7 @@ class SettingsDialog(QDialog):
         self.downloader_tab = DownloaderOptionsWidget(parent=self,
                                                     current_downloader=self.current_yt_dlp_opts.get('downloader', ''),
                                                     i18n=self.i18n)
-        self.developer_tab = DeveloperOptionsWidget(parent=self, i18n=self.i18n)
+        self.developer_tab = DeveloperOptionsWidget(parent=self, opts=self.current_developer_opts, i18n=self.i18n)
 
         if self.i18n:
             self.tab_widget.addTab(self.basic_tab, self.i18n.t("tab_basic_options"))
@@ -69,16 +73,22 @@ class SettingsDialog(QDialog):
         opts.update(self.basic_tab.get_options())
         opts.update(self.advanced_tab.get_options())
         opts.update(self.downloader_tab.get_options())
-        opts.update(self.developer_tab.get_options())
         return {k: v for k, v in opts.items() if v not in (None, '', False) or (isinstance(v, bool) and v)}
 
+    def get_developer_options(self):
+        # yt-dlp には渡さず、アプリの設定として保存する
+        return self.developer_tab.get_options()
+
     def get_output_dir(self):
         return self.output_dir
 
     def get_ffmpeg_path(self):
         return self.ffmpeg_path
 
+    def get_download_archive(self):
+        return self.basic_tab.download_archive_cb.isChecked()
+
     def get_enabled_plugins(self):
         if self.plugin_manager:
-            return list(self.plugin_manager.plugins.keys())
+            return self.plugin_manager.available_plugins()
         return []
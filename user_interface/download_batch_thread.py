@@ -1,53 +1,121 @@
 from PyQt5.QtCore import QThread, pyqtSignal
-from engine.downloader import VideoDownloader
+from engine.batch import BatchDownloader
 import traceback
 
 class DownloadBatchThread(QThread):
     progress = pyqtSignal(str)  # ログ文字列をGUIへ送信
     finished_batch = pyqtSignal(bool)  # 成功/失敗フラグ付き
     error_occurred = pyqtSignal(str)  # 致命的エラー通知
+    job_finished = pyqtSignal(object)  # ジョブ単位の結果 (BatchResult)
+    summary_ready = pyqtSignal(object)  # バッチ全体の集計 (BatchSummary)
+    job_progress = pyqtSignal(object)  # 各ジョブの進捗 (ProgressRecord)。停止検知に使う
 
-    def __init__(self, urls, output_dir, format_code, ffmpeg_path=None, yt_dlp_opts=None):
+    def __init__(self, urls, output_dir, format_code, ffmpeg_path=None, yt_dlp_opts=None,
+                 max_workers=1, per_host_limit=2, reuse_ydl=True, metadata_cache=None,
+                 archive=None, job_queue=None, batch_id=None, total=None, progress_interval=0.1,
+                 bandwidth=None, host_limiter=None, pipeline_postprocess=True, postprocess_workers=None,
+                 expand_playlists=True, prefetch=2, metrics=None, profiler=None, hooks=None):
         super().__init__()
+        # urls はURLのリスト、または JobQueue.iter_pending() が返す BatchJob のイテレータ
         self.urls = urls
+        self.total = total
         self.output_dir = output_dir
         self.format_code = format_code
         self.ffmpeg_path = ffmpeg_path
         self.yt_dlp_opts = yt_dlp_opts
+        self.max_workers = max_workers
+        self.per_host_limit = per_host_limit
+        self.reuse_ydl = reuse_ydl
+        self.metadata_cache = metadata_cache
+        self.archive = archive
+        self.job_queue = job_queue
+        self.batch_id = batch_id
+        self.progress_interval = progress_interval
+        self.bandwidth = bandwidth
+        self.host_limiter = host_limiter
+        self.pipeline_postprocess = pipeline_postprocess
+        self.postprocess_workers = postprocess_workers
+        self.expand_playlists = expand_playlists
+        self.prefetch = prefetch
+        self.metrics = metrics
+        self.profiler = profiler
+        self.hooks = hooks
+        self.batch = None
+
+    def on_job_finished(self, result):
+        if not result.success and result.error is not None:
+            # デバッグ用の詳細エラー情報（必要に応じて）
+            e = result.error
+            if hasattr(e, '__traceback__'):
+                tb_lines = traceback.format_exception(type(e), e, e.__traceback__)
+                tb_summary = ''.join(tb_lines[-3:]).strip()  # 最後の3行のみ
+                self.progress.emit(f"詳細エラー: {tb_summary}")
+        self.job_finished.emit(result)
+
+    def stop(self):
+        if self.batch:
+            self.batch.stop()
+
+    def pause(self):
+        if self.batch:
+            self.batch.pause()
+
+    def cancel(self):
+        if self.batch:
+            self.batch.cancel()
+
+    def pause_job(self, key):
+        return self.batch.pause_job(key) if self.batch else False
 
     def run(self):
         success_count = 0
         error_count = 0
-        
+
         try:
-            downloader = VideoDownloader(
+            self.batch = BatchDownloader(
+                output_dir=self.output_dir,
+                format_code=self.format_code,
                 ffmpeg_path=self.ffmpeg_path,
                 yt_dlp_extra_opts=self.yt_dlp_opts,
+                max_workers=self.max_workers,
+                per_host_limit=self.per_host_limit,
+                reuse_ydl=self.reuse_ydl,
+                metadata_cache=self.metadata_cache,
+                archive=self.archive,
+                job_queue=self.job_queue,
+                log_callback=self.progress.emit,
+                result_callback=self.on_job_finished,
+                progress_callback=self.job_progress.emit,
+                progress_interval=self.progress_interval,
+                bandwidth=self.bandwidth,
+                host_limiter=self.host_limiter,
+                pipeline_postprocess=self.pipeline_postprocess,
+                postprocess_workers=self.postprocess_workers,
+                expand_playlists=self.expand_playlists,
+                prefetch=self.prefetch,
+                metrics=self.metrics,
+                profiler=self.profiler,
+                hooks=self.hooks,
             )
-            
-            total_urls = len(self.urls)
-            
-            for i, url in enumerate(self.urls, 1):
-                try:
-                    self.progress.emit(f"[{i}/{total_urls}] ダウンロード開始: {url}")
-                    downloader.download_video(url, output_dir=self.output_dir, format_code=self.format_code)
-                    success_count += 1
-                    self.progress.emit(f"[{i}/{total_urls}] ダウンロード成功: {url}")
-                    
-                except Exception as e:
-                    error_count += 1
-                    error_msg = f"[{i}/{total_urls}] ダウンロード失敗: {url} エラー: {str(e)}"
-                    self.progress.emit(error_msg)
-                    
-                    # デバッグ用の詳細エラー情報（必要に応じて）
-                    if hasattr(e, '__traceback__'):
-                        tb_lines = traceback.format_exception(type(e), e, e.__traceback__)
-                        tb_summary = ''.join(tb_lines[-3:]).strip()  # 最後の3行のみ
-                        self.progress.emit(f"詳細エラー: {tb_summary}")
+
+            summary = self.batch.run(self.urls, total=self.total)
+            if self.metrics is not None:
+                self.metrics.flush()
+            # 停止・一時停止したバッチは未完了のまま残し、あとで再開できるようにする
+            if (self.job_queue is not None and self.batch_id is not None
+                    and not self.batch.stopped and summary.paused_count == 0):
+                self.job_queue.finish_batch(self.batch_id)
+            success_count = summary.success_count
+            error_count = summary.error_count
 
             # 完了サマリー
-            self.progress.emit(f"バッチ処理完了 - 成功: {success_count}, 失敗: {error_count}")
-            
+            paused = f", 一時停止: {summary.paused_count}" if summary.paused_count else ""
+            self.progress.emit(
+                f"バッチ処理完了 - 成功: {success_count}, スキップ: {summary.skipped_count}, 失敗: {error_count}{paused}"
+                f" (所要時間: {summary.elapsed:.1f}秒, ワーカー数: {self.batch.max_workers})"
+            )
+            self.summary_ready.emit(summary)
+
         except Exception as fatal_error:
             # 致命的エラー（ダウンローダー作成失敗など）
             error_msg = f"バッチ処理中に致命的なエラーが発生: {str(fatal_error)}"
@@ -55,7 +123,7 @@ class DownloadBatchThread(QThread):
             self.error_occurred.emit(error_msg)
             self.finished_batch.emit(False)
             return
-            
+
         finally:
             # 必ず終了シグナルを送信
             success = error_count == 0
@@ -0,0 +1,65 @@
+import asyncio
+import threading
+
+from PyQt5.QtCore import QObject, pyqtSignal
+from engine.scheduler import DownloadScheduler
+
+class QtDownloadScheduler(QObject):
+    """
+    DownloadScheduler を GUI から使うためのアダプタ。
+    専用スレッドで asyncio のイベントループを動かし、結果と進捗はシグナルで通知する。
+    """
+    progress = pyqtSignal(object)  # ProgressRecord
+    job_finished = pyqtSignal(object)  # BatchResult（index はジョブID）
+    job_cancelled = pyqtSignal(object)  # ジョブID
+
+    def __init__(self, parent=None, **scheduler_options):
+        super().__init__(parent)
+        self.loop = asyncio.new_event_loop()
+        self.scheduler = DownloadScheduler(progress_callback=self.progress.emit, **scheduler_options)
+        self._thread = threading.Thread(target=self.loop.run_forever, name="spinova-scheduler", daemon=True)
+        self._thread.start()
+
+    def submit(self, url, output_dir=None, format_code=None, timeout=None):
+        """ジョブを登録してジョブIDを返す"""
+        future = asyncio.run_coroutine_threadsafe(
+            self._submit(url, output_dir, format_code, timeout), self.loop)
+        return future.result()
+
+    async def _submit(self, url, output_dir, format_code, timeout):
+        handle = self.scheduler.submit(url, output_dir=output_dir, format_code=format_code, timeout=timeout)
+        handle.add_done_callback(self._on_done)
+        return handle.job_id
+
+    def _on_done(self, handle):
+        if handle.cancelled():
+            self.job_cancelled.emit(handle.job_id)
+        else:
+            self.job_finished.emit(handle.result())
+
+    def cancel(self, job_id):
+        handle = self.scheduler.get(job_id)
+        if handle is not None:
+            handle.cancel()
+            return True
+        return False
+
+    def pause(self, job_id):
+        handle = self.scheduler.get(job_id)
+        if handle is not None:
+            handle.pause()
+            return True
+        return False
+
+    def shutdown(self, cancel=True, timeout=5):
+        if self.loop.is_closed():
+            return
+        future = asyncio.run_coroutine_threadsafe(self.scheduler.close(cancel=cancel), self.loop)
+        try:
+            future.result(timeout)
+        except Exception as e:
+            print(f"スケジューラの終了処理に失敗しました: {e}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
+        if not self._thread.is_alive():
+            self.loop.close()
@@ -1,21 +1,31 @@
-import time
+import logging
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout,
-    QLabel, QLineEdit, QPushButton, QTextEdit, QComboBox,
+    QLabel, QLineEdit, QPushButton, QComboBox,
     QMenuBar, QMenu, QAction, QFileDialog, QMessageBox,
-    QProgressBar, QCheckBox, QDialog, QDialogButtonBox
+    QProgressBar, QCheckBox, QDialog, QDialogButtonBox, QSplitter
 )
-from PyQt5.QtCore import QThread, pyqtSignal, QTimer
-from engine.downloader import VideoDownloader
+from PyQt5.QtCore import Qt, QThread, pyqtSignal, QTimer
+from engine.downloader import VideoDownloader, remove_partial_files
+from engine.progress import ProgressRecord, ProgressWatchdog
+from engine.bandwidth import get_default_manager, parse_rate
 from engine.plugins import PluginManager
+from engine.ydl_pool import get_default_pool
+from engine.variants import join_variants
+from engine.resources import (open_metadata_cache, open_download_archive, open_job_queue, make_host_limiter,
+                              open_metrics, make_profiler, open_file_log, make_plugin_hooks)
+from engine.batch_source import iter_csv_file, resume_jobs
+from engine.logfile import guess_level
 from .dialog_settings import SettingsDialog
-from .download_thread import DownloadThread
+from .download_scheduler import QtDownloadScheduler
 from config.config_manager import ConfigManager
 from .download_batch_thread import DownloadBatchThread
+from .widget_log import LogWidget
+from .widget_job_table import JobTableView
 from config.i18n import I18N
 import version
 import json
-import csv
+import itertools
 import sys
 import os
 
@@ -54,30 +64,96 @@ class LanguageDialog(QDialog):
         super().accept()
 
 class MainWindow(QWidget):
+    # プロファイルの書き出し完了（ワーカースレッドから通知されるためシグナルで受け渡す）
+    profile_saved = pyqtSignal(list)
+    # プラグインのフックの時間切れなどの通知（フックのワーカーから届く）
+    hook_log = pyqtSignal(str)
+
     def __init__(self):
         super().__init__()
         self.app_version = version.__version__
         self.config_manager = ConfigManager()
-        self.plugin_manager = PluginManager()
+        # プラグインの読み込みはウィンドウ表示後に行う（load_plugins）
+        self._plugin_manager = None
+        self.plugin_hooks = None
         
         # 言語設定読み込み
         saved_locale = self.config_manager.get("locale", "ja")
         self.i18n = I18N(saved_locale)
         
         # スレッド追跡とタイマー初期化
-        self.current_thread = None
+        # 単体ダウンロードは DownloadScheduler で実行する（最初のダウンロード時に作成）
+        self.download_scheduler = None
+        self._download_scheduler_options = None
+        self.current_job_id = None
+        self.current_download = None
         self.current_batch_thread = None
-        self.ui_recovery_timer = QTimer()
-        self.ui_recovery_timer.timeout.connect(self.force_ui_recovery)
-        self.ui_recovery_timer.setSingleShot(True)
+        # 一時停止中の単体ダウンロード（URL・保存先・.part ファイル）とバッチ
+        self.paused_download = None
+        self.paused_batch = None
+        # 実行中のバッチの集計結果（終了時に状態表示へ件数を出す）
+        self._batch_summary = None
+        self._paused_partial = None
         
         self.load_config()
+
+        # レート制限はダウンロードごとではなく、同時に実行中のダウンロード全体の合計に対して適用する
+        self.bandwidth = get_default_manager()
+        self.apply_bandwidth_limit()
+
+        # 一定時間進捗のないダウンロードを検出して一時停止する（転送が続いている限りは止めない）
+        self.watchdog = ProgressWatchdog(self.stall_timeout)
+        self.watchdog_timer = QTimer()
+        self.watchdog_timer.setInterval(1000)
+        self.watchdog_timer.timeout.connect(self.check_stalled_downloads)
+        self.metadata_cache = open_metadata_cache(self.config_manager)
+        self.archive = open_download_archive(self.config_manager)
+        self.job_queue = open_job_queue(self.config_manager)
+        self.metrics = open_metrics(self.config_manager)
+        # 画面のログは直近の行だけを保持し、全履歴はローテーションするファイルに残す
+        self.file_log = open_file_log(self.config_manager)
+        self.profile_saved.connect(self.on_profile_saved)
+        self.hook_log.connect(self.append_log)
+        self.apply_profiler()
         self.init_ui()
 
+        # プラグインの読み込みと、前回中断されたバッチの再開確認はウィンドウ表示後に行う
+        QTimer.singleShot(0, self.load_plugins)
+        QTimer.singleShot(0, self.check_interrupted_batches)
+
+    @property
+    def plugin_manager(self):
+        # 遅延読み込みの前に使われた場合はその場で読み込む
+        if self._plugin_manager is None:
+            self.init_plugins()
+        return self._plugin_manager
+
+    def load_plugins(self):
+        if self._plugin_manager is None:
+            self.init_plugins()
+            self.load_formats()
+
+    def init_plugins(self):
+        self._plugin_manager = PluginManager()
+        # フックを定義したプラグインがあれば、次に開始するダウンロード・バッチから呼ばれる
+        self.plugin_hooks = make_plugin_hooks(self.config_manager, self._plugin_manager, metrics=self.metrics,
+                                              log_callback=self.hook_log.emit)
+
     def load_config(self):
         self.output_dir = self.config_manager.get("output_dir", "downloads")
         self.ffmpeg_path = self.config_manager.get("ffmpeg_path", "")
         self.enabled_plugins = self.config_manager.get("enabled_plugins", [])
+        self.batch_workers = self.config_manager.get("batch_workers", 4)
+        self.batch_per_host_limit = self.config_manager.get("batch_per_host_limit", 2)
+        self.reuse_ydl = self.config_manager.get("reuse_ydl", True)
+        self.progress_interval = self.config_manager.get("progress_interval", 0.1)
+        self.stall_timeout = self.config_manager.get("watchdog_stall_timeout", 60)
+        self.pipeline_postprocess = self.config_manager.get("pipeline_postprocess", True)
+        self.postprocess_workers = self.config_manager.get("postprocess_workers", 0) or None
+        self.expand_playlists = self.config_manager.get("expand_playlists", True)
+        self.batch_prefetch = self.config_manager.get("batch_prefetch", 2)
+        # スロットリングを受けたホストのバックオフは単体ダウンロードとバッチで共有する
+        self.host_limiter = make_host_limiter(self.config_manager, self.batch_per_host_limit)
         yt_dlp_opts_str = self.config_manager.get("yt_dlp_opts", "")
         try:
             self.yt_dlp_opts = json.loads(yt_dlp_opts_str) if yt_dlp_opts_str else {}
@@ -95,10 +171,16 @@ class MainWindow(QWidget):
 
         self.download_btn = QPushButton(self.i18n.t("button_download"), self)
         self.download_btn.clicked.connect(self.start_download)
+        self.pause_btn = QPushButton(self.i18n.t("button_pause"), self)
+        self.pause_btn.clicked.connect(self.toggle_pause)
+        self.cancel_btn = QPushButton(self.i18n.t("button_cancel"), self)
+        self.cancel_btn.clicked.connect(self.cancel_download)
+        self.update_control_buttons()
 
         self.status_label = QLabel("", self)
-        self.log_area = QTextEdit(self)
-        self.log_area.setReadOnly(True)
+        self.log_area = LogWidget(self, max_lines=self.config_manager.get("log_max_lines", 5000), i18n=self.i18n)
+        # ジョブごとの状態と進捗（単体ダウンロードとバッチの両方）
+        self.job_table = JobTableView(self, i18n=self.i18n)
 
         self.show_bytes_cb = QCheckBox(self.i18n.t("bytes_display_enable"), self)
         self.show_bytes_cb.setChecked(True)
@@ -115,9 +197,16 @@ class MainWindow(QWidget):
         main_layout.addLayout(self.init_output_dir_layout())
         main_layout.addWidget(self.progress_bar)
         main_layout.addWidget(self.show_bytes_cb)
-        main_layout.addWidget(self.download_btn)
+        control_layout = QHBoxLayout()
+        control_layout.addWidget(self.download_btn, 1)
+        control_layout.addWidget(self.pause_btn)
+        control_layout.addWidget(self.cancel_btn)
+        main_layout.addLayout(control_layout)
         main_layout.addWidget(self.status_label)
-        main_layout.addWidget(self.log_area)
+        splitter = QSplitter(Qt.Vertical, self)
+        splitter.addWidget(self.job_table)
+        splitter.addWidget(self.log_area)
+        main_layout.addWidget(splitter, 1)
 
         self.setLayout(main_layout)
 
@@ -131,6 +220,10 @@ class MainWindow(QWidget):
         batch_download_action.triggered.connect(self.open_csv_batch_dialog)
         file_menu.addAction(batch_download_action)
 
+        resume_batch_action = QAction(self.i18n.t("action_resume_batch"), self)
+        resume_batch_action.triggered.connect(lambda: self.check_interrupted_batches(notify_empty=True))
+        file_menu.addAction(resume_batch_action)
+
         file_menu.addSeparator()
 
         language_action = QAction(self.i18n.t("action_language"), self)
@@ -198,19 +291,35 @@ class MainWindow(QWidget):
         return out_layout
 
     def load_formats(self):
+        mp4 = "bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]"
+        mp3 = "bestaudio[ext=m4a]/bestaudio"
         formats = {
-            self.i18n.t("format_mp4"): "bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]",
-            self.i18n.t("format_mp3"): "bestaudio[ext=m4a]/bestaudio",
+            self.i18n.t("format_mp4"): mp4,
+            self.i18n.t("format_mp3"): mp3,
+            # 1回の抽出で両方をダウンロードする（MP4 の結合に使った音声は通信し直さない）
+            self.i18n.t("format_mp4_mp3"): join_variants([mp4, mp3]),
         }
         plugin_formats = {}
-        for name in self.enabled_plugins:
-            if name in self.plugin_manager.formats:
-                plugin_formats[name] = self.plugin_manager.formats[name]
+        if self._plugin_manager is not None:
+            for name in self.enabled_plugins:
+                if name in self._plugin_manager.formats:
+                    plugin_formats[name] = self._plugin_manager.formats[name]
 
         combined_formats = {**formats, **plugin_formats}
+        self.formats = combined_formats
+        current = self.format_combo.currentText()
         self.format_combo.clear()
         for name in combined_formats.keys():
             self.format_combo.addItem(name)
+        if current in combined_formats:
+            self.format_combo.setCurrentText(current)
+
+    def all_formats(self):
+        """フォーマット名 → フォーマット指定（画面に表示している名前を優先する）"""
+        return {**self.plugin_manager.get_all_formats(), **getattr(self, "formats", {})}
+
+    def selected_format_code(self):
+        return self.all_formats().get(self.format_combo.currentText(), "bestvideo+bestaudio/best")
 
     def open_settings_dialog(self):
         dialog = SettingsDialog(
@@ -219,6 +328,10 @@ class MainWindow(QWidget):
             plugin_manager=self.plugin_manager,
             current_ffmpeg_path=self.ffmpeg_path,
             current_yt_dlp_opts=self.yt_dlp_opts,
+            current_developer_opts={key: self.config_manager.get(key)
+                                    for key in ("profile_mode", "profile_tracemalloc", "profile_tracemalloc_frames",
+                                                "profile_dir")},
+            current_download_archive=self.archive is not None,
         )
         if dialog.exec_():
             opts = dialog.get_yt_dlp_opts()
@@ -232,7 +345,32 @@ class MainWindow(QWidget):
             self.config_manager.set("ffmpeg_path", self.ffmpeg_path)
             self.config_manager.set("enabled_plugins", self.enabled_plugins)
             self.config_manager.set("yt_dlp_opts", json.dumps(self.yt_dlp_opts, ensure_ascii=False))
+            for key, value in dialog.get_developer_options().items():
+                self.config_manager.set(key, value)
+            self.config_manager.set("download_archive", dialog.get_download_archive())
             self.config_manager.save()
+            self.apply_download_archive()
+            # 実行中のダウンロードにもすぐに反映される
+            self.apply_bandwidth_limit()
+            self.apply_profiler()
+
+    def apply_download_archive(self):
+        # 次に開始するダウンロード・バッチから反映される（実行中のジョブは開いたままのアーカイブを使い続ける）
+        enabled = self.config_manager.get("download_archive", True)
+        if enabled and self.archive is None:
+            self.archive = open_download_archive(self.config_manager)
+        elif not enabled:
+            self.archive = None
+
+    def apply_bandwidth_limit(self):
+        self.bandwidth.set_rate(parse_rate(self.yt_dlp_opts.get("limit_rate")))
+
+    def apply_profiler(self):
+        # 次に開始するダウンロード・バッチから反映される
+        self.profiler = make_profiler(self.config_manager, on_saved=self.profile_saved.emit)
+
+    def on_profile_saved(self, paths):
+        self.append_log(self.i18n.t("msg_profile_saved").format(paths=", ".join(paths)))
 
     def open_output_dir_dialog(self):
         folder = QFileDialog.getExistingDirectory(self, self.i18n.t("dialog_select_folder"), self.output_dir)
@@ -248,43 +386,89 @@ class MainWindow(QWidget):
             self.status_label.setText(self.i18n.t("msg_enter_url"))
             return
 
-        selected_fmt_name = self.format_combo.currentText()
-        format_code = self.plugin_manager.get_all_formats().get(selected_fmt_name, "bestvideo+bestaudio/best")
+        format_code = self.selected_format_code()
 
-        self.status_label.setText(self.i18n.t("msg_start_download"))
-        self.download_btn.setEnabled(False)
         self.log_area.clear()
         self.progress_bar.setValue(0)
+        self.submit_download(url, self.output_dir, format_code)
 
-        # UI復帰タイマー開始（30秒でタイムアウト）
-        self.ui_recovery_timer.start(30000)
+    def submit_download(self, url, output_dir, format_code):
+        self.status_label.setText(self.i18n.t("msg_start_download"))
+        self.download_btn.setEnabled(False)
+        self.paused_download = None
+        self._paused_partial = None
+        self.current_download = {"url": url, "output_dir": output_dir, "format_code": format_code}
 
-        self.current_thread = DownloadThread(
-            url,
-            format_code,
-            output_dir=self.output_dir,
-            ffmpeg_path=self.ffmpeg_path,
-            yt_dlp_opts=self.yt_dlp_opts,
-        )
-        self.current_thread.progress.connect(self.update_progress)
-        self.current_thread.finished.connect(self.download_finished)
-        self.current_thread.error_occurred.connect(self.handle_thread_error)
-        self.current_thread.start()
-
-    def update_progress(self, data):
-        now = time.time()
-        if not hasattr(self, '_last_update_time'):
-            self._last_update_time = 0
-        if now - self._last_update_time < 0.1:
+        try:
+            self.current_job_id = self.get_download_scheduler().submit(
+                url, output_dir=output_dir, format_code=format_code)
+        except Exception as e:
+            self.handle_thread_error(str(e))
             return
-        self._last_update_time = now
-
-        status = data.get("status")
+        self.watchdog.watch(self.current_job_id)
+        self.job_table.update_job(ProgressRecord(
+            "queued", url=url, label=self.i18n.t("job_table_single").format(id=self.current_job_id)),
+            key=("single", self.current_job_id))
+        self.watchdog_timer.start()
+        self.update_control_buttons()
+
+    def get_download_scheduler(self):
+        options = {
+            "ffmpeg_path": self.ffmpeg_path or None,
+            "yt_dlp_extra_opts": self.yt_dlp_opts,
+            "max_workers": self.batch_workers,
+            "per_host_limit": self.batch_per_host_limit,
+            "ydl_pool": get_default_pool() if self.reuse_ydl else None,
+            "metadata_cache": self.metadata_cache,
+            "archive": self.archive,
+            "progress_interval": self.progress_interval,
+            "bandwidth": self.bandwidth,
+            "host_limiter": self.host_limiter,
+            "metrics": self.metrics,
+            "profiler": self.profiler,
+            "hooks": self.plugin_hooks,
+        }
+        # 設定が変わっていれば作り直す（ダウンロード中はボタンが無効なので実行中のジョブはない）
+        if self.download_scheduler is not None and options != self._download_scheduler_options:
+            self.close_download_scheduler()
+        if self.download_scheduler is None:
+            self.download_scheduler = QtDownloadScheduler(self, **options)
+            self.download_scheduler.progress.connect(self.update_progress)
+            self.download_scheduler.job_finished.connect(self.on_download_job_finished)
+            self.download_scheduler.job_cancelled.connect(self.on_download_job_cancelled)
+            self._download_scheduler_options = options
+        return self.download_scheduler
+
+    def close_download_scheduler(self):
+        if self.download_scheduler is not None:
+            self.download_scheduler.shutdown()
+            self.download_scheduler = None
+
+    def on_download_job_finished(self, result):
+        self.job_table.update_job(ProgressRecord(result.status, url=result.url,
+                                                 error=str(result.error) if result.error is not None else None),
+                                  key=("single", result.index))
+        if result.index != self.current_job_id:
+            return
+        if result.paused:
+            self.paused_download = dict(self.current_download, partial=self._paused_partial)
+        self.download_finished()
+
+    def on_download_job_cancelled(self, job_id):
+        self.job_table.update_job(ProgressRecord("cancelled"), key=("single", job_id))
+        if job_id == self.current_job_id:
+            self.download_finished()
+
+    def update_progress(self, record):
+        # 進捗はエンジン側で progress_interval ごとに間引かれた ProgressRecord として届く
+        self.watchdog.beat(record)
+        self.job_table.update_job(record, key=("single", record.job_id))
+        status = record.status
         if status == "downloading":
-            total_bytes = data.get("total_bytes") or data.get("total_bytes_estimate")
-            downloaded_bytes = data.get("downloaded_bytes", 0)
+            total_bytes = record.total_bytes
+            downloaded_bytes = record.downloaded_bytes or 0
             if total_bytes and total_bytes > 0:
-                percent = int(downloaded_bytes / total_bytes * 100)
+                percent = record.percent
                 self.progress_bar.setValue(percent)
                 if self.show_bytes_cb.isChecked():
                     msg = self.i18n.t("downloading_bytes").format(
@@ -299,11 +483,18 @@ class MainWindow(QWidget):
         elif status == "finished":
             self.progress_bar.setValue(100)
             msg = self.i18n.t("msg_download_complete")
+        elif status == "already_downloaded":
+            self.progress_bar.setValue(100)
+            msg = self.i18n.t("msg_already_downloaded").format(path=record.filename or record.url or "")
+        elif status == "paused":
+            # 再開時はこの .part ファイルの続きからダウンロードされる
+            self._paused_partial = record.filename
+            msg = self.i18n.t("msg_paused")
         elif status == "error":
             # 詳細エラー情報をログに表示
-            error_type = data.get("error_type", "UnknownError")
-            error_msg = data.get("error", "")
-            url = data.get("url", "")
+            error_type = record.error_type or "UnknownError"
+            error_msg = record.error or ""
+            url = record.url or ""
             msg = f"{self.i18n.t('msg_error_occurred')} [{error_type}] {error_msg}"
             if url:
                 msg += f" (URL: {url})"
@@ -312,37 +503,106 @@ class MainWindow(QWidget):
 
         self.status_label.setText(msg)
         if msg:
-            self.log_area.append(f"[{time.strftime('%H:%M:%S')}] {msg}")
+            # エラー以外の進捗（ダウンロード中・完了など）は内容からレベルを決める
+            level = logging.ERROR if status in ("error", "failed") else guess_level(msg)
+            self.append_log(msg, level)
 
     def download_finished(self):
-        self.ui_recovery_timer.stop()
+        self.watchdog.unwatch(self.current_job_id)
+        if self.metrics is not None:
+            self.metrics.flush()
         self.download_btn.setEnabled(True)
-        self.current_thread = None
-        self.status_label.setText(self.i18n.t("msg_download_finished"))
+        self.current_job_id = None
+        self.current_download = None
+        if self.paused_download is not None:
+            self.status_label.setText(self.i18n.t("msg_paused"))
+        else:
+            self.status_label.setText(self.i18n.t("msg_download_finished"))
+        self.update_control_buttons()
 
     def handle_thread_error(self, error_msg):
-        self.ui_recovery_timer.stop()
+        self.watchdog.unwatch(self.current_job_id)
         self.download_btn.setEnabled(True)
-        self.current_thread = None
-        error_log = f"[{time.strftime('%H:%M:%S')}] スレッドエラー: {error_msg}"
-        self.log_area.append(error_log)
+        self.current_job_id = None
+        self.current_download = None
+        self.append_log(f"スレッドエラー: {error_msg}", logging.ERROR)
         self.status_label.setText(self.i18n.t("msg_thread_error"))
-
-    def force_ui_recovery(self):
-        """タイムアウト時の強制UI復帰"""
-        self.download_btn.setEnabled(True)
-        if self.current_thread and self.current_thread.isRunning():
-            self.current_thread.terminate()
-            self.current_thread.wait(3000)
-        if self.current_batch_thread and self.current_batch_thread.isRunning():
-            self.current_batch_thread.terminate()
-            self.current_batch_thread.wait(3000)
-        
-        self.current_thread = None
-        self.current_batch_thread = None
-        error_log = f"[{time.strftime('%H:%M:%S')}] タイムアウトによりUI復帰を実行しました"
-        self.log_area.append(error_log)
-        self.status_label.setText(self.i18n.t("msg_timeout_recovery"))
+        self.update_control_buttons()
+
+    def update_control_buttons(self):
+        active = self.current_job_id is not None or self.current_batch_thread is not None
+        paused = self.paused_download is not None or self.paused_batch is not None
+        self.pause_btn.setText(self.i18n.t("button_resume" if paused and not active else "button_pause"))
+        self.pause_btn.setEnabled(active or paused)
+        self.cancel_btn.setEnabled(active or paused)
+        if not active:
+            self.watchdog_timer.stop()
+
+    def toggle_pause(self):
+        """実行中なら一時停止し、一時停止中なら .part ファイルの続きから再開する"""
+        if self.current_job_id is not None:
+            self.download_scheduler.pause(self.current_job_id)
+            self.pause_btn.setEnabled(False)
+        elif self.current_batch_thread is not None:
+            # ジョブキューがなければ再開はできないが、.part ファイルは次回同じURLを実行したときに使われる
+            if self.current_batch_thread.batch_id is not None:
+                self.paused_batch = {"id": self.current_batch_thread.batch_id, "partials": []}
+            self.current_batch_thread.pause()
+            self.pause_btn.setEnabled(False)
+        elif self.paused_download is not None:
+            paused = self.paused_download
+            self.submit_download(paused["url"], paused["output_dir"], paused["format_code"])
+        elif self.paused_batch is not None:
+            batch_id = self.paused_batch["id"]
+            self.paused_batch = None
+            if self.job_queue is not None:
+                self.resume_batch(batch_id)
+            self.update_control_buttons()
+
+    def cancel_download(self):
+        """実行中または一時停止中のダウンロードを中止し、途中までのファイルを削除する"""
+        if self.current_job_id is not None:
+            self.download_scheduler.cancel(self.current_job_id)
+        elif self.current_batch_thread is not None:
+            batch_id = self.current_batch_thread.batch_id
+            self.paused_batch = None
+            self.current_batch_thread.cancel()
+            if batch_id is not None and self.job_queue is not None:
+                self.job_queue.finish_batch(batch_id)
+        elif self.paused_download is not None:
+            remove_partial_files([self.paused_download["partial"]])
+            self.paused_download = None
+        elif self.paused_batch is not None:
+            remove_partial_files(self.paused_batch["partials"])
+            if self.job_queue is not None:
+                self.job_queue.finish_batch(self.paused_batch["id"])
+            self.paused_batch = None
+        else:
+            return
+        self.status_label.setText(self.i18n.t("msg_cancelled"))
+        self.update_control_buttons()
+
+    def check_stalled_downloads(self):
+        """stall_timeout 秒以上進捗のないダウンロードを一時停止する"""
+        for key in self.watchdog.stalled():
+            self.watchdog.unwatch(key)
+            self.append_log(self.i18n.t("msg_download_stalled").format(seconds=self.stall_timeout))
+            if isinstance(key, tuple):
+                # バッチ内のジョブ。一時停止したジョブは次回の再開時に続きからダウンロードされる
+                if self.current_batch_thread is not None:
+                    self.current_batch_thread.pause_job(key[1])
+            elif key == self.current_job_id and self.download_scheduler is not None:
+                self.download_scheduler.pause(key)
+
+    def on_batch_job_progress(self, record):
+        self.watchdog.beat(record, key=("batch", record.job_id))
+        self.job_table.update_job(record, key=("batch", record.job_id))
+        if record.status == "paused" and record.filename and self.paused_batch is not None:
+            self.paused_batch["partials"].append(record.filename)
+        elif record.status in ("expanding", "expanded"):
+            # プレイリスト・チャンネルは展開しながらダウンロードするため、見つかった件数を随時表示する
+            self.status_label.setText(self.i18n.t("msg_playlist_expanding").format(
+                count=record.entries, url=record.url or ""))
 
     def open_csv_batch_dialog(self):
         path, _ = QFileDialog.getOpenFileName(self, self.i18n.t("dialog_select_csv"), "", "CSV files (*.csv)")
@@ -350,58 +610,130 @@ class MainWindow(QWidget):
             return
 
         try:
-            urls = []
-            with open(path, newline="", encoding="utf-8") as f:
-                reader = csv.reader(f)
-                for row in reader:
-                    if len(row) > 0:
-                        url = row[0].strip()
-                        if url.startswith("http"):
-                            urls.append(url)
-
-            if not urls:
+            # CSVは全体を読み込まず、バッチの実行中に少しずつ読み進める（最初の1件だけここで確認する）
+            jobs = iter_csv_file(path, self.all_formats())
+            first = next(jobs, None)
+            if first is None:
                 QMessageBox.warning(self, self.i18n.t("warning"), self.i18n.t("csv_no_valid_urls"))
                 return
 
-            self.start_batch_download(urls)
+            self.start_batch_download(itertools.chain([first], jobs), source=path)
 
         except Exception as e:
             error_msg = self.i18n.t("csv_read_failed").format(error=str(e))
             QMessageBox.critical(self, self.i18n.t("error"), error_msg)
 
-    def start_batch_download(self, urls):
+    def start_batch_download(self, urls, source=None):
+        # urls はURLのリスト、または BatchJob のイテレータ（件数は読み終わるまで分からない）
         if not urls:
             self.status_label.setText(self.i18n.t("msg_no_urls"))
             return
 
-        msg = self.i18n.t("msg_batch_start").format(count=len(urls))
+        total = len(urls) if hasattr(urls, "__len__") else None
+        if total is None:
+            msg = self.i18n.t("msg_batch_start_streaming").format(source=source or "")
+        else:
+            msg = self.i18n.t("msg_batch_start").format(count=total)
         self.status_label.setText(msg)
+
+        format_code = self.selected_format_code()
+
+        # ジョブキューに記録しておけば、異常終了しても続きから再開できる
+        jobs = urls
+        batch_id = None
+        if self.job_queue is not None:
+            try:
+                batch_id = self.job_queue.open_batch(self.output_dir, format_code, source=source)
+                jobs = self.job_queue.feed(batch_id, urls)
+            except Exception as e:
+                self.append_log(f"ジョブキューへの登録に失敗しました: {e}")
+                batch_id = None
+
+        self.run_batch(jobs, total, self.output_dir, format_code, batch_id)
+
+    def check_interrupted_batches(self, notify_empty=False):
+        if self.job_queue is None or self.current_batch_thread is not None:
+            return
+        batches = self.job_queue.unfinished_batches()
+        if not batches:
+            if notify_empty:
+                QMessageBox.information(self, self.i18n.t("dialog_resume_batch_title"),
+                                        self.i18n.t("msg_no_interrupted_batch"))
+            return
+
+        batch = batches[0]
+        text = self.i18n.t("msg_resume_batch_question").format(
+            source=batch["source"] or "", remaining=batch["remaining"], total=batch["total"])
+        reply = QMessageBox.question(self, self.i18n.t("dialog_resume_batch_title"), text,
+                                     QMessageBox.Yes | QMessageBox.No | QMessageBox.Discard,
+                                     QMessageBox.Yes)
+        if reply == QMessageBox.Yes:
+            self.resume_batch(batch["id"])
+        elif reply == QMessageBox.Discard:
+            self.job_queue.finish_batch(batch["id"])
+
+    def resume_batch(self, batch_id):
+        batch = self.job_queue.get_batch(batch_id)
+        if batch is None:
+            return
+        # 強制停止で running のまま残ったジョブも対象に戻す（.part ファイルから再開される）
+        self.job_queue.reset_running(batch_id)
+        remaining = self.job_queue.unfinished_batches()
+        count = next((b["remaining"] for b in remaining if b["id"] == batch_id), 0)
+        self.status_label.setText(self.i18n.t("msg_batch_start").format(count=count))
+        self.run_batch(resume_jobs(self.job_queue, batch_id, self.all_formats()),
+                       batch["total"] if batch["loaded"] else None,
+                       batch["output_dir"], batch["format_code"], batch_id)
+
+    def run_batch(self, jobs, total, output_dir, format_code, batch_id=None):
         self.download_btn.setEnabled(False)
         self.progress_bar.setValue(0)
+        self.job_table.clear()
 
-        # UI復帰タイマー開始（バッチ処理用に長めに設定）
-        self.ui_recovery_timer.start(120000)  # 2分
-
-        format_code = self.plugin_manager.get_all_formats().get(
-            self.format_combo.currentText(), "bestvideo+bestaudio/best"
-        )
-        
         self.current_batch_thread = DownloadBatchThread(
-            urls,
-            output_dir=self.output_dir,
+            jobs,
+            output_dir=output_dir,
             format_code=format_code,
             ffmpeg_path=self.ffmpeg_path,
             yt_dlp_opts=self.yt_dlp_opts,
+            max_workers=self.batch_workers,
+            per_host_limit=self.batch_per_host_limit,
+            reuse_ydl=self.reuse_ydl,
+            metadata_cache=self.metadata_cache,
+            archive=self.archive,
+            job_queue=self.job_queue,
+            batch_id=batch_id,
+            total=total,
+            progress_interval=self.progress_interval,
+            bandwidth=self.bandwidth,
+            host_limiter=self.host_limiter,
+            pipeline_postprocess=self.pipeline_postprocess,
+            postprocess_workers=self.postprocess_workers,
+            expand_playlists=self.expand_playlists,
+            prefetch=self.batch_prefetch,
+            metrics=self.metrics,
+            profiler=self.profiler,
+            hooks=self.plugin_hooks,
         )
         
         self._batch_error_detected = False  # エラーフラグ
+        self._batch_summary = None
 
         # エラー検出用の進捗スロットを追加
         def on_progress_log(msg):
-            self.append_log(msg)
-            if "失敗" in msg or "error" in msg.lower() or "エラー" in msg:
+            level = guess_level(msg)
+            self.append_log(msg, level)
+            if level >= logging.ERROR:
+                self._batch_error_detected = True
+
+        def on_job_finished(result):
+            # 失敗したジョブがあれば、ログの文言に関係なく「エラーあり」で終える
+            if result.status == "failed":
                 self._batch_error_detected = True
 
+        def on_summary(summary):
+            self._batch_summary = summary
+
         def on_finished(success):
             self.batch_download_finished(success and not self._batch_error_detected)
 
@@ -411,33 +743,59 @@ class MainWindow(QWidget):
         self.current_batch_thread.progress.connect(on_progress_log)
         self.current_batch_thread.finished_batch.connect(on_finished)
         self.current_batch_thread.error_occurred.connect(on_error)
+        self.current_batch_thread.job_finished.connect(on_job_finished)
+        self.current_batch_thread.summary_ready.connect(on_summary)
+        self.current_batch_thread.job_progress.connect(self.on_batch_job_progress)
         self.current_batch_thread.start()
+        self.watchdog_timer.start()
+        self.update_control_buttons()
 
-    def append_log(self, message):
-        timestamp = time.strftime('%H:%M:%S')
-        log_msg = f"[{timestamp}] {message}"
-        self.log_area.append(log_msg)
+    def append_log(self, message, level=None):
+        self.log_area.append(message, level)
+        if self.file_log is not None:
+            self.file_log.write(message, level)
         self.status_label.setText(message)
 
     def batch_download_finished(self, success=True):
-        self.ui_recovery_timer.stop()
         self.current_batch_thread = None
+        if self.current_job_id is None:
+            self.watchdog.clear()
+        self.update_control_buttons()
         
-        if success:
-            self.status_label.setText(self.i18n.t("msg_batch_finished"))
+        if self.paused_batch is not None:
+            message = self.i18n.t("msg_paused")
+        elif success:
+            message = self.i18n.t("msg_batch_finished")
         else:
-            self.status_label.setText(self.i18n.t("msg_batch_finished_with_errors"))
+            message = self.i18n.t("msg_batch_finished_with_errors")
+        summary, self._batch_summary = self._batch_summary, None
+        if summary is not None:
+            message += self.i18n.t("msg_batch_summary").format(
+                success=summary.success_count, skipped=summary.skipped_count, failed=summary.error_count,
+                elapsed=summary.elapsed)
+        self.status_label.setText(message)
         
         self.download_btn.setEnabled(True)
 
     def handle_batch_error(self, error_msg):
-        self.ui_recovery_timer.stop()
         self.current_batch_thread = None
+        self.paused_batch = None
+        if self.current_job_id is None:
+            self.watchdog.clear()
+        self.update_control_buttons()
         self.download_btn.setEnabled(True)
         error_log = f"バッチ処理エラー: {error_msg}"
         self.append_log(error_log)
         self.status_label.setText(self.i18n.t("msg_batch_error"))
 
+    def closeEvent(self, event):
+        self.close_download_scheduler()
+        if self.plugin_hooks is not None:
+            self.plugin_hooks.close()
+        if self.file_log is not None:
+            self.file_log.close()
+        super().closeEvent(event)
+
 if __name__ == "__main__":
     app = QApplication(sys.argv)
     window = MainWindow()
@@ -0,0 +1,287 @@
+import os
+
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QTimer
+from PyQt5.QtGui import QBrush, QColor
+from PyQt5.QtWidgets import (
+    QTableView, QHeaderView, QAbstractItemView, QStyledItemDelegate, QStyleOptionProgressBar,
+    QApplication, QStyle
+)
+
+COLUMNS = ("job", "name", "state", "progress", "speed", "eta")
+_COLUMN_KEYS = {
+    "job": ("job_table_job", "#"),
+    "name": ("job_table_name", "名前"),
+    "state": ("job_table_state", "状態"),
+    "progress": ("job_table_progress", "進捗"),
+    "speed": ("job_table_speed", "速度"),
+    "eta": ("job_table_eta", "残り時間"),
+}
+_PROGRESS_COLUMN = COLUMNS.index("progress")
+
+# ProgressRecord の状態ごとの表示（翻訳キー, 既定の表示名）
+_STATES = {
+    "queued": ("job_state_queued", "待機中"),
+    "started": ("job_state_started", "開始"),
+    "downloading": ("job_state_downloading", "ダウンロード中"),
+    "finished": ("job_state_postprocessing", "後処理中"),
+    "already_downloaded": ("job_state_skipped", "スキップ"),
+    "skipped": ("job_state_skipped", "スキップ"),
+    "done": ("job_state_done", "完了"),
+    "error": ("job_state_failed", "失敗"),
+    "failed": ("job_state_failed", "失敗"),
+    "paused": ("job_state_paused", "一時停止"),
+    "cancelled": ("job_state_cancelled", "中止"),
+    "expanding": ("job_state_expanding", "展開中 ({count}件)"),
+    "expanded": ("job_state_expanded", "展開済み ({count}件)"),
+}
+# 最終結果。これより後に届いた（間引きで遅れた）進捗では状態を戻さない（再試行は queued から始め直す）。
+# finished（通信の終了）は映像と音声を別々に取得する場合に続きがあるため含めない
+_FINAL_STATES = ("done", "error", "failed", "skipped", "already_downloaded", "cancelled")
+_STATE_COLORS = {
+    "done": QColor("#2e7d32"),
+    "failed": QColor("#c62828"),
+    "error": QColor("#c62828"),
+    "paused": QColor("#b36b00"),
+}
+
+
+def format_bytes(value):
+    value = float(value)
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if value < 1024 or unit == "GiB":
+            return f"{value:.0f}{unit}" if unit == "B" else f"{value:.1f}{unit}"
+        value /= 1024
+
+
+def format_eta(seconds):
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+    return f"{seconds // 60}:{seconds % 60:02d}"
+
+
+class _JobRow:
+    __slots__ = ("key", "label", "url", "name", "state", "percent", "speed", "eta", "entries", "error")
+
+    def __init__(self, key, url=None):
+        self.key = key
+        self.label = None
+        self.url = url
+        self.name = None
+        self.state = "queued"
+        self.percent = None
+        self.speed = None
+        self.eta = None
+        self.entries = None
+        self.error = None
+
+    def apply(self, record):
+        if self.state in _FINAL_STATES and record.status != "queued":
+            return False
+        self.state = record.status
+        if record.label:
+            self.label = record.label
+        if record.url and not self.url:
+            self.url = record.url
+        if record.filename:
+            self.name = os.path.basename(record.filename)
+        if record.entries is not None:
+            self.entries = record.entries
+        if record.error:
+            self.error = record.error
+        if record.status == "downloading":
+            self.percent = record.percent
+            self.speed = record.speed
+            self.eta = record.eta
+        else:
+            self.speed = None
+            self.eta = None
+            if record.status in ("finished", "done", "already_downloaded"):
+                self.percent = 100
+            elif record.status in ("queued", "started"):
+                self.percent = None
+        return True
+
+
+class JobTableModel(QAbstractTableModel):
+    """
+    ジョブごとの状態・進捗・速度・残り時間の表。
+    update() で受け取った ProgressRecord は flush_interval ミリ秒ごとにまとめて反映する（ダウンロード中の進捗はジョブごとに最新の1件だけを残す）。
+    変わった行は連続する範囲ごとに1回の dataChanged で通知し、表全体は描き直さない
+    """
+
+    def __init__(self, parent=None, i18n=None, flush_interval=200):
+        super().__init__(parent)
+        self.i18n = i18n
+        self._rows = []
+        self._row_of = {}
+        self._pending = {}
+        self._headers = [self._t(*_COLUMN_KEYS[column]) for column in COLUMNS]
+        self._state_text = {status: self._t(*keys) for status, keys in _STATES.items()}
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(flush_interval)
+        self._timer.timeout.connect(self.flush)
+
+    def _t(self, key, default):
+        return self.i18n.t(key) if self.i18n else default
+
+    def update(self, record, key=None):
+        """key 省略時は record.job_id。同じジョブの未反映の進捗は上書きする（状態の変化は順番どおり反映する）"""
+        if key is None:
+            key = record.job_id
+        pending = self._pending.get(key)
+        if pending is None:
+            self._pending[key] = [record]
+        elif pending[-1].status == record.status == "downloading":
+            pending[-1] = record
+        else:
+            pending.append(record)
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def flush(self):
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        changed = []
+        added = []
+        for key, records in pending.items():
+            row = self._row_of.get(key)
+            if row is None:
+                job = _JobRow(key, records[0].url)
+                for record in records:
+                    job.apply(record)
+                added.append(job)
+                continue
+            job = self._rows[row]
+            if any([job.apply(record) for record in records]):
+                changed.append(row)
+
+        if added:
+            first = len(self._rows)
+            self.beginInsertRows(QModelIndex(), first, first + len(added) - 1)
+            for n, job in enumerate(added, first):
+                self._row_of[job.key] = n
+            self._rows.extend(added)
+            self.endInsertRows()
+
+        last_column = len(COLUMNS) - 1
+        for top, bottom in _ranges(sorted(changed)):
+            self.dataChanged.emit(self.index(top, 0), self.index(bottom, last_column))
+
+    def clear(self):
+        self._pending = {}
+        self.beginResetModel()
+        self._rows = []
+        self._row_of = {}
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self._headers[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        job = self._rows[index.row()]
+        column = COLUMNS[index.column()]
+        if role == Qt.DisplayRole:
+            return self._display(job, column)
+        if role == Qt.UserRole and column == "progress":
+            return job.percent
+        if role == Qt.ToolTipRole and column in ("name", "state"):
+            return job.error or job.url
+        if role == Qt.ForegroundRole and column == "state":
+            color = _STATE_COLORS.get(job.state)
+            return QBrush(color) if color is not None else None
+        if role == Qt.TextAlignmentRole and column in ("progress", "speed", "eta"):
+            return Qt.AlignRight | Qt.AlignVCenter
+        return None
+
+    def _display(self, job, column):
+        if column == "job":
+            return job.label or ""
+        if column == "name":
+            return job.name or job.url
+        if column == "state":
+            text = self._state_text.get(job.state, job.state)
+            return text.format(count=job.entries or 0) if "{count}" in text else text
+        if column == "progress":
+            return f"{job.percent}%" if job.percent is not None else ""
+        if column == "speed":
+            return f"{format_bytes(job.speed)}/s" if job.speed else ""
+        if column == "eta":
+            return format_eta(job.eta) if job.eta is not None and job.state == "downloading" else ""
+        return None
+
+
+def _ranges(rows):
+    """昇順の行番号を連続する (先頭, 末尾) の組にまとめる"""
+    start = prev = None
+    for row in rows:
+        if start is None:
+            start = prev = row
+        elif row == prev + 1:
+            prev = row
+        else:
+            yield start, prev
+            start = prev = row
+    if start is not None:
+        yield start, prev
+
+
+class _ProgressDelegate(QStyledItemDelegate):
+    """進捗の列をプログレスバーとして描く"""
+
+    def paint(self, painter, option, index):
+        percent = index.data(Qt.UserRole)
+        if percent is None:
+            return super().paint(painter, option, index)
+        bar = QStyleOptionProgressBar()
+        bar.rect = option.rect.adjusted(2, 2, -2, -2)
+        bar.minimum = 0
+        bar.maximum = 100
+        bar.progress = max(0, min(100, percent))
+        bar.text = f"{percent}%"
+        bar.textVisible = True
+        QApplication.style().drawControl(QStyle.CE_ProgressBar, bar, painter)
+
+
+class JobTableView(QTableView):
+    """
+    JobTableModel の表示。行の高さは固定にし、列幅も内容から計算しない
+    （数千行あっても表示中の行だけを描画する）
+    """
+
+    def __init__(self, parent=None, i18n=None):
+        super().__init__(parent)
+        self.job_model = JobTableModel(self, i18n=i18n)
+        self.setModel(self.job_model)
+        self.setItemDelegateForColumn(_PROGRESS_COLUMN, _ProgressDelegate(self))
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.setWordWrap(False)
+        self.setShowGrid(False)
+        vertical = self.verticalHeader()
+        vertical.setVisible(False)
+        vertical.setSectionResizeMode(QHeaderView.Fixed)
+        vertical.setDefaultSectionSize(self.fontMetrics().height() + 6)
+        header = self.horizontalHeader()
+        header.setSectionResizeMode(QHeaderView.Interactive)
+        header.setSectionResizeMode(COLUMNS.index("name"), QHeaderView.Stretch)
+        for column, width in (("job", 80), ("state", 110), ("progress", 110), ("speed", 90), ("eta", 70)):
+            self.setColumnWidth(COLUMNS.index(column), width)
+
+    def update_job(self, record, key=None):
+        self.job_model.update(record, key)
+
+    def clear(self):
+        self.job_model.clear()
@@ -0,0 +1,183 @@
+import logging
+import re
+import time
+from collections import deque
+
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex, QSortFilterProxyModel, QTimer
+from PyQt5.QtGui import QBrush, QColor
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QListView, QComboBox, QLineEdit, QAbstractItemView
+from engine.logfile import guess_level
+
+# バッチのログの先頭にあるジョブの表示（"[3/10]" や展開したエントリの "[3/10]#2"）
+_JOB_LABEL_RE = re.compile(r'^\[(\d+)/[^\]]*\]((?:#\d+)*)')
+
+LEVEL_ROLE = Qt.UserRole + 1
+JOB_ROLE = Qt.UserRole + 2
+
+_LEVEL_COLORS = {
+    logging.WARNING: QColor("#b36b00"),
+    logging.ERROR: QColor("#c62828"),
+}
+
+
+def job_of(message):
+    """メッセージのジョブ番号（"3" や "3#2"）。ジョブのログでなければ None"""
+    match = _JOB_LABEL_RE.match(message)
+    return match.group(1) + match.group(2) if match else None
+
+
+class LogModel(QAbstractListModel):
+    """
+    直近 max_lines 行だけを保持するログのモデル（リングバッファ）。
+    append() した行はまとめて flush_interval ミリ秒ごとに反映し、行数が多くても挿入・削除は1回ずつで済ませる
+    """
+
+    def __init__(self, parent=None, max_lines=5000, flush_interval=100):
+        super().__init__(parent)
+        self.max_lines = max(1, int(max_lines))
+        # 各行は (時刻の文字列, レベル, ジョブ番号, メッセージ)
+        self._lines = deque(maxlen=self.max_lines)
+        self._pending = []
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(flush_interval)
+        self._timer.timeout.connect(self.flush)
+
+    def append(self, message, level=None, job=None):
+        message = str(message)
+        if level is None:
+            level = guess_level(message)
+        if job is None:
+            job = job_of(message)
+        self._pending.append((time.strftime('%H:%M:%S'), level, job, message))
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def flush(self):
+        if not self._pending:
+            return
+        pending = self._pending[-self.max_lines:]
+        self._pending = []
+        overflow = len(self._lines) + len(pending) - self.max_lines
+        if overflow > 0:
+            self.beginRemoveRows(QModelIndex(), 0, overflow - 1)
+            for _ in range(overflow):
+                self._lines.popleft()
+            self.endRemoveRows()
+        first = len(self._lines)
+        self.beginInsertRows(QModelIndex(), first, first + len(pending) - 1)
+        self._lines.extend(pending)
+        self.endInsertRows()
+
+    def clear(self):
+        self._pending = []
+        self.beginResetModel()
+        self._lines.clear()
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._lines)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        stamp, level, job, message = self._lines[index.row()]
+        if role == Qt.DisplayRole:
+            return f"[{stamp}] {message}"
+        if role == Qt.ForegroundRole:
+            color = _LEVEL_COLORS.get(level)
+            return QBrush(color) if color is not None else None
+        if role == LEVEL_ROLE:
+            return level
+        if role == JOB_ROLE:
+            return job
+        return None
+
+
+class LogFilterModel(QSortFilterProxyModel):
+    """レベル（min_level 以上）とジョブ番号で行を絞り込む。ジョブ "3" は展開したエントリ "3#2" も含む"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.min_level = logging.NOTSET
+        self.job = ""
+
+    def set_min_level(self, level):
+        self.min_level = level
+        self.invalidateFilter()
+
+    def set_job(self, job):
+        self.job = job.strip().lstrip("[").rstrip("]")
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, row, parent):
+        index = self.sourceModel().index(row, 0, parent)
+        if self.sourceModel().data(index, LEVEL_ROLE) < self.min_level:
+            return False
+        if self.job:
+            job = self.sourceModel().data(index, JOB_ROLE)
+            return job is not None and (job == self.job or job.startswith(self.job + "#"))
+        return True
+
+
+class LogWidget(QWidget):
+    """
+    ログの表示。QListView は見えている行だけを描画するため、行数が増えても追加の負担は変わらない。
+    最下部を表示している間は新しい行に追従する
+    """
+
+    def __init__(self, parent=None, max_lines=5000, i18n=None):
+        super().__init__(parent)
+        self.i18n = i18n
+        self.model = LogModel(self, max_lines=max_lines)
+        self.filter_model = LogFilterModel(self)
+        self.filter_model.setSourceModel(self.model)
+        self.init_ui()
+
+    def init_ui(self):
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        filter_layout = QHBoxLayout()
+        self.level_combo = QComboBox(self)
+        for level, key, default in ((logging.NOTSET, "log_filter_all", "すべて"),
+                                    (logging.WARNING, "log_filter_warnings", "警告とエラー"),
+                                    (logging.ERROR, "log_filter_errors", "エラーのみ")):
+            self.level_combo.addItem(self.i18n.t(key) if self.i18n else default, level)
+        self.level_combo.currentIndexChanged.connect(
+            lambda _: self.filter_model.set_min_level(self.level_combo.currentData()))
+        self.job_edit = QLineEdit(self)
+        self.job_edit.setPlaceholderText(self.i18n.t("log_filter_job") if self.i18n else "ジョブ番号で絞り込み（例: 3, 3#2）")
+        self.job_edit.setClearButtonEnabled(True)
+        self.job_edit.textChanged.connect(self.filter_model.set_job)
+        filter_layout.addWidget(self.level_combo)
+        filter_layout.addWidget(self.job_edit, 1)
+
+        self.view = QListView(self)
+        self.view.setModel(self.filter_model)
+        # 全行を同じ高さとして扱い、行ごとの高さの計算を省く
+        self.view.setUniformItemSizes(True)
+        self.view.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.view.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.view.setHorizontalScrollBarPolicy(Qt.ScrollBarAsNeeded)
+        self._follow = True
+        self.view.verticalScrollBar().valueChanged.connect(self._on_scrolled)
+        self.filter_model.rowsInserted.connect(self._on_rows_inserted)
+
+        layout.addLayout(filter_layout)
+        layout.addWidget(self.view)
+        self.setLayout(layout)
+
+    def append(self, message, level=None, job=None):
+        self.model.append(message, level, job)
+
+    def clear(self):
+        self.model.clear()
+
+    def _on_scrolled(self, value):
+        bar = self.view.verticalScrollBar()
+        self._follow = value >= bar.maximum()
+
+    def _on_rows_inserted(self, *args):
+        if self._follow:
+            self.view.scrollToBottom()